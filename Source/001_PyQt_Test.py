@@ -2,16 +2,66 @@
 Application main
 This is the start point for the main application which launches
 the GUI
+
+Run with --startup-profile to print how long the imports, the window and
+the first paint took, and with --plot-engine pyqtgraph to draw the plot with
+pyqtgraph instead of matplotlib
 '''
+import time
+# Time the script was started, used by the startup profile
+startTime = time.perf_counter()
+
 import sys
 from PyQt5.QtWidgets import QApplication
+qtImportTime = time.perf_counter()
 
 from modules import guiHandler
+guiImportTime = time.perf_counter()
+
+
+'''
+printStartupProfile function prints the time spent in every step of the
+startup along with the time since the script was started
+'''
+def printStartupProfile(steps):
+    print('Startup profile (ms)    step   total')
+    lastTime = startTime
+    for name, stepTime in steps:
+        print('{:<20} {:>8.1f} {:>7.1f}'.format(name, 1000 * (stepTime - lastTime), 1000 * (stepTime - startTime)))
+        lastTime = stepTime
+
+
+# The worker processes of the bulk loader import this script too, so the
+# application is only started when the script is run
+if __name__ == "__main__":
+    startupProfile = '--startup-profile' in sys.argv
+    # Select the plot engine
+    if '--plot-engine' in sys.argv[:-1]:
+        guiHandler.plotEngine = sys.argv[sys.argv.index('--plot-engine') + 1]
+        if guiHandler.plotEngine not in guiHandler.PLOT_ENGINES:
+            sys.exit('Unknown plot engine {}, use one of {}'.format(guiHandler.plotEngine, ', '.join(guiHandler.PLOT_ENGINES)))
+
+    # Define the application
+    guiApp = QApplication([])
+    # Setup the main application window
+    window = guiHandler.mainWindow()
+    windowTime = time.perf_counter()
+
+    if startupProfile:
+        steps = [('Import PyQt5', qtImportTime), ('Import GUI modules', guiImportTime), ('Create window', windowTime)]
+
+        def firstPainted():
+            steps.append(('First paint', time.perf_counter()))
+            # The heavy modules should not have been needed so far
+            print('Imported before the first paint: ' + (', '.join(
+                module for module in ['pandas', 'matplotlib'] if module in sys.modules) or 'neither pandas nor matplotlib'))
+
+        def canvasCreated():
+            steps.append(('Create plot canvas', time.perf_counter()))
+            printStartupProfile(steps)
 
-# Define the application
-guiApp = QApplication([])
-# Setup the main application window
-window = guiHandler.mainWindow()
-# Execute the application
-sys.exit(guiApp.exec_())
+        window.plotArea.firstPainted.connect(firstPainted)
+        window.plotArea.canvasCreated.connect(canvasCreated)
 
+    # Execute the application
+    sys.exit(guiApp.exec_())
@@ -0,0 +1,189 @@
+'''
+Batch Render
+This script renders the temperature plots of many csv files without the GUI
+Every file is drawn with the same style as the application on its own figure
+(using the Agg backend, no QApplication is created) and the files are spread
+over a pool of processes, one per available core
+
+An overlay of all the files can be drawn as well. The workers send back a
+decimated copy of each trace so the overlay stays cheap for thousands of files
+
+Usage (from the Source folder):
+    python batchRender.py <folder or glob> [--output <folder>] [--format png svg]
+                          [--combined] [--recursive] [--workers N] [--dpi N]
+
+Examples:
+    python batchRender.py ../Data --combined
+    python batchRender.py "../Data/2021_*.csv" --format png svg --output ../Reports
+'''
+
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from modules import fileHandler
+from modules import cacheHandler
+from modules import plotStyle
+from modules import sidecarHandler
+from modules import decimationHandler
+
+# Number of points per trace sent back to the main process for the overlay
+OVERLAY_POINTS = 1000
+
+
+'''
+findInputFiles function takes a folder path or a glob pattern and returns the
+list of csv files to render along with the folder the output names are
+relative to
+'''
+def findInputFiles(pattern, recursive):
+    if os.path.isdir(pattern):
+        return sorted(sidecarHandler.findCSVFiles(pattern, recursive)), pattern
+
+    csvFiles = sorted(filePath for filePath in glob.glob(pattern, recursive=recursive) if filePath.endswith('.csv'))
+    if not csvFiles:
+        return csvFiles, os.getcwd()
+
+    return csvFiles, os.path.commonpath([os.path.dirname(os.path.abspath(filePath)) for filePath in csvFiles])
+
+
+'''
+newFigure function creates a figure with an Agg canvas and a single styled
+plot of the given size (in pixels) and resolution
+This function returns the figure and the axes
+'''
+def newFigure(width, height, dpi):
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    plotStyle.styleFigure(figure)
+    plotStyle.styleAxes(axes)
+
+    return figure, axes
+
+
+'''
+renderFile function runs on a worker process. It takes a tuple with the
+csv path, the output path without extension, the output formats, the image
+size and resolution, and whether the overlay needs the data
+
+The file is read, reduced to the pixel width of the plot and saved in every
+requested format
+This function returns the csv path, the number of rows, the decimated overlay
+data (or None) and the time spent on the file
+'''
+def renderFile(job):
+    filePath, outputBase, formats, width, height, dpi, overlay = job
+    start = time.perf_counter()
+
+    # Read without the dataset cache, a file is only rendered once per worker
+    xData, yData = fileHandler.readFileData(filePath, cacheHandler.fileFingerprint(filePath))
+    xSorted = decimationHandler.isSorted(xData)
+    fileName = os.path.basename(filePath)
+
+    figure, axes = newFigure(width, height, dpi)
+    if len(xData):
+        xVisible, yVisible = decimationHandler.minMaxDecimate(xData, yData, xData.min(), xData.max(),
+                                                              axes.bbox.width, xSorted)
+        line, = axes.plot(xVisible, yVisible, plotStyle.LINE_STYLE, label=fileName)
+        plotStyle.addLegend(axes, [line])
+
+    os.makedirs(os.path.dirname(outputBase), exist_ok=True)
+    for outputFormat in formats:
+        figure.savefig(outputBase + '.' + outputFormat, format=outputFormat)
+
+    overlayData = None
+    if overlay and len(xData):
+        overlayData = decimationHandler.minMaxDecimate(xData, yData, xData.min(), xData.max(),
+                                                       OVERLAY_POINTS // 2, xSorted)
+
+    return filePath, len(xData), overlayData, time.perf_counter() - start
+
+
+'''
+renderOverlay function draws the decimated traces of all the files on a
+single figure and saves it in every requested format
+'''
+def renderOverlay(results, outputBase, formats, width, height, dpi):
+    figure, axes = newFigure(width, height, dpi)
+
+    lines = []
+    for filePath, rows, overlayData, seconds in results:
+        if overlayData is not None:
+            line, = axes.plot(overlayData[0], overlayData[1], '-', linewidth=0.8, label=os.path.basename(filePath))
+            lines.append(line)
+    if lines:
+        plotStyle.addLegend(axes, lines)
+
+    for outputFormat in formats:
+        figure.savefig(outputBase + '.' + outputFormat, format=outputFormat)
+
+
+'''
+main function parses the command line, renders every file on the process
+pool and prints a throughput summary
+'''
+def main():
+    parser = argparse.ArgumentParser(description='Render temperature plots of csv files without the GUI')
+    parser.add_argument('input', help='folder or glob pattern of csv files')
+    parser.add_argument('--output', help='output folder (default: <input folder>/plots)')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'], help='output formats')
+    parser.add_argument('--combined', action='store_true', help='also render an overlay of all the files')
+    parser.add_argument('--recursive', action='store_true', help='include sub folders (or ** in the glob)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--width', type=int, default=1000, help='image width in pixels')
+    parser.add_argument('--height', type=int, default=800, help='image height in pixels')
+    parser.add_argument('--dpi', type=int, default=plotStyle.FIGURE_DPI, help='image resolution')
+    arguments = parser.parse_args()
+
+    csvFiles, baseFolder = findInputFiles(arguments.input, arguments.recursive)
+    if not csvFiles:
+        print('No csv files found for ' + arguments.input)
+        return 1
+
+    outputFolder = arguments.output or os.path.join(baseFolder, 'plots')
+    jobs = []
+    for filePath in csvFiles:
+        relativePath = os.path.relpath(os.path.abspath(filePath), os.path.abspath(baseFolder))
+        outputBase = os.path.join(outputFolder, os.path.splitext(relativePath)[0])
+        jobs.append((filePath, outputBase, arguments.format, arguments.width, arguments.height,
+                     arguments.dpi, arguments.combined))
+
+    print('Rendering {} files on {} processes'.format(len(jobs), arguments.workers))
+    start = time.perf_counter()
+    results = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=arguments.workers) as executor:
+        futures = [executor.submit(renderFile, job) for job in jobs]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                failed += 1
+                print('Failed: {}'.format(error))
+
+    if arguments.combined:
+        renderOverlay(results, os.path.join(outputFolder, 'combined'), arguments.format,
+                      arguments.width, arguments.height, arguments.dpi)
+
+    # Print the throughput summary
+    elapsed = time.perf_counter() - start
+    rows = sum(result[1] for result in results)
+    print('Rendered {} files ({} failed) in {:.2f} s'.format(len(results), failed, elapsed))
+    print('{:.1f} files/s, {:.0f} rows/s, {:.1f} ms per file on a worker'.format(
+        len(results) / elapsed, rows / elapsed, 1000 * sum(result[3] for result in results) / max(len(results), 1)))
+    print('Output written to ' + outputFolder)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
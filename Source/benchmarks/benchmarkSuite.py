@@ -0,0 +1,389 @@
+'''
+Benchmark Suite
+This script times the I/O and plotting hot paths of the application on
+synthetic cooling curves of increasing size and records the peak memory of
+every run
+
+Every benchmark is run once to warm up, then timed for the requested number
+of repeats (the best time is kept) and run once more with tracemalloc to
+measure the peak memory allocated by Python and NumPy. The GUI benchmarks
+run under the Qt offscreen platform, so no display is needed
+
+The results can be saved as a baseline and later runs compared against it.
+The comparison fails (exit code 1) if any benchmark got slower or used more
+memory than the threshold allows
+
+Usage (from the Source folder):
+    python benchmarks/benchmarkSuite.py [--rows 1000 10000 ...] [--filter <name>] [--repeats N]
+                                        [--save <baseline.json>] [--compare <baseline.json>] [--threshold 0.2]
+
+Examples:
+    python benchmarks/benchmarkSuite.py --save baseline.json
+    python benchmarks/benchmarkSuite.py --compare baseline.json
+    python benchmarks/benchmarkSuite.py --rows 1000 100000 --filter readCSV
+'''
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+# The GUI benchmarks do not need a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy
+import pandas
+
+# Make the modules package importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import fileHandler
+from modules import cacheHandler
+from modules import decimationHandler
+from modules import sampleHandler
+from benchmarks import syntheticData
+
+# Default row counts of the synthetic cooling curves
+DEFAULT_ROWS = [1000, 10000, 100000, 1000000, 10000000]
+# Default relative change (time or memory) reported as a regression
+DEFAULT_THRESHOLD = 0.2
+# Time and memory differences below these are ignored when comparing,
+# since they are within the noise of the measurement
+MIN_SECONDS = 0.01
+MIN_BYTES = 1024 * 1024
+
+
+'''
+benchmarkContext class holds what the benchmarks share: a temporary folder
+for the csv files (each row count is written once) and the Qt application
+and widgets of the GUI benchmarks, which are created on first use
+'''
+class benchmarkContext:
+
+    '''
+    benchmarkContext class constructor takes the temporary folder
+    '''
+    def __init__(self, dataFolder):
+        self.dataFolder = dataFolder
+        self.csvFiles = dict()
+        self.guiApp = None
+        self.canvas = None
+        self.graph = None
+        self.logger = None
+
+    '''
+    csvFile function returns the path of a csv file with a cooling curve of
+    the given number of rows, writing it the first time
+    '''
+    def csvFile(self, rows):
+        if rows not in self.csvFiles:
+            filePath = os.path.join(self.dataFolder, 'cooling_{}.csv'.format(rows))
+            syntheticData.writeCoolingCurve(filePath, rows)
+            self.csvFiles[rows] = filePath
+        return self.csvFiles[rows]
+
+    '''
+    application function creates the Qt application the first time it is
+    needed and returns it
+    '''
+    def application(self):
+        if self.guiApp is None:
+            from PyQt5.QtWidgets import QApplication
+            self.guiApp = QApplication.instance() or QApplication([])
+        return self.guiApp
+
+    '''
+    plotCanvas function returns an application sized plot canvas
+    '''
+    def plotCanvas(self):
+        if self.canvas is None:
+            self.application()
+            from modules import plotHandler
+            self.canvas = plotHandler.plotCanvas()
+            self.canvas.resize(1000, 800)
+        return self.canvas
+
+    '''
+    graphCanvas function returns an application sized pyqtgraph canvas
+    '''
+    def graphCanvas(self):
+        if self.graph is None:
+            self.application()
+            from modules import graphHandler
+            self.graph = graphHandler.graphCanvas()
+            self.graph.resize(1000, 800)
+        return self.graph
+
+    '''
+    dataLogger function returns a data logger group which is logging to a
+    file in the temporary folder
+    '''
+    def dataLogger(self):
+        if self.logger is None:
+            self.application()
+            from modules import guiHandler
+            self.logger = guiHandler.dataLoggerGroup()
+            # Select the temporary folder without showing the folder dialog
+            self.logger.folderpath = self.dataFolder
+            self.logger.startLoggingHandler()
+        return self.logger
+
+    '''
+    close function closes the session file of the data logger so the
+    temporary folder can be removed
+    '''
+    def close(self):
+        if self.logger is not None and self.logger.sessionWriter is not None:
+            self.logger.sessionWriter.close()
+
+
+'''
+The benchmark functions below take the context and a row count, prepare
+everything which should not be timed and return the function to time
+'''
+
+'''
+readCSVData benchmark parses a whole csv file
+'''
+def readCSVDataBenchmark(context, rows):
+    filePath = context.csvFile(rows)
+    return lambda: fileHandler.readCSVData(filePath)
+
+
+'''
+readCSVChunks benchmark parses a csv file block by block without keeping
+the blocks
+'''
+def readCSVChunksBenchmark(context, rows):
+    filePath = context.csvFile(rows)
+
+    def readChunks():
+        for block in fileHandler.readCSVChunks(filePath):
+            pass
+
+    return readChunks
+
+
+'''
+writeCSVData benchmark writes the time stamp and temperature lists of a
+logging session to a csv file
+'''
+def writeCSVDataBenchmark(context, rows):
+    timeData, tempData = syntheticData.loggerSamples(rows)
+    filePath = os.path.join(context.dataFolder, 'written.csv')
+    return lambda: fileHandler.writeCSVData(filePath, timeData, tempData)
+
+
+'''
+writeCSVData.samples benchmark writes the typed time stamps and temperatures
+of a sample store to a csv file
+'''
+def writeCSVSamplesBenchmark(context, rows):
+    samples = sampleHandler.sampleStore()
+    samples.extend(*syntheticData.loggerEpochSamples(rows))
+    filePath = os.path.join(context.dataFolder, 'written.csv')
+    return lambda: fileHandler.writeCSVData(filePath, samples.localTimes(), samples.temperatures())
+
+
+'''
+minMaxDecimate benchmark reduces a whole curve to the width of the plot
+'''
+def minMaxDecimateBenchmark(context, rows):
+    elapsed, temperature = syntheticData.coolingCurve(rows)
+    xData = elapsed / 60.0
+    return lambda: decimationHandler.minMaxDecimate(xData, temperature, xData[0], xData[-1], 1000)
+
+
+'''
+updatePlot benchmark reopens a csv file on a cleared plot and draws it
+The dataset cache is cleared first, so the data comes from the sidecar file
+(written by the warm up run) like when a file is reopened
+'''
+def updatePlotBenchmark(context, rows):
+    filePath = context.csvFile(rows)
+    canvas = context.plotCanvas()
+
+    def updatePlot():
+        cacheHandler.dataCache.clear()
+        canvas.clearPlot()
+        canvas.updatePlot(os.path.dirname(filePath), os.path.basename(filePath))
+        canvas.draw()
+
+    return updatePlot
+
+
+'''
+graphCanvas.updatePlot benchmark is the updatePlot benchmark drawn with
+pyqtgraph. The canvas is rendered into an image to paint it right away
+'''
+def graphUpdatePlotBenchmark(context, rows):
+    filePath = context.csvFile(rows)
+    canvas = context.graphCanvas()
+
+    def updatePlot():
+        cacheHandler.dataCache.clear()
+        canvas.clearPlot()
+        canvas.updatePlot(os.path.dirname(filePath), os.path.basename(filePath))
+        canvas.grab()
+
+    return updatePlot
+
+
+'''
+updateTable benchmark adds every sample of a cooling curve to the data
+logger table, one entry at a time
+'''
+def updateTableBenchmark(context, rows):
+    logger = context.dataLogger()
+    epochNs, temperatures = syntheticData.loggerEpochSamples(rows)
+    epochNs, temperatures = epochNs.tolist(), temperatures.tolist()
+
+    def updateTable():
+        logger.dataModel.clear()
+        for sampleTime, temperature in zip(epochNs, temperatures):
+            logger.updateTable(sampleTime, temperature)
+
+    return updateTable
+
+
+# Every benchmark with its name and the largest row count it is run for
+# (None for no limit). Entering samples one by one is far too slow for the
+# biggest curves, and so is the time stamp formatting of writeCSVData
+BENCHMARKS = [
+    ('readCSVData', readCSVDataBenchmark, None),
+    ('readCSVChunks', readCSVChunksBenchmark, None),
+    ('writeCSVData', writeCSVDataBenchmark, 1000000),
+    ('writeCSVData.samples', writeCSVSamplesBenchmark, None),
+    ('minMaxDecimate', minMaxDecimateBenchmark, None),
+    ('plotCanvas.updatePlot', updatePlotBenchmark, None),
+    ('graphCanvas.updatePlot', graphUpdatePlotBenchmark, None),
+    ('dataLoggerGroup.updateTable', updateTableBenchmark, 100000),
+]
+
+
+'''
+measure function runs a benchmark function once to warm up, then the given
+number of times to find the best time and once more to find the peak memory
+This function returns the best time (in seconds) and the peak memory (in bytes)
+'''
+def measure(function, repeats):
+    function()
+
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(times), peakMemory
+
+
+'''
+environment function returns the versions of the things the results depend on
+'''
+def environment():
+    import matplotlib
+    return {'python': platform.python_version(), 'numpy': numpy.__version__, 'pandas': pandas.__version__,
+            'matplotlib': matplotlib.__version__, 'platform': platform.platform(), 'processor': platform.processor()}
+
+
+'''
+compareResults function takes the results of this run and of the baseline
+along with the threshold, prints the change of every benchmark found in both
+and returns the number of regressions
+'''
+def compareResults(results, baseline, threshold):
+    baselineResults = {(result['name'], result['rows']): result for result in baseline['results']}
+    regressions = 0
+
+    print()
+    print('Compared with the baseline of ' + baseline.get('date', 'unknown date'))
+    print('{:<30} {:>10} {:>10} {:>10}  {}'.format('benchmark', 'rows', 'time', 'memory', ''))
+    for result in results:
+        reference = baselineResults.get((result['name'], result['rows']))
+        if reference is None:
+            continue
+
+        timeRatio = result['seconds'] / max(reference['seconds'], 1e-12)
+        memoryRatio = result['peakBytes'] / max(reference['peakBytes'], 1)
+        slower = (timeRatio > 1 + threshold and result['seconds'] - reference['seconds'] > MIN_SECONDS)
+        bigger = (memoryRatio > 1 + threshold and result['peakBytes'] - reference['peakBytes'] > MIN_BYTES)
+        regressions += slower or bigger
+
+        print('{:<30} {:>10} {:>9.2f}x {:>9.2f}x  {}'.format(result['name'], result['rows'], timeRatio, memoryRatio,
+                                                           'REGRESSION' if slower or bigger else ''))
+
+    return regressions
+
+
+'''
+main function parses the command line, runs every selected benchmark for
+every row count, prints the results and saves or compares them
+'''
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the I/O and plotting hot paths')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='row counts to benchmark')
+    parser.add_argument('--filter', default='', help='only run the benchmarks whose name contains this text')
+    parser.add_argument('--repeats', type=int, default=5, help='number of timed runs per benchmark')
+    parser.add_argument('--save', help='save the results as a baseline to this json file')
+    parser.add_argument('--compare', help='compare the results with the baseline in this json file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slow down or memory growth reported as a regression')
+    arguments = parser.parse_args()
+
+    results = []
+    print('{:<30} {:>10} {:>12} {:>14} {:>12}'.format('benchmark', 'rows', 'time (s)', 'rows/s', 'peak (MB)'))
+
+    with tempfile.TemporaryDirectory() as dataFolder:
+        context = benchmarkContext(dataFolder)
+        for name, benchmark, maxRows in BENCHMARKS:
+            if arguments.filter not in name:
+                continue
+            for rows in sorted(arguments.rows):
+                if maxRows is not None and rows > maxRows:
+                    continue
+
+                try:
+                    function = benchmark(context, rows)
+                except ImportError as error:
+                    # Optional packages (like pyqtgraph) may not be installed
+                    print('{:<30} skipped: {}'.format(name, error))
+                    break
+                seconds, peakBytes = measure(function, arguments.repeats)
+                results.append({'name': name, 'rows': rows, 'seconds': seconds, 'peakBytes': peakBytes})
+                print('{:<30} {:>10} {:>12.4f} {:>14.0f} {:>12.1f}'.format(name, rows, seconds, rows / seconds,
+                                                                         peakBytes / 1024 ** 2))
+        context.close()
+
+    if arguments.save:
+        with open(arguments.save, 'w') as baselineFile:
+            json.dump({'date': datetime.now().isoformat(timespec='seconds'), 'environment': environment(),
+                       'repeats': arguments.repeats, 'results': results}, baselineFile, indent=2)
+        print('Baseline saved to ' + arguments.save)
+
+    if arguments.compare:
+        with open(arguments.compare) as baselineFile:
+            baseline = json.load(baselineFile)
+        if baseline.get('environment') != environment():
+            print('Warning: the baseline was recorded in a different environment')
+        regressions = compareResults(results, baseline, arguments.threshold)
+        print('{} regressions'.format(regressions))
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+'''
+readCSVData Micro-Benchmark
+This script compares the original row by row implementation of readCSVData
+against the vectorized implementation in the file handler module
+
+Synthetic cooling curves are written to a temporary folder for every requested
+row count and both implementations read the same file. The best time out of
+the requested number of repeats is reported along with the speedup
+
+Usage (from the Source folder):
+    python benchmarks/readCSVBenchmark.py
+    python benchmarks/readCSVBenchmark.py --rows 10000 1000000 --repeats 3
+'''
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import pandas
+
+# Make the modules package importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import fileHandler
+from benchmarks.syntheticData import writeCoolingCurve
+
+# Default row counts to benchmark
+DEFAULT_ROWS = [10000, 1000000, 10000000]
+
+
+'''
+legacyReadCSVData function is the original implementation of readCSVData which
+converts every time element into a time delta inside a Python loop
+It is kept here only as the reference point for the benchmark
+'''
+def legacyReadCSVData(filePath):
+    dataFrame = pandas.read_csv(os.path.normpath(filePath))
+
+    xData = list()
+    yData = dataFrame.temp
+
+    timeData = pandas.to_datetime(dataFrame.time)
+    for time in timeData:
+        xData.append((pandas.Timedelta(time - timeData[0]).seconds)/60)
+
+    return xData, yData
+
+
+'''
+bestTime function calls the given function with the given file path for the
+requested number of repeats and returns the shortest run time in seconds
+'''
+def bestTime(function, filePath, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(filePath)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+'''
+main function parses the command line, runs the benchmark for every row count
+and prints a summary table
+'''
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark readCSVData against the original implementation')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='row counts to benchmark')
+    parser.add_argument('--repeats', type=int, default=3, help='number of timed runs per implementation')
+    parser.add_argument('--legacy-max-rows', type=int, default=None,
+                        help='skip the original implementation above this row count')
+    arguments = parser.parse_args()
+
+    print('{:>12} {:>12} {:>12} {:>10}'.format('rows', 'legacy (s)', 'vector (s)', 'speedup'))
+
+    with tempfile.TemporaryDirectory() as dataDir:
+        for rows in arguments.rows:
+            filePath = os.path.join(dataDir, 'cooling_{}.csv'.format(rows))
+            writeCoolingCurve(filePath, rows)
+
+            vectorTime = bestTime(fileHandler.readCSVData, filePath, arguments.repeats)
+
+            # The original implementation can take minutes on the biggest files
+            if arguments.legacy_max_rows is not None and rows > arguments.legacy_max_rows:
+                print('{:>12} {:>12} {:>12.4f} {:>10}'.format(rows, 'skipped', vectorTime, '-'))
+            else:
+                legacyTime = bestTime(legacyReadCSVData, filePath, arguments.repeats)
+                print('{:>12} {:>12.4f} {:>12.4f} {:>9.1f}x'.format(rows, legacyTime, vectorTime, legacyTime / vectorTime))
+
+            os.remove(filePath)
+
+
+if __name__ == "__main__":
+    main()
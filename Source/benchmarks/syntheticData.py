@@ -0,0 +1,72 @@
+'''
+Synthetic Data
+This module generates synthetic cooling curves for the benchmarks
+
+The curves follow Newton's law of cooling from 90 deg C towards a 22 deg C
+room with some sensor noise. The noise comes from a seeded random generator
+so the same row count always gives the same data
+'''
+
+import numpy
+import pandas
+
+# Time stamp of the first sample of every curve
+START_TIME = '2021-01-01 08:00:00'
+# Seed of the random generator used for the sensor noise
+DEFAULT_SEED = 2021
+
+
+'''
+coolingCurve function takes a number of rows and returns the elapsed time
+(in seconds, one sample every second) and temperature arrays of a cooling
+curve
+'''
+def coolingCurve(rows, seed=DEFAULT_SEED):
+    randomGenerator = numpy.random.default_rng(seed)
+    # Elapsed seconds for every sample
+    elapsed = numpy.arange(rows, dtype=numpy.int64)
+    # Newton cooling from 90 deg C towards a 22 deg C room with some sensor noise
+    temperature = 22 + 68 * numpy.exp(-elapsed / 1800.0) + randomGenerator.normal(0, 0.2, rows)
+
+    return elapsed, temperature.round(2)
+
+
+'''
+writeCoolingCurve function writes a synthetic cooling curve with the given
+number of rows into a csv file in the same format as the data logger
+(time and temp columns). One sample is written every second starting from
+an arbitrary date so the time stamps carry a date and never wrap
+'''
+def writeCoolingCurve(filePath, rows, seed=DEFAULT_SEED):
+    elapsed, temperature = coolingCurve(rows, seed)
+
+    # Build the time column from a fixed start date
+    timeData = pandas.Timestamp(START_TIME) + pandas.to_timedelta(elapsed, unit='s')
+
+    # Write to csv file
+    dataFrame = pandas.DataFrame({'time': timeData, 'temp': temperature}, columns=['time', 'temp'])
+    dataFrame.to_csv(filePath, index=False, header=True, date_format='%Y-%m-%d %H:%M:%S')
+
+
+'''
+loggerSamples function takes a number of rows and returns the time stamps
+(HH:MM:SS strings, as entered by the data logger) and temperature strings
+of a cooling curve
+'''
+def loggerSamples(rows, seed=DEFAULT_SEED):
+    elapsed, temperature = coolingCurve(rows, seed)
+    timeData = pandas.Timestamp(START_TIME) + pandas.to_timedelta(elapsed, unit='s')
+
+    return list(timeData.strftime('%H:%M:%S')), ['{:g}'.format(value) for value in temperature]
+
+
+'''
+loggerEpochSamples function takes a number of rows and returns the time
+stamps (nanoseconds since the epoch, as held by the sample store of the data
+logger) and temperatures of a cooling curve
+'''
+def loggerEpochSamples(rows, seed=DEFAULT_SEED):
+    elapsed, temperature = coolingCurve(rows, seed)
+    epochNs = pandas.Timestamp(START_TIME).value + elapsed * 1000000000
+
+    return epochNs, temperature
@@ -0,0 +1,235 @@
+'''
+Analysis Handler Module
+This module fits Newton's law of cooling to the temperature data of csv files
+(and columnar files, see the storage handler module)
+
+    T(t) = T_env + (T0 - T_env) * e^(-k * t)
+
+For a fixed cooling constant k the model is linear in T_env and (T0 - T_env),
+so both have a closed form least squares solution. The cooling constant is
+found by evaluating a whole grid of k values at once with NumPy and zooming
+in on the best one. The time t is the elapsed time in minutes, so k is given
+per minute
+
+The fits of every csv file in a folder can be computed in parallel from the
+command line. Results are cached by file fingerprint (relative path, size and
+modification time) so only new or changed files are fitted again
+(run from the Source folder):
+    python -m modules.analysisHandler <folder> [--recursive] [--output <csv file>] [--refit]
+'''
+
+import os
+import csv
+import time
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from modules import fileHandler
+from modules import cacheHandler
+from modules import indexHandler
+from modules import sidecarHandler
+from modules import storageHandler
+
+# Name of the fit cache database inside the cache folder
+FIT_CACHE_FILE_NAME = 'fits.sqlite'
+# Maximum number of points used while searching for the cooling constant
+SEARCH_POINTS = 2000
+# Range of k * duration covered by the first search grid
+SEARCH_RANGE = (1e-3, 1e3)
+# Number of k values in the first grid and in every refinement grid
+SEARCH_GRID_SIZE = 64
+REFINE_GRID_SIZE = 16
+REFINE_STEPS = 4
+
+# Columns of the fit results
+FIT_COLUMNS = ['path', 'rows', 'k', 'T0', 'T_env', 'rmse']
+
+
+'''
+linearFit function takes a grid of cooling constants (K values) and the time
+and temperature arrays (n values) and solves the linear least squares problem
+for every cooling constant at once
+
+This function returns the arrays of T_env, (T0 - T_env) and the sum of
+squared residuals for every cooling constant
+'''
+def linearFit(kGrid, tData, yData):
+    # Basis function for every cooling constant (K x n)
+    decay = numpy.exp(-numpy.outer(kGrid, tData))
+    decayMean = decay.mean(axis=1)
+    yMean = yData.mean()
+
+    # Closed form simple linear regression of y on the decay basis
+    decayCentered = decay - decayMean[:, None]
+    decayVariance = numpy.einsum('ij,ij->i', decayCentered, decayCentered)
+    covariance = decayCentered @ (yData - yMean)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        amplitude = numpy.where(decayVariance > 0, covariance / decayVariance, 0.0)
+    tEnv = yMean - amplitude * decayMean
+
+    # Sum of squared residuals without building the residual matrix
+    ySumSquares = numpy.dot(yData - yMean, yData - yMean)
+    residual = ySumSquares - amplitude * covariance
+
+    return tEnv, amplitude, residual
+
+
+'''
+fitCooling function takes the elapsed time (minutes) and temperature arrays
+of a run and fits Newton's law of cooling to them
+
+This function returns a tuple of k (per minute), T0, T_env and the root mean
+square of the residuals. All of them are NaN if the run has fewer than three
+valid points
+'''
+def fitCooling(tData, yData):
+    tData = numpy.asarray(tData, dtype=numpy.float64)
+    yData = numpy.asarray(yData, dtype=numpy.float64)
+    valid = numpy.isfinite(tData) & numpy.isfinite(yData)
+    tData = tData[valid]
+    yData = yData[valid]
+
+    duration = tData.max() - tData.min() if len(tData) else 0.0
+    if len(tData) < 3 or duration <= 0:
+        return (numpy.nan,) * 4
+
+    # Search on an evenly strided subset of the points
+    stride = max(len(tData) // SEARCH_POINTS, 1)
+    tSearch = tData[::stride]
+    ySearch = yData[::stride]
+
+    # Coarse logarithmic grid covering very slow to very fast cooling
+    logK = numpy.linspace(numpy.log(SEARCH_RANGE[0] / duration), numpy.log(SEARCH_RANGE[1] / duration), SEARCH_GRID_SIZE)
+    logStep = logK[1] - logK[0]
+    for step in range(REFINE_STEPS + 1):
+        residual = linearFit(numpy.exp(logK), tSearch, ySearch)[2]
+        bestLogK = logK[numpy.nanargmin(residual)]
+        # Zoom in around the best value
+        logK = numpy.linspace(bestLogK - logStep, bestLogK + logStep, REFINE_GRID_SIZE)
+        logStep = logK[1] - logK[0]
+
+    # Final fit on every point with the best cooling constant
+    k = numpy.exp(bestLogK)
+    tEnv, amplitude, residual = linearFit(numpy.array([k]), tData, yData)
+    rmse = numpy.sqrt(max(residual[0], 0.0) / len(tData))
+
+    return float(k), float(tEnv[0] + amplitude[0]), float(tEnv[0]), float(rmse)
+
+
+'''
+fitFile function runs on a worker process. It takes the path of a csv file,
+reads it and fits Newton's law of cooling to it
+This function returns the number of rows followed by the fit results
+'''
+def fitFile(filePath):
+    # Read without the dataset cache, a file is only fitted once per worker
+    xData, yData = fileHandler.readFileData(filePath, cacheHandler.fileFingerprint(filePath))
+    return (len(xData),) + fitCooling(xData, yData)
+
+
+'''
+fitCache class stores the fit results of the csv files of a data folder in
+an SQLite database in the cache folder of the data folder
+'''
+class fitCache:
+
+    '''
+    fitCache class constructor takes the path of the data folder and opens
+    (or creates) the fit cache database
+    '''
+    def __init__(self, folderPath):
+        cacheFolder = os.path.join(folderPath, sidecarHandler.CACHE_DIR_NAME)
+        os.makedirs(cacheFolder, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(cacheFolder, FIT_CACHE_FILE_NAME))
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS fits (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, '
+                                    'rows INTEGER, k REAL, t0 REAL, tEnv REAL, rmse REAL)')
+
+    '''
+    load function returns a dictionary of relative path mapped to the
+    fingerprint (size and modification time) and the fit results
+    '''
+    def load(self):
+        return {row[0]: ((row[1], row[2]), row[3:]) for row in self.connection.execute('SELECT * FROM fits')}
+
+    '''
+    store function takes a list of (relative path, (size, modification
+    time), fit results) tuples and stores them
+    '''
+    def store(self, results):
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO fits VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                        [(path,) + tuple(fingerprint) + tuple(fit) for path, fingerprint, fit in results])
+
+    '''
+    close function closes the fit cache database
+    '''
+    def close(self):
+        self.connection.close()
+
+
+'''
+fitFolder function fits Newton's law of cooling to every data file in a folder
+(and its sub folders if recursive is True) using a pool of processes
+Files whose fingerprint matches the cache are not fitted again unless refit
+is True
+
+This function returns a list of fit results (see FIT_COLUMNS) sorted by path
+'''
+def fitFolder(folderPath, recursive=True, refit=False, workers=None):
+    folderPath = os.path.abspath(folderPath)
+    if recursive:
+        files = indexHandler.scanFolder(folderPath, folderPath)[0]
+    else:
+        files = {entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns) for entry in os.scandir(folderPath)
+                 if entry.is_file() and storageHandler.isDataFile(entry.name)}
+        # A run converted to a columnar format is only fitted once
+        preferred = storageHandler.preferredDataFiles({name: mtime for name, (size, mtime) in files.items()})
+        files = {name: stat for name, stat in files.items() if name in preferred}
+
+    cache = fitCache(folderPath)
+    cachedFits = {} if refit else cache.load()
+
+    # Files which are new or have changed since they were fitted
+    pending = sorted(path for path, fingerprint in files.items()
+                     if path not in cachedFits or cachedFits[path][0] != fingerprint)
+
+    if pending:
+        filePaths = [os.path.join(folderPath, path) for path in pending]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            fits = list(executor.map(fitFile, filePaths, chunksize=max(len(filePaths) // (8 * (workers or os.cpu_count() or 1)), 1)))
+        newFits = [(path, files[path], fit) for path, fit in zip(pending, fits)]
+        cache.store(newFits)
+        cachedFits.update({path: (fingerprint, fit) for path, fingerprint, fit in newFits})
+    cache.close()
+
+    return [(path,) + tuple(cachedFits[path][1]) for path in sorted(files)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit Newton's law of cooling to every csv file in a folder")
+    parser.add_argument('folder', help='folder containing the csv files')
+    parser.add_argument('--recursive', action='store_true', help='include all sub folders')
+    parser.add_argument('--refit', action='store_true', help='ignore the cached results')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--output', help='write the results to this csv file')
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    results = fitFolder(arguments.folder, arguments.recursive, arguments.refit, arguments.workers)
+    elapsed = time.perf_counter() - start
+
+    if arguments.output:
+        with open(arguments.output, 'w', newline='') as outputFile:
+            writer = csv.writer(outputFile)
+            writer.writerow(FIT_COLUMNS)
+            writer.writerows(results)
+    else:
+        print('{:<40} {:>10} {:>10} {:>8} {:>8} {:>8}'.format(*FIT_COLUMNS))
+        for result in results:
+            print('{:<40} {:>10} {:>10.5f} {:>8.2f} {:>8.2f} {:>8.3f}'.format(*result))
+
+    print('Fitted {} files in {:.2f} s'.format(len(results), elapsed))
@@ -0,0 +1,86 @@
+'''
+Array Handler Module
+This module provides a NumPy array which can be appended to one value at a
+time, like a list, while storing the values compactly with a fixed type
+'''
+
+import numpy
+
+# Number of values the array can hold before it has to grow for the first time
+DEFAULT_CAPACITY = 1024
+# Factor by which the capacity grows once the array is full
+GROWTH_FACTOR = 2
+
+
+'''
+growableArray class holds values of a single NumPy type in a buffer which
+doubles in size whenever it is full
+Appending is O(1) on average since the values are only copied when the
+buffer grows
+'''
+class growableArray:
+
+    '''
+    growableArray class constructor takes the NumPy type of the values and
+    the initial capacity and allocates an empty buffer
+    '''
+    def __init__(self, dtype, capacity=DEFAULT_CAPACITY):
+        self.buffer = numpy.empty(max(int(capacity), 1), dtype=dtype)
+        self.size = 0
+
+    '''
+    __len__ function returns the number of values in the array
+    '''
+    def __len__(self):
+        return self.size
+
+    '''
+    __getitem__ function returns the value at the given position
+    '''
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    '''
+    append function adds a value at the end of the array, growing the
+    buffer if it is full
+    '''
+    def append(self, value):
+        if self.size == len(self.buffer):
+            self.reserve(len(self.buffer) * GROWTH_FACTOR)
+        self.buffer[self.size] = value
+        self.size += 1
+
+    '''
+    extend function adds all the values of a sequence at the end of the
+    array, growing the buffer once if required
+    '''
+    def extend(self, values):
+        values = numpy.asarray(values, dtype=self.buffer.dtype)
+        newSize = self.size + len(values)
+        if newSize > len(self.buffer):
+            self.reserve(max(newSize, len(self.buffer) * GROWTH_FACTOR))
+        self.buffer[self.size:newSize] = values
+        self.size = newSize
+
+    '''
+    reserve function grows the buffer so it can hold at least the given
+    number of values without growing again
+    '''
+    def reserve(self, capacity):
+        if capacity > len(self.buffer):
+            newBuffer = numpy.empty(capacity, dtype=self.buffer.dtype)
+            newBuffer[:self.size] = self.buffer[:self.size]
+            self.buffer = newBuffer
+
+    '''
+    clear function removes all the values but keeps the buffer
+    '''
+    def clear(self):
+        self.size = 0
+
+    '''
+    view function returns a NumPy view of the values in the array
+    The view is only valid until the array grows
+    '''
+    def view(self):
+        return self.buffer[:self.size]
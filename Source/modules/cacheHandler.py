@@ -0,0 +1,162 @@
+'''
+Cache Handler Module
+This module keeps recently parsed time and temperature data in memory so that
+plotting the same file again does not parse the csv file from scratch
+'''
+
+import os
+import threading
+from collections import OrderedDict
+
+# Default memory limit of the dataset cache in megabytes
+# This can be changed with the TEACUP_CACHE_MB environment variable
+DEFAULT_CACHE_MB = 256
+
+
+'''
+fileFingerprint function takes a file path as an input and returns a tuple
+of the normalized absolute path, the modification time (in nanoseconds) and
+the size of the file
+Any change to the file contents changes the modification time or the size
+so the fingerprint can be used to check if cached data is still valid
+'''
+def fileFingerprint(filePath):
+    # Normalize the path so different spellings of the same file match
+    normPath = os.path.normcase(os.path.abspath(os.path.normpath(filePath)))
+    # Read the modification time and size of the file
+    fileStat = os.stat(normPath)
+
+    return (normPath, fileStat.st_mtime_ns, fileStat.st_size)
+
+
+'''
+datasetCache class holds parsed time and temperature arrays in memory
+Entries are keyed by file fingerprint and the least recently used entries
+are evicted once the total size of the arrays exceeds the memory limit
+
+The cache keeps hit, miss and eviction counters which can be read with
+the stats function
+'''
+class datasetCache:
+
+    '''
+    datasetCache class constructor takes the memory limit in bytes and
+    initializes an empty cache
+    '''
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.currentBytes = 0
+        # Ordered dictionary of normalized path -> (fingerprint, xData, yData)
+        # The most recently used entry is kept at the end
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # The cache is shared between the GUI and any worker threads
+        self.lock = threading.Lock()
+
+    '''
+    get function takes a file fingerprint and returns the cached time and
+    temperature arrays if the file has not changed since it was cached
+    This function returns None if the file is not in the cache
+    '''
+    def get(self, fingerprint):
+        with self.lock:
+            entry = self.entries.get(fingerprint[0])
+
+            # Drop entries for files which have changed since they were cached
+            if entry is not None and entry[0] != fingerprint:
+                self.removeEntry(fingerprint[0])
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # Mark the entry as the most recently used
+            self.entries.move_to_end(fingerprint[0])
+            self.hits += 1
+            return entry[1], entry[2]
+
+    '''
+    put function takes a file fingerprint and the parsed time and temperature
+    arrays and adds them to the cache, evicting the least recently used entries
+    if required
+    The arrays are marked read only since they are shared with every caller
+
+    This function returns the (read only) time and temperature arrays
+    '''
+    def put(self, fingerprint, xData, yData):
+        xData.setflags(write=False)
+        yData.setflags(write=False)
+        entryBytes = xData.nbytes + yData.nbytes
+
+        with self.lock:
+            # Replace any older entry of the same file
+            self.removeEntry(fingerprint[0])
+
+            # Data bigger than the whole cache is not cached at all
+            if entryBytes > self.maxBytes:
+                return xData, yData
+
+            self.entries[fingerprint[0]] = (fingerprint, xData, yData)
+            self.currentBytes += entryBytes
+            self.evictToLimit()
+
+        return xData, yData
+
+    '''
+    setMaxBytes function updates the memory limit of the cache and evicts
+    the least recently used entries if the cache is now over the limit
+    '''
+    def setMaxBytes(self, maxBytes):
+        with self.lock:
+            self.maxBytes = maxBytes
+            self.evictToLimit()
+
+    '''
+    clear function removes all the entries from the cache
+    The hit, miss and eviction counters are not reset
+    '''
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.currentBytes = 0
+
+    '''
+    stats function returns a dictionary with the hit, miss and eviction
+    counters along with the number of entries and the memory in use
+    '''
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self.entries),
+                    'bytes': self.currentBytes,
+                    'maxBytes': self.maxBytes
+                    }
+
+    '''
+    removeEntry function removes the entry for the given path if it exists
+    The caller must hold the lock
+    '''
+    def removeEntry(self, normPath):
+        entry = self.entries.pop(normPath, None)
+        if entry is not None:
+            self.currentBytes -= entry[1].nbytes + entry[2].nbytes
+
+    '''
+    evictToLimit function removes the least recently used entries until
+    the cache is within the memory limit
+    The caller must hold the lock
+    '''
+    def evictToLimit(self):
+        while self.currentBytes > self.maxBytes and self.entries:
+            normPath = next(iter(self.entries))
+            self.removeEntry(normPath)
+            self.evictions += 1
+
+
+# Cache shared by the whole application
+dataCache = datasetCache(int(float(os.environ.get('TEACUP_CACHE_MB', DEFAULT_CACHE_MB)) * 1024 * 1024))
@@ -0,0 +1,137 @@
+'''
+Decimation Handler Module
+This module reduces large time vs. temperature data sets to the few points
+which are actually visible on the screen
+
+The visible x range is split into one bucket per pixel and only the minimum
+and maximum temperature of every bucket is kept. Drawing the reduced data
+looks the same as drawing every sample since all the peaks are preserved,
+but it costs a small fixed number of points whatever the size of the data
+'''
+
+import numpy
+
+from modules import arrayHandler
+
+# Data sets with fewer points than this many per bucket are not reduced
+MIN_POINTS_PER_BUCKET = 4
+
+# Number of buckets every block of a streamed file is reduced to
+STREAM_BLOCK_BUCKETS = 2048
+# Maximum number of points kept for a streamed file
+STREAM_MAX_POINTS = 200000
+
+
+'''
+isSorted function takes an array and returns True if its values never
+decrease. Decimation uses a binary search on sorted time data to find
+the visible range quickly
+'''
+def isSorted(xData):
+    return len(xData) < 2 or bool(numpy.all(xData[1:] >= xData[:-1]))
+
+
+'''
+minMaxDecimate function takes the time and temperature arrays, the visible
+x range and the number of buckets (usually the width of the plot in pixels)
+and returns the reduced time and temperature arrays
+
+Only the points inside the visible range (plus one point on either side so
+lines leave the plot at the right angle) are kept. The range is split into
+equal sized buckets and the minimum and maximum temperature of every bucket
+are returned in their original order
+
+If xSorted is False the whole data set is reduced, ignoring the x range
+'''
+def minMaxDecimate(xData, yData, xMin, xMax, bucketCount, xSorted=True):
+    # Find the visible range including one point on either side
+    if xSorted:
+        start = max(int(numpy.searchsorted(xData, xMin, 'left')) - 1, 0)
+        stop = min(int(numpy.searchsorted(xData, xMax, 'right')) + 1, len(xData))
+    else:
+        start = 0
+        stop = len(xData)
+
+    bucketCount = max(int(bucketCount), 1)
+    pointCount = stop - start
+
+    # Small ranges are returned as they are
+    if pointCount <= bucketCount * MIN_POINTS_PER_BUCKET:
+        return xData[start:stop], yData[start:stop]
+
+    # Split the range into equal sized buckets
+    # The points left over at the end form one more (smaller) bucket
+    bucketSize = pointCount // bucketCount
+    fullStop = start + bucketCount * bucketSize
+    buckets = numpy.asarray(yData[start:fullStop]).reshape(bucketCount, bucketSize)
+
+    # Index of the minimum and maximum of every bucket
+    bucketStart = start + numpy.arange(bucketCount) * bucketSize
+    minIndex = bucketStart + buckets.argmin(axis=1)
+    maxIndex = bucketStart + buckets.argmax(axis=1)
+
+    # Keep the minimum and maximum of every bucket in their original order
+    indices = numpy.empty(bucketCount * 2, dtype=numpy.int64)
+    indices[0::2] = numpy.minimum(minIndex, maxIndex)
+    indices[1::2] = numpy.maximum(minIndex, maxIndex)
+
+    # Add the left over bucket and the first and last points of the range
+    extra = []
+    if fullStop < stop:
+        tail = numpy.asarray(yData[fullStop:stop])
+        extra = sorted({fullStop + int(tail.argmin()), fullStop + int(tail.argmax())})
+    indices = numpy.concatenate(([start], indices, extra, [stop - 1])).astype(numpy.int64)
+    # Remove the duplicates where the first or last point of the range is also a bucket minimum or maximum
+    indices = indices[numpy.concatenate(([True], indices[1:] != indices[:-1]))]
+
+    return xData[indices], yData[indices]
+
+
+
+'''
+streamAccumulator class collects the reduced blocks of a file which is read
+in chunks, so the whole file can be plotted without ever holding it in memory
+Every block is reduced to a fixed number of buckets as it arrives. Once the
+collected points exceed the maximum they are reduced again to half of it, so
+the memory used stays bounded whatever the size of the file. Reducing the
+minimum and maximum points keeps every peak of the data
+'''
+class streamAccumulator:
+
+    '''
+    streamAccumulator class constructor takes the number of buckets per block
+    and the maximum number of points to keep
+    '''
+    def __init__(self, blockBuckets=STREAM_BLOCK_BUCKETS, maxPoints=STREAM_MAX_POINTS):
+        self.blockBuckets = blockBuckets
+        self.maxPoints = maxPoints
+        self.xData = arrayHandler.growableArray(numpy.float64)
+        self.yData = arrayHandler.growableArray(numpy.float64)
+        self.rowCount = 0
+
+    '''
+    add function takes the time and temperature arrays of the next block,
+    reduces them and adds them to the collected points
+    '''
+    def add(self, xBlock, yBlock):
+        self.rowCount += len(xBlock)
+        xReduced, yReduced = minMaxDecimate(xBlock, yBlock, 0, 0, self.blockBuckets, False)
+        self.xData.extend(xReduced)
+        self.yData.extend(yReduced)
+
+        # Reduce the collected points again once there are too many of them
+        if len(self.xData) > self.maxPoints:
+            xReduced, yReduced = minMaxDecimate(self.xData.view(), self.yData.view(), 0, 0,
+                                                self.maxPoints // 4, False)
+            xReduced, yReduced = xReduced.copy(), yReduced.copy()
+            self.xData.clear()
+            self.yData.clear()
+            self.xData.extend(xReduced)
+            self.yData.extend(yReduced)
+
+    '''
+    snapshot function returns copies of the collected time and temperature
+    points, which can be handed to another thread while more blocks arrive
+    '''
+    def snapshot(self):
+        return self.xData.view().copy(), self.yData.view().copy()
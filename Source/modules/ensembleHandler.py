@@ -0,0 +1,172 @@
+'''
+Ensemble Handler Module
+This module summarizes many runs (time vs. temperature curves) at once
+
+Every run is resampled onto a common elapsed time grid with a single call to
+numpy.interp: the runs are laid end to end by shifting each one along the
+time axis, so one interpolation covers all of them. The mean, median and
+percentile bands of every grid point are then found in one NumPy pass over
+the resampled matrix (one row per run). Grid points outside the time range
+of a run are NaN in its row and do not count towards the statistics
+'''
+
+import warnings
+
+import numpy
+
+from modules import decimationHandler
+
+# Number of points of the common time grid
+GRID_POINTS = 1000
+# Percentiles computed at every grid point. The 50th is the median and the
+# outer pairs are drawn as bands
+PERCENTILES = (5, 25, 50, 75, 95)
+# Largest number of samples interpolated in one call, so resampling hundreds
+# of long runs does not concatenate all of them at once
+MAX_BATCH_POINTS = 10000000
+
+
+'''
+prepareRun function takes the time and temperature arrays of a run and
+returns them sorted by time without the samples which are not numbers
+'''
+def prepareRun(xData, yData):
+    xData = numpy.asarray(xData, dtype=numpy.float64)
+    yData = numpy.asarray(yData, dtype=numpy.float64)
+    valid = numpy.isfinite(xData) & numpy.isfinite(yData)
+    if not valid.all():
+        xData = xData[valid]
+        yData = yData[valid]
+
+    if not decimationHandler.isSorted(xData):
+        order = numpy.argsort(xData, kind='stable')
+        xData = xData[order]
+        yData = yData[order]
+
+    return xData, yData
+
+
+'''
+resampleRuns function takes a list of prepared runs (sorted time and
+temperature arrays) and the time grid, and returns a matrix with one row per
+run holding its temperature at every grid point (NaN outside the run)
+'''
+def resampleRuns(runs, grid):
+    resampled = numpy.full((len(runs), len(grid)), numpy.nan)
+    if not runs or not len(grid):
+        return resampled
+
+    # Shift between two runs laid end to end, larger than any run and the grid
+    xLow = min([grid[0]] + [xData[0] for xData, yData in runs if len(xData)])
+    xHigh = max([grid[-1]] + [xData[-1] for xData, yData in runs if len(xData)])
+    shift = 2 * (xHigh - xLow) + 1
+
+    start = 0
+    while start < len(runs):
+        # Take as many runs as fit in one batch (at least one)
+        stop = start + 1
+        batchPoints = len(runs[start][0])
+        while stop < len(runs) and batchPoints + len(runs[stop][0]) <= MAX_BATCH_POINTS:
+            batchPoints += len(runs[stop][0])
+            stop += 1
+
+        batch = [(index, runs[index]) for index in range(start, stop) if len(runs[index][0])]
+        if batch:
+            offsets = numpy.array([position * shift for position in range(len(batch))])
+            xJoined = numpy.concatenate([xData + offset for offset, (index, (xData, yData)) in zip(offsets, batch)])
+            yJoined = numpy.concatenate([yData for index, (xData, yData) in batch])
+
+            # Interpolate every run at every grid point in one call
+            values = numpy.interp((grid[None, :] + offsets[:, None]).ravel(), xJoined, yJoined).reshape(len(batch), len(grid))
+
+            # Blank the grid points outside each run
+            xFirst = numpy.array([xData[0] for index, (xData, yData) in batch])
+            xLast = numpy.array([xData[-1] for index, (xData, yData) in batch])
+            values[(grid[None, :] < xFirst[:, None]) | (grid[None, :] > xLast[:, None])] = numpy.nan
+            resampled[[index for index, run in batch]] = values
+
+        start = stop
+
+    return resampled
+
+
+'''
+ensembleStatistics function takes the resampled matrix and returns a
+dictionary with the mean, the number of runs and every percentile (keyed by
+the percentile number) at every grid point
+'''
+def ensembleStatistics(resampled):
+    with warnings.catch_warnings():
+        # Grid points which no run covers give NaN without a warning
+        warnings.simplefilter('ignore', RuntimeWarning)
+        percentiles = numpy.nanpercentile(resampled, PERCENTILES, axis=0)
+        statistics = {'mean': numpy.nanmean(resampled, axis=0), 'count': numpy.sum(numpy.isfinite(resampled), axis=0)}
+
+    statistics.update(zip(PERCENTILES, percentiles))
+    return statistics
+
+
+'''
+ensemble class collects runs and keeps their resampled rows, so adding a run
+only resamples the new run unless the time grid has to grow
+'''
+class ensemble:
+
+    '''
+    ensemble class constructor takes the number of points of the time grid
+    '''
+    def __init__(self, gridPoints=GRID_POINTS):
+        self.gridPoints = gridPoints
+        self.clear()
+
+    '''
+    clear function removes all the runs
+    '''
+    def clear(self):
+        self.runs = dict()
+        self.rows = dict()
+        self.grid = None
+
+    '''
+    __len__ function returns the number of runs
+    '''
+    def __len__(self):
+        return len(self.runs)
+
+    '''
+    __contains__ function returns True if a run with the given key was added
+    '''
+    def __contains__(self, key):
+        return key in self.runs
+
+    '''
+    add function takes a key (like the file path) and the time and
+    temperature arrays of a run and adds (or replaces) the run
+    '''
+    def add(self, key, xData, yData):
+        self.runs[key] = prepareRun(xData, yData)
+        self.rows.pop(key, None)
+
+    '''
+    statistics function returns the time grid and the statistics of every
+    grid point (see ensembleStatistics), or None if there are no runs with
+    data
+    The grid spans all the runs. Only runs added since the last call are
+    resampled, unless the grid has changed
+    '''
+    def statistics(self):
+        runs = [run for run in self.runs.values() if len(run[0])]
+        if not runs:
+            return None
+
+        grid = numpy.linspace(min(xData[0] for xData, yData in runs), max(xData[-1] for xData, yData in runs), self.gridPoints)
+        if self.grid is None or not numpy.array_equal(grid, self.grid):
+            self.grid = grid
+            self.rows.clear()
+
+        missing = [key for key in self.runs if key not in self.rows]
+        if missing:
+            resampled = resampleRuns([self.runs[key] for key in missing], grid)
+            self.rows.update(zip(missing, resampled))
+
+        return grid, ensembleStatistics(numpy.array([self.rows[key] for key in self.runs]))
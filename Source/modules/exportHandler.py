@@ -0,0 +1,145 @@
+'''
+Export Handler Module
+This module renders a snapshot of the plot into a PNG, SVG or PDF file
+
+A snapshot holds everything needed to draw the plot again without the GUI:
+the axes limits, and the label, color, line style and data of every trace
+(already reduced to the width of the exported image, see exportSnapshot in
+the plot and graph handler modules) along with the summary of the ensemble
+plot. It only holds plain values and arrays, so it can be sent to another
+process
+
+The export runs on a separate process (see taskHandler.exportRunner) with
+the Agg backend for PNG files and the vector backends for SVG and PDF files,
+so rasterizing many traces at a high resolution never blocks the GUI. The
+progress is sent back through a queue
+
+It does not depend on Qt
+'''
+
+import os
+
+import numpy
+
+from modules import plotStyle
+
+# Formats which can be exported
+EXPORT_FORMATS = ['png', 'svg', 'pdf']
+# Number of traces drawn between two progress reports
+PROGRESS_TRACES = 50
+
+
+'''
+newSnapshot function takes the x and y axes limits of the plot and returns
+an empty snapshot
+Traces are added with addTrace and the ensemble summary with setEnsemble
+'''
+def newSnapshot(xLimits, yLimits):
+    return {'xlim': tuple(xLimits), 'ylim': tuple(yLimits), 'traces': [], 'ensemble': None}
+
+
+'''
+addTrace function adds a trace (legend label, color, matplotlib line style
+and the reduced time and temperature arrays) to a snapshot
+'''
+def addTrace(snapshot, label, color, style, xData, yData):
+    snapshot['traces'].append((label, color, style, numpy.asarray(xData), numpy.asarray(yData)))
+
+
+'''
+setEnsemble function adds the summary of the ensemble plot (time grid,
+statistics keyed by percentile and 'mean', legend labels) to a snapshot
+'''
+def setEnsemble(snapshot, grid, statistics, labels):
+    snapshot['ensemble'] = (grid, statistics, labels)
+
+
+'''
+drawEnsemble function draws the summary of the ensemble plot like the plot
+canvas does: the median, the mean and the percentile bands
+This function returns the artists to list in the legend
+'''
+def drawEnsemble(axes, grid, statistics, labels):
+    median, = axes.plot(grid, statistics[50], '-', color=plotStyle.ENSEMBLE_COLOR, linewidth=2, label=labels[0])
+    mean, = axes.plot(grid, statistics['mean'], '--', color=plotStyle.ENSEMBLE_COLOR, linewidth=1, label=labels[1])
+    artists = [median, mean]
+    for (lower, upper, opacity), label in zip(plotStyle.ENSEMBLE_BANDS, labels[2:]):
+        artists.append(axes.fill_between(grid, statistics[lower], statistics[upper], color=plotStyle.ENSEMBLE_COLOR,
+                                         alpha=opacity, linewidth=0, label=label))
+
+    return artists
+
+
+'''
+renderSnapshot function takes a snapshot, the path and format of the file
+to write, the size of the image (in inches) and its resolution (dots per
+inch) and draws the plot into the file
+The optional progress function is called with the progress in percent and
+a status message
+The image is written to a temporary file first and then renamed, so a
+failed export never leaves a partial file behind
+'''
+def renderSnapshot(snapshot, filePath, outputFormat, width, height, dpi, progress=None):
+    # Import matplotlib with the backend of the format, without Qt
+    from matplotlib.figure import Figure
+    if 'pdf' == outputFormat:
+        from matplotlib.backends.backend_pdf import FigureCanvasPdf as FigureCanvas
+    elif 'svg' == outputFormat:
+        from matplotlib.backends.backend_svg import FigureCanvasSVG as FigureCanvas
+    else:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+
+    if progress is None:
+        progress = lambda percent, message: None
+
+    progress(0, 'Drawing')
+    figure = Figure(figsize=(width, height), dpi=dpi)
+    FigureCanvas(figure)
+    axes = figure.add_subplot(111)
+    plotStyle.styleFigure(figure)
+    plotStyle.styleAxes(axes)
+
+    lines = []
+    if snapshot['ensemble'] is not None:
+        lines.extend(drawEnsemble(axes, *snapshot['ensemble']))
+
+    traces = snapshot['traces']
+    for number, (label, color, style, xData, yData) in enumerate(traces):
+        line, = axes.plot(xData, yData, style, color=color, label=label)
+        lines.append(line)
+        if number % PROGRESS_TRACES == 0:
+            progress(5 + 45 * number // max(len(traces), 1), 'Drawing')
+
+    if lines:
+        plotStyle.addLegend(axes, lines)
+    axes.set_xlim(snapshot['xlim'])
+    axes.set_ylim(snapshot['ylim'])
+
+    progress(50, 'Writing ' + outputFormat.upper())
+    tempPath = filePath + '.tmp'
+    try:
+        figure.savefig(tempPath, format=outputFormat, dpi=dpi)
+        os.replace(tempPath, filePath)
+    finally:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+    progress(100, 'Done')
+
+    return filePath
+
+
+'''
+renderProcess function runs on the export process. It takes the queue the
+job arrives on and the queue the progress messages are sent back on
+Every message is a tuple starting with 'progress' (percent and status),
+'finished' (file path) or 'failed' (error message)
+'''
+def renderProcess(jobQueue, messageQueue):
+    try:
+        snapshot, filePath, outputFormat, width, height, dpi = jobQueue.get()
+        renderSnapshot(snapshot, filePath, outputFormat, width, height, dpi,
+                       lambda percent, message: messageQueue.put(('progress', percent, message)))
+    except Exception as error:
+        messageQueue.put(('failed', str(error)))
+    else:
+        messageQueue.put(('finished', filePath))
@@ -1,17 +1,41 @@
 '''
 File Handler Module
 This module handles all folder selection and read/write operations to csv files
+Columnar files (Parquet and Arrow IPC) are read and written through the
+storage handler module, readData and writeData pick the format from the file
+extension
+
+pandas is only imported by the functions which parse or write csv files, so
+starting the application does not wait for it
 '''
 
+import io
 import os
 import random
-import pandas
+import numpy
 from datetime import datetime
 from PyQt5.QtWidgets import QFileDialog
 
-# Empty list to hold the list of csv files in the selected folder
+from modules import cacheHandler
+from modules import sidecarHandler
+from modules import indexHandler
+from modules import storageHandler
+from modules import rangeHandler
+from modules import traceHandler
+
+# Empty list to hold the list of data files in the selected folder
 csvFileList = []
 
+# Time format used by the data logger for the time column
+LOGGER_TIME_FORMAT = '%H:%M:%S'
+# Number of seconds in a day, used to unwrap time stamps at midnight
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Files larger than this are read in chunks and plotted while they are read
+STREAM_THRESHOLD_BYTES = 128 * 1024 * 1024
+# Number of bytes parsed at a time by the chunked reader
+CHUNK_BYTES = 8 * 1024 * 1024
+
 
 '''
 loadData function is used to select the folder containing
@@ -19,27 +43,32 @@ csv files with the temperature data
 
 This functions pops up a open folder dialog and lets the user
 select a folder. Once the folder is selected, the function
-looks for csv files and populates a list with all the csv file names
+refreshes the index of that folder (see the index handler module)
+and populates a list with the relative paths of all the data files
+(csv files, and Parquet and Arrow files if pyarrow is installed) in that
+folder and its sub folders
 
 This function returns the absolute path of the selected folder and the
-list of csv file names in that folder
+list of data file names in that folder
 '''
+@traceHandler.traced('loadData')
 def loadData():
     #Clear the list
     csvFileList.clear()
     # Open a dialog box for the user to select a desired folder
     # Configure the dialog box to display only folders and no files
     dataDir = QFileDialog.getExistingDirectory(None, 'Select data folder', os.path.join(os.path.dirname(__file__), '..'))
-    
-    # Look through all the files in the selected directory 
-    # and add all the csv files to the list
-    for item in os.listdir(dataDir):
-        if(os.path.isfile(os.path.join(dataDir, item))):
-            if item.endswith(".csv"):
-                csvFileList.append(item)
+
+    # Scan the selected directory and its sub directories and
+    # add all the data files to the list
+    if dataDir:
+        folderIndex = indexHandler.folderIndex(dataDir)
+        folderIndex.refresh()
+        csvFileList.extend(folderIndex.paths())
+        folderIndex.close()
 
     # Return the absolute path of the 
-    # selected folder and the list of csv files
+    # selected folder and the list of data files
     return dataDir, csvFileList
 
 
@@ -64,39 +93,393 @@ def selectDirectory():
 '''
 readCSVData function takes a file path as an input (assuming csv file) and reads
 the file as a Pandas data frame
-This function reads the first column into a temporary list and converts it into
-a list of time deltas (in minutes) relative to the first time element in the csv file
-The second column (temperature) is read directly into a different list
+The first column is parsed into date time values in a single vectorized pass and
+converted into the total elapsed time (in minutes) relative to the first time
+element in the csv file. Time stamps without a date (HH:MM:SS) which roll over
+past midnight are unwrapped so the elapsed time keeps increasing
+The second column (temperature) is read directly as floating point values
 
-This function returns the time delta list as xData and temperature list as yData
+This function returns the elapsed time array as xData and temperature array as yData
+(both NumPy float64 arrays)
 '''
+@traceHandler.traced('readCSVData')
 def readCSVData(filePath):
-    # Open the csv file using pandas
-    dataFrame = pandas.read_csv(os.path.normpath(filePath))
-    
-    # Create an empty list for time data
-    xData = list()
-    # Copy the temperature data (second column) into a list
-    yData = dataFrame.temp
-
-    # Read the first column in a date time format
-    timeData = pandas.to_datetime(dataFrame.time)
-    # Iterate through each time element in the first columm
-    for time in timeData:
-        # Calculate the time delta in minutes (hence /60) for each
-        # entry compared to the first entry and add it to the time
-        # data list
-        xData.append((pandas.Timedelta(time - timeData[0]).seconds)/60)
-    
-    # Return the relative time and temperature data lists
+    import pandas
+
+    # Open the csv file using pandas and read only the time and temperature columns
+    with traceHandler.span('readCSVData.parse'):
+        dataFrame = pandas.read_csv(os.path.normpath(filePath), usecols=['time', 'temp'], dtype={'temp': numpy.float64})
+
+    # Copy the temperature data (second column) into a float array
+    yData = dataFrame.temp.to_numpy(dtype=numpy.float64)
+
+    # Return empty arrays if the file has no data rows
+    if not len(dataFrame):
+        return numpy.empty(0, dtype=numpy.float64), yData
+
+    with traceHandler.span('readCSVData.datetime', rows=len(dataFrame)):
+        # Read the first column in a date time format
+        timeData = parseTimeColumn(dataFrame.time)
+        # Calculate the total elapsed seconds for every entry compared
+        # to the first entry in one vectorized operation
+        xData = (timeData - timeData.iloc[0]).dt.total_seconds().to_numpy(dtype=numpy.float64, copy=True)
+
+    # Time stamps without a date jump back by a day at midnight
+    # Add a day to every entry after each of those jumps
+    rollovers = numpy.diff(xData) < -(SECONDS_PER_DAY / 2)
+    if rollovers.any():
+        xData[1:] += numpy.cumsum(rollovers) * SECONDS_PER_DAY
+
+    # Convert the elapsed time to minutes (hence /60)
+    xData /= 60
+
+    # Return the relative time and temperature data arrays
     return xData, yData
 
 
+'''
+readData function takes the path of a data file and returns its elapsed time
+and temperature arrays, reading csv files with readCSVData and columnar files
+(.parquet and .arrow) with the storage handler module
+'''
+def readData(filePath):
+    if storageHandler.columnarFormat(filePath) is not None:
+        return storageHandler.readColumnar(filePath)
+
+    return readCSVData(filePath)
+
+
+'''
+readPlotData function takes a file path as an input and returns the elapsed time
+and temperature arrays of that file
+The data is served from the in memory dataset cache if the file has not changed
+since it was last read. Otherwise the file is read with readFileData and the
+result is added to the cache
+
+The returned arrays are read only since they are shared with the cache
+'''
+@traceHandler.traced('readPlotData')
+def readPlotData(filePath):
+    # Identify the file by its path, modification time and size
+    fingerprint = cacheHandler.fileFingerprint(filePath)
+
+    # Return the cached data if the file has not changed
+    cachedData = cacheHandler.dataCache.get(fingerprint)
+    if cachedData is not None:
+        return cachedData
+
+    # Add the data to the cache
+    return cacheHandler.dataCache.put(fingerprint, *readFileData(filePath, fingerprint))
+
+
+'''
+readFileData function takes a file path and its fingerprint and returns the
+elapsed time and temperature arrays of that file without using the dataset
+cache. The binary sidecar of a csv file is read and, if there is no
+up to date sidecar, the csv file is parsed with readCSVData and a new sidecar
+is written for the next time (unless writeSidecar is False). Columnar files
+are read directly since they need no parsing
+'''
+def readFileData(filePath, fingerprint, writeSidecar=True):
+    if storageHandler.columnarFormat(filePath) is not None:
+        # Columnar files are typed already
+        return storageHandler.readColumnar(filePath)
+
+    # Read the sidecar if it matches the file
+    sidecarData = sidecarHandler.readSidecar(filePath, fingerprint)
+    if sidecarData is not None:
+        return sidecarData
+
+    # Parse the file and write a sidecar for the next time
+    xData, yData = readCSVData(filePath)
+    if writeSidecar:
+        sidecarHandler.writeSidecar(filePath, fingerprint, xData, yData)
+    return xData, yData
+
+
+'''
+readDataset function runs on the worker processes of the bulk loader (see the
+task handler module). It takes a file path and returns the fingerprint of the
+file along with its time and temperature arrays, so the application can add
+them to its own dataset cache
+'''
+def readDataset(filePath):
+    fingerprint = cacheHandler.fileFingerprint(filePath)
+    xData, yData = readFileData(filePath, fingerprint)
+
+    return fingerprint, numpy.asarray(xData), numpy.asarray(yData)
+
+
+'''
+isLargeFile function takes a file path and returns True if the file is too
+large to be read in one go and has to be read with readCSVChunks
+Columnar files are always read in one go
+'''
+def isLargeFile(filePath):
+    return storageHandler.columnarFormat(filePath) is None and os.path.getsize(filePath) > STREAM_THRESHOLD_BYTES
+
+
+'''
+readRangeIndex function takes the path of a data file and returns the time
+index written when the file was read in chunks (see the range handler
+module), or None if the file is not read in chunks, has no up to date index
+or is not sorted by time
+'''
+def readRangeIndex(filePath):
+    if not os.path.isfile(filePath) or not isLargeFile(filePath):
+        return None
+
+    index = rangeHandler.readIndex(filePath, cacheHandler.fileFingerprint(filePath))
+    return index if index is not None and index.isSorted else None
+
+
+'''
+readCSVChunks function takes a file path as an input (assuming csv file) and
+reads the file one block of bytes at a time, so only one block is held in
+memory whatever the size of the file
+Every block is cut after its last complete line and parsed like readCSVData.
+The elapsed time stays relative to the first time element in the file and
+the midnight unwrapping carries over from one block to the next
+
+If an index builder is given (see the range handler module), the position
+and elapsed time of a line are recorded every few hundred kilobytes, so
+parts of the file can later be read with readCSVRange
+
+This is a generator which yields the elapsed time (in minutes) and temperature
+arrays of every block along with the number of bytes read so far and the size
+of the file
+'''
+def readCSVChunks(filePath, chunkBytes=CHUNK_BYTES, indexBuilder=None):
+    filePath = os.path.normpath(filePath)
+    fileSize = os.path.getsize(filePath)
+
+    with open(filePath, 'rb') as csvFile:
+        # The header gives the position of the time and temperature columns
+        columnNames = csvFile.readline().decode().strip().split(',')
+
+        # Time of the first entry, elapsed seconds (before unwrapping) of the
+        # last entry and the offset added after the midnight roll overs so far
+        firstTime = None
+        lastSeconds = None
+        dayOffset = 0.0
+        # Incomplete line left at the end of the previous block
+        remainder = b''
+
+        while True:
+            # Position of the first byte of the data parsed in this pass
+            dataOffset = csvFile.tell() - len(remainder)
+            block = csvFile.read(chunkBytes)
+            if block:
+                # Cut the block after its last complete line
+                data = remainder + block
+                lineEnd = data.rfind(b'\n') + 1
+                data, remainder = data[:lineEnd], data[lineEnd:]
+            else:
+                # Parse whatever is left at the end of the file
+                data, remainder = remainder, b''
+
+            if data.strip():
+                timeData, yData = parseCSVBlock(data, columnNames)
+                if firstTime is None:
+                    firstTime = timeData.iloc[0]
+                seconds = (timeData - firstTime).dt.total_seconds().to_numpy(dtype=numpy.float64, copy=True)
+
+                # Unwrap the roll overs at midnight, including one between the
+                # last entry of the previous block and the first of this one
+                offsets = unwrapOffsets(seconds, lastSeconds, dayOffset)
+                lastSeconds = seconds[-1]
+                dayOffset = offsets[-1]
+
+                # Convert the elapsed time to minutes (hence /60)
+                xData = (seconds + offsets) / 60
+
+                if indexBuilder is not None:
+                    indexBuilder.addBlock(dataOffset, data, firstTime, xData, offsets)
+
+                yield xData, yData, csvFile.tell() - len(remainder), fileSize
+
+            if not block:
+                break
+
+
+'''
+parseCSVBlock function takes a block of complete csv lines (without the
+header) and the column names of the file and returns the parsed time column
+(pandas series of date time values) and the temperature array
+'''
+def parseCSVBlock(data, columnNames):
+    import pandas
+
+    dataFrame = pandas.read_csv(io.BytesIO(data), names=columnNames, header=None,
+                                usecols=['time', 'temp'], dtype={'temp': numpy.float64})
+
+    return parseTimeColumn(dataFrame.time), dataFrame.temp.to_numpy(dtype=numpy.float64)
+
+
+'''
+unwrapOffsets function takes the elapsed seconds (before unwrapping) of a
+block of rows, those of the row before the block (None at the start of the
+file) and the offset added to that row, and returns the number of seconds to
+add to every row of the block after the midnight roll overs
+'''
+def unwrapOffsets(seconds, lastSeconds, dayOffset):
+    steps = numpy.diff(seconds, prepend=seconds[0] if lastSeconds is None else lastSeconds)
+    return dayOffset + numpy.cumsum(steps < -(SECONDS_PER_DAY / 2)) * SECONDS_PER_DAY
+
+
+'''
+readCSVRange function takes a file path (assuming csv file), its time index
+(see the range handler module) and a time range in minutes and reads only
+the rows covering that range
+The file is read from the index entry before the start of the range up to
+the entry after its end, so a few rows outside the range are returned too
+
+This function returns the elapsed time and temperature arrays of the rows
+read, or None if the index can not look up time ranges
+'''
+@traceHandler.traced('readCSVRange')
+def readCSVRange(filePath, index, xMin, xMax):
+    import pandas
+
+    byteRange = index.byteRange(xMin, xMax)
+    if byteRange is None:
+        return None
+    entry, stopOffset = byteRange
+
+    with open(os.path.normpath(filePath), 'rb') as csvFile:
+        columnNames = csvFile.readline().decode().strip().split(',')
+        csvFile.seek(int(index.offsets[entry]))
+        data = csvFile.read(stopOffset - int(index.offsets[entry]))
+
+    if not data.strip():
+        return numpy.empty(0, dtype=numpy.float64), numpy.empty(0, dtype=numpy.float64)
+
+    timeData, yData = parseCSVBlock(data, columnNames)
+    seconds = (timeData - pandas.Timestamp(index.firstTime)).dt.total_seconds().to_numpy(dtype=numpy.float64)
+
+    # Carry on the midnight unwrapping from the row of the index entry
+    dayOffset = index.dayOffsets[entry]
+    offsets = unwrapOffsets(seconds, index.xValues[entry] * 60 - dayOffset, dayOffset)
+
+    return (seconds + offsets) / 60, yData
+
+
+'''
+readCSVSamples function takes a file path (assuming csv file), a number of
+blocks and their size in bytes and reads only that many evenly spaced blocks
+of the file, including its first and last lines, so a preview of a large
+file costs the same however long the file is
+
+If the time index of the file is given (see the range handler module) the
+blocks start on its entries and the elapsed time of every row is exact.
+Otherwise the midnight unwrapping is carried from one block to the next,
+which misses the days skipped between two blocks more than half a day apart
+
+This function returns the elapsed time and temperature arrays of the rows read
+'''
+@traceHandler.traced('readCSVSamples')
+def readCSVSamples(filePath, blockCount, blockBytes, index=None):
+    import pandas
+
+    # Entry of the index (None without index) and bytes of every block
+    blocks = []
+    with open(os.path.normpath(filePath), 'rb') as csvFile:
+        columnNames = csvFile.readline().decode().strip().split(',')
+        dataStart = csvFile.tell()
+        fileSize = os.fstat(csvFile.fileno()).st_size
+
+        if index is not None and len(index):
+            # The last entry is read up to the end of the data
+            entries = numpy.unique(numpy.linspace(0, len(index) - 1, blockCount).round().astype(numpy.int64))
+            for entry in entries:
+                start = int(index.offsets[entry])
+                stop = index.endOffset if entry == entries[-1] else min(start + blockBytes, index.endOffset)
+                csvFile.seek(start)
+                data = csvFile.read(stop - start)
+                if stop < index.endOffset:
+                    data = data[:data.rfind(b'\n') + 1]
+                blocks.append((entry, data))
+        else:
+            # The last block ends at the end of the file
+            starts = numpy.linspace(dataStart, max(fileSize - blockBytes, dataStart), blockCount)
+            for start in numpy.unique(starts.astype(numpy.int64)):
+                csvFile.seek(start)
+                data = csvFile.read(blockBytes)
+                # Drop the incomplete lines at both ends of the block
+                if start > dataStart:
+                    data = data[data.find(b'\n') + 1:]
+                if start + blockBytes < fileSize:
+                    data = data[:data.rfind(b'\n') + 1]
+                blocks.append((None, data))
+
+    firstTime = None if index is None else pandas.Timestamp(index.firstTime)
+    lastSeconds = None
+    dayOffset = 0.0
+    xBlocks = []
+    yBlocks = []
+    for entry, data in blocks:
+        if not data.strip():
+            continue
+
+        timeData, yData = parseCSVBlock(data, columnNames)
+        if firstTime is None:
+            firstTime = timeData.iloc[0]
+        seconds = (timeData - firstTime).dt.total_seconds().to_numpy(dtype=numpy.float64, copy=True)
+
+        # Start the midnight unwrapping from the row of the index entry
+        if entry is not None:
+            dayOffset = index.dayOffsets[entry]
+            lastSeconds = index.xValues[entry] * 60 - dayOffset
+        offsets = unwrapOffsets(seconds, lastSeconds, dayOffset)
+        lastSeconds = seconds[-1]
+        dayOffset = offsets[-1]
+
+        xBlocks.append((seconds + offsets) / 60)
+        yBlocks.append(yData)
+
+    if not xBlocks:
+        return numpy.empty(0, dtype=numpy.float64), numpy.empty(0, dtype=numpy.float64)
+
+    return numpy.concatenate(xBlocks), numpy.concatenate(yBlocks)
+
+
+'''
+parseTimeColumn function converts a column of time strings into date time values
+The time format written by the data logger (HH:MM:SS) is tried first because an
+explicit format is parsed much faster. Any other format falls back to the pandas
+date time parser
+
+This function returns a pandas series of date time values
+'''
+def parseTimeColumn(timeColumn):
+    import pandas
+
+    # Only columns which look like HH:MM:SS are tried with the logger format
+    if len(str(timeColumn.iloc[0])) == 8:
+        try:
+            # Parse using the data logger time format
+            return pandas.to_datetime(timeColumn, format=LOGGER_TIME_FORMAT)
+        except (ValueError, TypeError):
+            pass
+
+    # Let pandas work out the format (full dates, ISO time stamps etc.)
+    return pandas.to_datetime(timeColumn)
+
+
 '''
 writeCSVData function takes file path, time data and temperature data as
 input parameters and writes that data into a csv file
+The time data can be a list of strings or an array of date time values (like
+the local times of a sample store), which are written as ISO time stamps with
+milliseconds in one vectorized call
 '''
+@traceHandler.traced('writeCSVData')
 def writeCSVData(filePath, timeData, tempData):
+    import pandas
+
+    if isinstance(timeData, numpy.ndarray) and numpy.issubdtype(timeData.dtype, numpy.datetime64):
+        timeData = numpy.datetime_as_string(timeData, unit='ms')
+
     # Create a dictionary with time and temperature data lists
     csvData = {'time': timeData,
                 'temp': tempData
@@ -106,6 +489,30 @@ def writeCSVData(filePath, timeData, tempData):
     dataFrame = pandas.DataFrame(csvData, columns=['time', 'temp'])
     # Write to csv file
     dataFrame.to_csv(filePath, index = False, header=True)
+
+
+'''
+writeData function takes file path, time data and temperature data as input
+parameters and writes that data in the format given by the file extension
+Columnar files (.parquet and .arrow) store the time as time stamps, so time
+strings are parsed (and unwrapped at midnight) before they are written, while
+arrays of date time values are written as they are
+'''
+def writeData(filePath, timeData, tempData):
+    import pandas
+
+    if storageHandler.columnarFormat(filePath) is None:
+        writeCSVData(filePath, timeData, tempData)
+        return
+
+    if isinstance(timeData, numpy.ndarray) and numpy.issubdtype(timeData.dtype, numpy.datetime64):
+        timeValues = timeData
+    elif len(timeData):
+        timeValues = storageHandler.unwrapMidnight(
+            parseTimeColumn(pandas.Series(timeData, dtype=object)).to_numpy(dtype='datetime64[ns]'))
+    else:
+        timeValues = numpy.empty(0, dtype='datetime64[ns]')
+    storageHandler.writeColumnar(filePath, timeValues, tempData)
     
     
 
@@ -0,0 +1,307 @@
+'''
+Graph Handler Module
+This module draws the time vs. temperature graphs with pyqtgraph instead of
+matplotlib. It offers the same functions as the plot canvas of the plot
+handler module, so the GUI can use either of them (see plotGroup)
+
+pyqtgraph draws with Qt itself and reduces the data on the fly: every trace
+only processes the points inside the visible x range (clip to view) and
+keeps the minimum and maximum of every pixel (peak downsampling) whenever
+the view changes. This keeps dozens of overlaid traces of millions of points
+responsive while zooming and panning
+'''
+
+import pyqtgraph
+from pyqtgraph.Qt import QtCore
+
+from modules import fileHandler
+from modules import decimationHandler
+from modules import ensembleHandler
+from modules import exportHandler
+from modules import plotStyle
+from modules import traceHandler
+
+# Colors of the traces, the same cycle as matplotlib uses
+TRACE_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+# Traces with at most this many points also get a marker on every point
+# (like the 'o-' line style of the matplotlib plots)
+MAX_SYMBOL_POINTS = 1000
+
+# Draw dark lines on a white background, like the matplotlib plots
+pyqtgraph.setConfigOptions(background='w', foreground='k')
+
+
+'''
+graphCanvas class defines all the functionality required to plot the time
+vs. temperature data with pyqtgraph
+'''
+class graphCanvas(pyqtgraph.PlotWidget):
+
+    '''
+    graphCanvas class constructor initializes the plot by defining the plot
+    title and axes labels
+    '''
+    def __init__(self):
+        super(graphCanvas, self).__init__()
+
+        # Default plot option is configured as Single Plot
+        self.plotOption = 'Single Plot'
+
+        # Registry of every trace on the plot keyed by file path
+        # Each file path maps to a list of its PlotDataItem, the full resolution
+        # time and temperature data and a flag which tells if the time data is sorted
+        self.traces = dict()
+        # Items of the live traces keyed by name
+        self.liveTraces = dict()
+        # Number of traces added since the plot was cleared, used to pick the colors
+        self.colorCount = 0
+
+        # Runs summarized by the ensemble plot keyed by file path, along with the
+        # items drawing the summary. The summary is computed once the event loop
+        # is idle, so adding many runs at once only computes it once
+        self.ensemble = ensembleHandler.ensemble()
+        self.ensembleItems = []
+        self.ensembleTimer = QtCore.QTimer()
+        self.ensembleTimer.setSingleShot(True)
+        self.ensembleTimer.timeout.connect(self.drawEnsemble)
+
+        self.plotItem = self.getPlotItem()
+        self.plotItem.setTitle(plotStyle.PLOT_TITLE)
+        self.plotItem.setLabel('bottom', plotStyle.X_LABEL)
+        self.plotItem.setLabel('left', plotStyle.Y_LABEL)
+        self.plotItem.showGrid(x=True, y=True, alpha=0.3)
+        # Anchor the legend to the upper right corner
+        self.legend = self.plotItem.addLegend(offset=(-10, 10))
+
+    '''
+    paintEvent function is called by Qt for every paint of the plot and
+    times it
+    '''
+    def paintEvent(self, event):
+        with traceHandler.span('canvas.draw', traces=len(self.traces) + len(self.liveTraces)):
+            super(graphCanvas, self).paintEvent(event)
+
+    '''
+    updatePlot function reads the csv file in the given folder on the
+    calling thread and plots it using the plotData function
+    '''
+    @traceHandler.traced('updatePlot')
+    def updatePlot(self, folderPath, fileName):
+        filePath = folderPath + "/" + fileName
+
+        xData, yData = fileHandler.readPlotData(filePath)
+
+        self.plotData(filePath, fileName, xData, yData)
+
+    '''
+    plotData function takes the file path (used to identify the trace), the
+    file name (used in the legend) along with the time and temperature data
+    and plots it
+    If the plot option is selected as single plot, this function clears any
+    previous plots before drawing the new data (unless the only trace on the
+    plot is the same file)
+    If the plot option is selected as ensemble plot, the data is added to the
+    ensemble instead of being drawn as a trace (see drawEnsemble)
+    A file which is already on the plot is updated in place
+    '''
+    @traceHandler.traced('plotData')
+    def plotData(self, filePath, fileName, xData, yData):
+        if 'Single Plot' == self.plotOption and list(self.traces) != [filePath]:
+            self.clearPlot()
+
+        if 'Ensemble Plot' == self.plotOption:
+            self.ensemble.add(filePath, xData, yData)
+            self.ensembleTimer.start(0)
+            return
+
+        trace = self.traces.get(filePath)
+        if trace is not None:
+            # Nothing to do if the same data is already on the plot
+            if trace[1] is xData and trace[2] is yData:
+                return
+            trace[1:] = [xData, yData, decimationHandler.isSorted(xData)]
+            self.setItemData(trace[0], xData, yData, trace[3])
+            return
+
+        xSorted = decimationHandler.isSorted(xData)
+        item = self.newItem(fileName, len(self.traces) + len(self.liveTraces))
+        self.setItemData(item, xData, yData, xSorted)
+        self.traces[filePath] = [item, xData, yData, xSorted]
+        self.updateTitle()
+
+    '''
+    plotBatch function takes a list of (file path, file name, time data,
+    temperature data) tuples and plots all of them, updating the title once
+    If the plot option is selected as single plot, the plot is cleared once
+    and all the files are plotted together
+    '''
+    @traceHandler.traced('plotBatch')
+    def plotBatch(self, batch):
+        if 'Single Plot' == self.plotOption:
+            self.clearPlot()
+
+        if 'Ensemble Plot' == self.plotOption:
+            for filePath, fileName, xData, yData in batch:
+                self.ensemble.add(filePath, xData, yData)
+            self.ensembleTimer.start(0)
+            return
+
+        for filePath, fileName, xData, yData in batch:
+            xSorted = decimationHandler.isSorted(xData)
+            trace = self.traces.get(filePath)
+            if trace is not None:
+                trace[1:] = [xData, yData, xSorted]
+            else:
+                trace = self.traces[filePath] = [self.newItem(fileName, len(self.traces) + len(self.liveTraces)),
+                                                 xData, yData, xSorted]
+            self.setItemData(trace[0], xData, yData, xSorted)
+
+        self.updateTitle()
+
+    '''
+    drawEnsemble function replaces the items of the ensemble plot with the
+    percentile bands, the median and the mean of all the runs
+    The bands are not listed in the legend, the title names them instead
+    '''
+    def drawEnsemble(self):
+        for item in self.ensembleItems:
+            self.plotItem.removeItem(item)
+        self.ensembleItems = []
+
+        with traceHandler.span('ensemble.statistics', runs=len(self.ensemble)):
+            summary = self.ensemble.statistics()
+        if summary is not None:
+            grid, statistics = summary
+            labels = plotStyle.ensembleLabels(len(self.ensemble))
+            color = pyqtgraph.mkColor(plotStyle.ENSEMBLE_COLOR)
+            for lower, upper, opacity in plotStyle.ENSEMBLE_BANDS:
+                color.setAlphaF(opacity)
+                band = pyqtgraph.FillBetweenItem(pyqtgraph.PlotCurveItem(grid, statistics[lower], connect='finite'),
+                                                 pyqtgraph.PlotCurveItem(grid, statistics[upper], connect='finite'),
+                                                 brush=pyqtgraph.mkBrush(color))
+                self.plotItem.addItem(band)
+                self.ensembleItems.append(band)
+            self.ensembleItems.append(self.plotItem.plot(grid, statistics[50], name=labels[0], connect='finite',
+                                                         pen=pyqtgraph.mkPen(plotStyle.ENSEMBLE_COLOR, width=2)))
+            self.ensembleItems.append(self.plotItem.plot(grid, statistics['mean'], name=labels[1], connect='finite',
+                                                         pen=pyqtgraph.mkPen(plotStyle.ENSEMBLE_COLOR, width=1,
+                                                                             style=QtCore.Qt.DashLine)))
+
+        self.updateTitle()
+
+    '''
+    newItem function adds a new empty trace with the next color of the
+    cycle and returns it
+    Only the first MAX_LEGEND_ENTRIES traces are listed in the legend
+    '''
+    def newItem(self, name, traceCount):
+        color = TRACE_COLORS[self.colorCount % len(TRACE_COLORS)]
+        self.colorCount += 1
+        item = self.plotItem.plot(pen=pyqtgraph.mkPen(color, width=1.5), symbolBrush=color, symbolPen=None,
+                                  symbolSize=5, name=name)
+        if traceCount >= plotStyle.MAX_LEGEND_ENTRIES:
+            self.legend.removeItem(item)
+        item.setDownsampling(auto=True, method='peak')
+
+        return item
+
+    '''
+    setItemData function gives a trace its time and temperature data
+    Clipping to the view needs sorted time data, so it is only enabled for
+    sorted data. Markers are only drawn on small traces
+    '''
+    def setItemData(self, item, xData, yData, xSorted):
+        item.setClipToView(xSorted)
+        item.setSymbol('o' if len(xData) <= MAX_SYMBOL_POINTS else None)
+        item.setData(xData, yData)
+
+    '''
+    updateTitle function shows the number of traces in the title once there
+    are more than the legend lists
+    '''
+    def updateTitle(self):
+        traceCount = len(self.traces) + len(self.liveTraces)
+        if traceCount > plotStyle.MAX_LEGEND_ENTRIES:
+            title = '{} ({} of {} traces listed)'.format(plotStyle.PLOT_TITLE, plotStyle.MAX_LEGEND_ENTRIES, traceCount)
+        else:
+            title = plotStyle.PLOT_TITLE
+        if self.ensembleItems:
+            title += ' (bands: ' + ', '.join(plotStyle.ensembleLabels(len(self.ensemble))[2:]) + ')'
+        self.plotItem.setTitle(title)
+
+    '''
+    updateLiveTrace function takes the name of a live trace along with all
+    its time and temperature data so far and draws it
+    The trace is created the first time it is updated
+    '''
+    def updateLiveTrace(self, name, xData, yData):
+        item = self.liveTraces.get(name)
+        if item is None:
+            item = self.liveTraces[name] = self.newItem(name, len(self.traces) + len(self.liveTraces))
+            self.updateTitle()
+        self.setItemData(item, xData, yData, decimationHandler.isSorted(xData))
+
+    '''
+    removeLiveTrace function removes a live trace from the plot
+    '''
+    def removeLiveTrace(self, name):
+        item = self.liveTraces.pop(name, None)
+        if item is not None:
+            self.plotItem.removeItem(item)
+            self.updateTitle()
+
+    '''
+    getTraceData function returns a list with the legend label and the full
+    resolution time and temperature data of every trace on the plot
+    '''
+    def getTraceData(self):
+        return [(item.name(), xData, yData) for item, xData, yData, xSorted in self.traces.values()]
+
+    '''
+    exportSnapshot function takes the width (in pixels) of the image to
+    export and returns a snapshot of the plot (see the export handler module)
+    The traces are reduced for the visible x range and that width, and keep
+    their colors. Traces drawn with markers are exported with markers
+    '''
+    def exportSnapshot(self, width):
+        (xMin, xMax), yLimits = self.plotItem.viewRange()
+        snapshot = exportHandler.newSnapshot((xMin, xMax), yLimits)
+
+        if self.ensembleItems:
+            summary = self.ensemble.statistics()
+            if summary is not None:
+                exportHandler.setEnsemble(snapshot, summary[0], summary[1], plotStyle.ensembleLabels(len(self.ensemble)))
+        traces = [(item.name(), item, xData, yData, xSorted) for item, xData, yData, xSorted in self.traces.values()]
+        for name, item in self.liveTraces.items():
+            xData, yData = item.getOriginalDataset()
+            if xData is not None:
+                traces.append((name, item, xData, yData, decimationHandler.isSorted(xData)))
+        for name, item, xData, yData, xSorted in traces:
+            style = plotStyle.LINE_STYLE if item.opts['symbol'] is not None else '-'
+            exportHandler.addTrace(snapshot, name, item.opts['pen'].color().name(), style,
+                                   *decimationHandler.minMaxDecimate(xData, yData, xMin, xMax, width, xSorted))
+
+        return snapshot
+
+    '''
+    clearPlot function removes all the traces from the plot
+    '''
+    def clearPlot(self):
+        self.plotItem.clear()
+        self.legend.clear()
+        self.traces.clear()
+        self.liveTraces.clear()
+        self.ensemble.clear()
+        self.ensembleItems = []
+        self.ensembleTimer.stop()
+        self.colorCount = 0
+        self.updateTitle()
+
+    '''
+    setPlotOption function reads the text from the radio button selection
+    and updates the plot option variable.
+    This is used to select Single Plot, Combine Plot or Ensemble Plot options
+    '''
+    def setPlotOption(self, radioButtonText):
+        self.plotOption = radioButtonText
@@ -5,12 +5,27 @@ This module defines and handles all the GUI elements and operations
 
 import os
 import sys
+import time
+import threading
 from datetime import datetime
 
 from modules import fileHandler
-from modules import plotHandler
+from modules import taskHandler
+from modules import streamHandler
+from modules import tableHandler
+from modules import listHandler
+from modules import thumbnailHandler
+from modules import indexHandler
+from modules import sensorHandler
+from modules import sampleHandler
+from modules import plotStyle
+from modules import traceHandler
+from modules import exportHandler
 
 from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import QFileSystemWatcher
+from PyQt5.QtCore import pyqtSignal
 from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import QApplication
@@ -21,11 +36,58 @@ from PyQt5.QtWidgets import QVBoxLayout
 from PyQt5.QtWidgets import QHBoxLayout
 from PyQt5.QtWidgets import QRadioButton
 from PyQt5.QtWidgets import QPushButton
-from PyQt5.QtWidgets import QListWidget
+from PyQt5.QtWidgets import QListView
+from PyQt5.QtWidgets import QAbstractItemView
 from PyQt5.QtWidgets import QMainWindow
 from PyQt5.QtWidgets import QLineEdit
-from PyQt5.QtWidgets import QTableWidget
-from PyQt5.QtWidgets import QTableWidgetItem
+from PyQt5.QtWidgets import QTableView
+from PyQt5.QtWidgets import QProgressBar
+from PyQt5.QtWidgets import QMessageBox
+from PyQt5.QtWidgets import QComboBox
+from PyQt5.QtWidgets import QCheckBox
+from PyQt5.QtWidgets import QFrame
+from PyQt5.QtWidgets import QShortcut
+from PyQt5.QtWidgets import QFileDialog
+from PyQt5.QtWidgets import QDialog
+from PyQt5.QtWidgets import QFormLayout
+from PyQt5.QtWidgets import QSpinBox
+from PyQt5.QtWidgets import QDoubleSpinBox
+from PyQt5.QtWidgets import QDialogButtonBox
+
+# Maximum number of rows the file list grows to before it scrolls
+MAX_FILE_LIST_ROWS = 12
+# Time (in milliseconds) the file list has to stop scrolling before the
+# thumbnails of the rows scrolled past are dropped from the queue
+THUMBNAIL_PRUNE_DELAY = 150
+# Time (in milliseconds) a changed folder has to be quiet before it is indexed again
+FOLDER_REFRESH_DELAY = 500
+# Time (in milliseconds) between two redraws of the live traces (about 30 frames per second)
+LIVE_FRAME_INTERVAL = 33
+# Number of operations listed by the performance overlay
+OVERLAY_SPAN_COUNT = 15
+# Time (in milliseconds) between two updates of the performance overlay
+OVERLAY_UPDATE_INTERVAL = 500
+# Key which shows and hides the performance overlay
+OVERLAY_SHORTCUT = 'F12'
+
+# Engines which can draw the plot and the one used by the application
+# The engine can be selected with the environment variable TEACUP_PLOT_ENGINE
+# (or the --plot-engine option of the application)
+PLOT_ENGINES = ['matplotlib', 'pyqtgraph']
+plotEngine = os.environ.get('TEACUP_PLOT_ENGINE', 'matplotlib')
+
+# Plot group of the application window, which owns the plot canvas
+plotArea = None
+
+
+'''
+plotCanvas function returns the plot canvas of the application window
+The plotting modules are only imported once the window has been painted
+(see plotGroup), but the canvas is created right away if it is needed
+before that
+'''
+def plotCanvas():
+    return plotArea.createCanvas()
 
 
 '''
@@ -56,10 +118,86 @@ class fileSelectGroup(QGroupBox):
 
         # Add a list box to display the list of csv files and
         # attach a function to process the selected file
-        self.fileListBox = QListWidget()
-        self.fileListBox.itemClicked.connect(self.fileSelectHandler)
+        # The list is backed by a model which adds the files to the
+        # view in batches as the user scrolls
+        # Several files can be selected with Ctrl and Shift and plotted together
+        self.fileListModel = listHandler.fileListModel()
+        self.fileListBox = QListView()
+        self.fileListBox.setModel(self.fileListModel)
+        self.fileListBox.setUniformItemSizes(True)
+        self.fileListBox.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.fileListBox.clicked.connect(self.fileSelectHandler)
         self.groupElements.addWidget(self.fileListBox)
 
+        # Every file is shown with a sparkline thumbnail of its data
+        # Thumbnails are made on worker threads for the rows in view only
+        # and the row is painted again once its thumbnail is ready
+        self.thumbnailLoader = thumbnailHandler.thumbnailLoader()
+        self.thumbnailLoader.ready.connect(self.fileListModel.updatePath)
+        self.fileListBox.setItemDelegate(listHandler.thumbnailDelegate(self.thumbnailLoader, self.fileListBox))
+        QApplication.instance().aboutToQuit.connect(self.thumbnailLoader.close)
+        # Thumbnails of the rows scrolled past are dropped from the queue
+        # once the list stops scrolling
+        self.thumbnailPruneTimer = QTimer(self)
+        self.thumbnailPruneTimer.setSingleShot(True)
+        self.thumbnailPruneTimer.setInterval(THUMBNAIL_PRUNE_DELAY)
+        self.thumbnailPruneTimer.timeout.connect(self.pruneThumbnails)
+        self.fileListBox.verticalScrollBar().valueChanged.connect(self.thumbnailPruneTimer.start)
+
+        # Add buttons to plot the selected files or all the files at once
+        self.bulkButtons = QHBoxLayout()
+        self.plotSelectedButton = QPushButton('Plot Selected')
+        self.plotSelectedButton.clicked.connect(self.plotSelectedHandler)
+        self.bulkButtons.addWidget(self.plotSelectedButton)
+        self.plotAllButton = QPushButton('Plot All')
+        self.plotAllButton.clicked.connect(self.plotAllHandler)
+        self.bulkButtons.addWidget(self.plotAllButton)
+        self.groupElements.addLayout(self.bulkButtons)
+
+        # Add a label and a progress bar to show the status of the file
+        # being loaded and set them to invisible. These shall be visible
+        # only while a file is being loaded or if loading failed
+        self.loadStatusLabel = QLabel()
+        self.loadStatusLabel.setVisible(False)
+        self.groupElements.addWidget(self.loadStatusLabel)
+        self.loadProgressBar = QProgressBar()
+        self.loadProgressBar.setVisible(False)
+        self.groupElements.addWidget(self.loadProgressBar)
+
+        # Files are read on a worker thread so the window does not
+        # freeze while a large file is loaded
+        # Connect the loader signals to the functions which handle them
+        self.fileLoader = taskHandler.fileLoader()
+        self.fileLoader.progress.connect(self.fileLoadProgressHandler)
+        self.fileLoader.partial.connect(self.fileLoadPartialHandler)
+        self.fileLoader.loaded.connect(self.fileLoadedHandler)
+        self.fileLoader.failed.connect(self.fileLoadFailedHandler)
+
+        # Files plotted together are parsed on a pool of worker processes
+        # Their data is collected as it arrives and plotted at once
+        self.bulkLoader = taskHandler.bulkLoader()
+        self.bulkLoader.loaded.connect(self.bulkLoadedHandler)
+        self.bulkLoader.failed.connect(self.bulkFailedHandler)
+        self.bulkLoader.progress.connect(self.bulkProgressHandler)
+        self.bulkLoader.finished.connect(self.bulkFinishedHandler)
+        self.bulkBatch = []
+        self.bulkErrors = []
+
+        # Index of the csv files in the selected folder. The index is
+        # refreshed on a worker thread
+        self.folderIndex = None
+        self.indexRunner = taskHandler.backgroundRunner()
+        # Watch the selected folder (and its sub folders) for changes
+        self.folderWatcher = QFileSystemWatcher(self)
+        self.folderWatcher.directoryChanged.connect(self.folderChangedHandler)
+        # Folders which changed since the index was last refreshed
+        # The index is refreshed once the folders have been quiet for a moment
+        self.changedFolders = set()
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.setSingleShot(True)
+        self.refreshTimer.setInterval(FOLDER_REFRESH_DELAY)
+        self.refreshTimer.timeout.connect(self.refreshChangedFolders)
+
         # Add a spacer at the bottom to ensure all the GUI elements
         # will be aligned to the top even when the window is resized
         self.groupElements.addStretch(1)
@@ -67,43 +205,288 @@ class fileSelectGroup(QGroupBox):
 
     '''
     openFolderHandler function is responsible for collecting the
-    absolute path and the list of csv file in that location
-    This function calls the loadData function in the file handler
-    module to read the path and file list
-    If the file list is not empty, it populates the list box with
-    the list of csv file names in the selected folder
-    This function resizes the width of the group box based on the
-    maximum characters in the longest file name
-    This function also resizes the height of the file list based on 
-    the total number of csv files in the folder
+    absolute path and the list of csv file in that location and its
+    sub folders
+    This function calls the selectDirectory function in the file handler
+    module to read the path and opens the index of that folder
+    The files already in the index are listed straight away while the
+    index is refreshed on a worker thread
     '''
     def openFolderHandler(self):
-        # Read the folder path and file list from the file handler
-        self.folderpath, self.fileList = fileHandler.loadData()
-        # Clear any existing items in the file list box
-        self.fileListBox.clear()
+        # Read the folder path from the file handler
+        folderPath = fileHandler.selectDirectory()
+        # Do nothing if the dialog was cancelled
+        if not folderPath:
+            return
+        self.folderpath = folderPath
+
+        # Stop loading any file from the previous folder
+        self.fileLoader.cancel()
+        self.bulkLoader.cancel()
+        self.fileListModel.setLoadingPath(None)
+        self.loadStatusLabel.setVisible(False)
+        self.loadProgressBar.setVisible(False)
+        # Drop the thumbnails of the previous folder
+        self.thumbnailLoader.setFolder(self.folderpath)
+
+        # Stop watching the previous folder and close its index
+        if self.folderWatcher.directories():
+            self.folderWatcher.removePaths(self.folderWatcher.directories())
+        self.changedFolders.clear()
+        self.refreshTimer.stop()
+        if self.folderIndex is not None:
+            self.folderIndex.close()
+
+        # Open the index of the folder and show the files it already knows
+        self.folderIndex = indexHandler.folderIndex(self.folderpath)
+        self.showFileList('Indexing folder...', True)
+        # Refresh the index on a worker thread
+        folderIndex = self.folderIndex
+        self.indexRunner.start(folderIndex.refresh,
+                               onFinished=lambda changed: self.indexRefreshedHandler(folderIndex, changed))
+
+    '''
+    showFileList function fills the list box with the files in the index
+    The given message is shown instead if the index has no files
+    The list is replaced if reset is True (a new folder), otherwise only the
+    rows of the files which were added or removed are changed so the
+    selection and the scroll position are kept
+    This function resizes the width of the group box based on the
+    characters in the file names and the height of the file list based on
+    the number of files (up to a maximum)
+    '''
+    def showFileList(self, emptyMessage, reset=False):
+        entries = self.folderIndex.entries()
 
         # If the file list is empty
-        if not self.fileList:
-            # Show a message saying no CSV files in the folder
-            self.fileListBox.addItem('CSV Files not found in the selected folder')
+        if not entries:
+            # Show the message instead of the files
+            self.fileListModel.setMessage(emptyMessage)
         # If the file list is not empty
+        elif reset:
+            self.fileListModel.setEntries(entries)
         else:
-            # Add each file name to the file list box
-            for file in self.fileList:
-                self.fileListBox.addItem(file)
-        
+            self.fileListModel.updateEntries(entries)
+
         self.setMinimumWidth(self.fileListBox.sizeHintForColumn(0) + (20 * self.fileListBox.frameWidth()))
-        self.fileListBox.setMinimumHeight((self.fileListBox.sizeHintForRow(0) * self.fileListBox.count()) + (2 * self.fileListBox.frameWidth()))
+        visibleRows = min(self.fileListModel.rowCount(), MAX_FILE_LIST_ROWS)
+        self.fileListBox.setMinimumHeight((self.fileListBox.sizeHintForRow(0) * visibleRows) + (2 * self.fileListBox.frameWidth()))
+
+    '''
+    pruneThumbnails function drops the queued thumbnails of the files which
+    are no longer in view
+    '''
+    def pruneThumbnails(self):
+        viewRect = self.fileListBox.viewport().rect()
+        firstRow = self.fileListBox.indexAt(viewRect.topLeft()).row()
+        lastRow = self.fileListBox.indexAt(viewRect.bottomLeft()).row()
+        if firstRow < 0:
+            return
+        if lastRow < 0:
+            lastRow = self.fileListModel.rowCount() - 1
+
+        self.thumbnailLoader.keepOnly(set(self.fileListModel.paths[firstRow:lastRow + 1]))
+
+    '''
+    indexRefreshedHandler function updates the file list once the index of
+    a folder has been refreshed and starts watching all its sub folders
+    The rows of new files are then counted on a worker thread
+    '''
+    def indexRefreshedHandler(self, folderIndex, changed):
+        # Ignore the index of a folder which is no longer selected
+        if folderIndex is not self.folderIndex:
+            return
+
+        if changed or self.fileListModel.message is not None:
+            # Thumbnails of changed files are made again (the others are
+            # read back from the disk cache)
+            if changed:
+                self.thumbnailLoader.setFolder(self.folderpath)
+            self.showFileList('CSV Files not found in the selected folder')
+
+        # Watch every folder which is not watched yet
+        watchedFolders = set(self.folderWatcher.directories())
+        newFolders = [folder for folder in folderIndex.folders() if folder not in watchedFolders]
+        if newFolders:
+            self.folderWatcher.addPaths(newFolders)
+
+        # Count the rows of the new files for the tool tips
+        self.indexRunner.start(folderIndex.countMissingRows,
+                               onFinished=lambda counted: self.rowsCountedHandler(folderIndex, counted))
+
+    '''
+    rowsCountedHandler function updates the row counts shown in the tool tips
+    of the file list once they have been counted
+    '''
+    def rowsCountedHandler(self, folderIndex, counted):
+        if folderIndex is self.folderIndex and counted:
+            self.fileListModel.updateRowCounts(folderIndex.entries())
+
+    '''
+    folderChangedHandler function is called by the folder watcher when files
+    are added to or removed from a watched folder
+    The changed folders are collected and refreshed together once they have
+    been quiet for a moment
+    '''
+    def folderChangedHandler(self, folderPath):
+        self.changedFolders.add(folderPath)
+        self.refreshTimer.start()
+
+    '''
+    refreshChangedFolders function refreshes the index for every folder which
+    changed on a worker thread
+    '''
+    def refreshChangedFolders(self):
+        folderIndex = self.folderIndex
+        changedFolders = list(self.changedFolders)
+        self.changedFolders.clear()
+
+        def refreshFolders():
+            changed = False
+            # Only the changed folders are scanned, not their sub folders
+            for folderPath in changedFolders:
+                changed = folderIndex.refresh(folderPath, False) or changed
+            return changed
+
+        self.indexRunner.start(refreshFolders,
+                               onFinished=lambda changed: self.indexRefreshedHandler(folderIndex, changed))
     
     '''
-    fileSelectHandler function reads the line time in the list box and passes the
-    text (assuming csv file name) along with the absolute path of the folder to the
-    plot handler
+    fileSelectHandler function reads the file path of the row clicked in the
+    list box and starts loading the file (assuming csv file name) from the
+    selected folder on a worker thread
+    Selecting another file while a file is still being loaded supersedes the
+    earlier selection (and any files being plotted together)
+    Clicks with Ctrl or Shift only change the selection
+    '''
+    def fileSelectHandler(self, index):
+        if QApplication.keyboardModifiers() & (Qt.ControlModifier | Qt.ShiftModifier):
+            return
+
+        fileName = index.data(listHandler.FILE_PATH_ROLE)
+        # Ignore clicks on the message shown when there are no files
+        if fileName is not None:
+            self.bulkLoader.cancel()
+            # Mark the list item as busy
+            self.fileListModel.setLoadingPath(fileName)
+            # Show the status label and a busy progress bar
+            self.loadStatusLabel.setText('Loading ' + fileName)
+            self.loadStatusLabel.setVisible(True)
+            self.loadProgressBar.setRange(0, 0)
+            self.loadProgressBar.setVisible(True)
+            # Start loading the file
+            self.fileLoader.load(fileName, self.folderpath + "/" + fileName)
+
+    '''
+    fileLoadProgressHandler function updates the progress bar with the progress
+    of the file being loaded
+    A busy progress bar is shown when the progress is not known
+    '''
+    def fileLoadProgressHandler(self, fileName, percent, message):
+        self.loadStatusLabel.setText(message + ' ' + fileName)
+        if percent < 0:
+            self.loadProgressBar.setRange(0, 0)
+        else:
+            self.loadProgressBar.setRange(0, 100)
+            self.loadProgressBar.setValue(percent)
+
+    '''
+    fileLoadPartialHandler function plots the data read so far of a large
+    file which is read in chunks. The trace is extended as more data arrives
+    '''
+    def fileLoadPartialHandler(self, fileName, filePath, xData, yData):
+        plotCanvas().plotData(filePath, fileName, xData, yData)
+
+    '''
+    fileLoadedHandler function passes the loaded data to the plot handler
+    and clears the busy state
+    '''
+    def fileLoadedHandler(self, fileName, filePath, xData, yData):
+        self.fileListModel.setLoadingPath(None)
+        self.loadStatusLabel.setVisible(False)
+        self.loadProgressBar.setVisible(False)
+        self.thumbnailLoader.forget(fileName)
+        plotCanvas().plotData(filePath, fileName, xData, yData)
+
+    '''
+    fileLoadFailedHandler function shows the error message of a file which
+    could not be loaded and clears the busy state
+    '''
+    def fileLoadFailedHandler(self, fileName, message):
+        self.fileListModel.setLoadingPath(None)
+        self.loadStatusLabel.setText('Could not load ' + fileName + ': ' + message)
+        self.loadProgressBar.setVisible(False)
+
+    '''
+    plotSelectedHandler function plots all the files selected in the list
+    box together
     '''
-    def fileSelectHandler(self, item):
-        if (item.text() != 'CSV Files not found in the selected folder'):
-            plotHandler.plotCanvas.updatePlot(self.folderpath, item.text())
+    def plotSelectedHandler(self):
+        indexes = sorted(self.fileListBox.selectionModel().selectedIndexes(), key=lambda index: index.row())
+        self.plotFiles([index.data(listHandler.FILE_PATH_ROLE) for index in indexes])
+
+    '''
+    plotAllHandler function plots all the files of the folder together,
+    including the ones not shown in the list box yet
+    '''
+    def plotAllHandler(self):
+        self.plotFiles(self.fileListModel.paths)
+
+    '''
+    plotFiles function takes a list of file names and starts loading all
+    of them on the bulk loader, superseding any file being loaded
+    '''
+    def plotFiles(self, fileNames):
+        fileNames = [fileName for fileName in fileNames if fileName is not None]
+        if not fileNames:
+            return
+
+        self.fileLoader.cancel()
+        self.fileListModel.setLoadingPath(None)
+        self.bulkBatch = []
+        self.bulkErrors = []
+        self.loadStatusLabel.setText('Loading {} files'.format(len(fileNames)))
+        self.loadStatusLabel.setVisible(True)
+        self.loadProgressBar.setRange(0, len(fileNames))
+        self.loadProgressBar.setValue(0)
+        self.loadProgressBar.setVisible(True)
+        self.bulkLoader.load([(fileName, self.folderpath + "/" + fileName) for fileName in fileNames])
+
+    '''
+    bulkLoadedHandler function collects the data of a file loaded by the
+    bulk loader until all the files are loaded
+    '''
+    def bulkLoadedHandler(self, fileName, filePath, xData, yData):
+        self.bulkBatch.append((filePath, fileName, xData, yData))
+
+    '''
+    bulkFailedHandler function collects the files the bulk loader could not
+    load along with their error messages
+    '''
+    def bulkFailedHandler(self, fileName, message):
+        self.bulkErrors.append(fileName + ': ' + message)
+
+    '''
+    bulkProgressHandler function shows how many files have been loaded
+    '''
+    def bulkProgressHandler(self, doneCount, totalCount):
+        self.loadStatusLabel.setText('Loading {} of {} files'.format(doneCount, totalCount))
+        self.loadProgressBar.setValue(doneCount)
+
+    '''
+    bulkFinishedHandler function plots all the loaded files with a single
+    draw and shows the files which could not be loaded (if any)
+    '''
+    def bulkFinishedHandler(self):
+        batch, self.bulkBatch = self.bulkBatch, []
+        self.loadProgressBar.setVisible(False)
+        if self.bulkErrors:
+            self.loadStatusLabel.setText('Could not load {} files\n{}'.format(len(self.bulkErrors), '\n'.join(self.bulkErrors[:5])))
+        else:
+            self.loadStatusLabel.setVisible(False)
+
+        if batch:
+            plotCanvas().plotBatch(batch)
 
 
 
@@ -142,14 +525,21 @@ class plotSelectButtonGroup(QGroupBox):
         self.combinePlotRadioButton.toggled.connect(self.selectPlotOption)
         self.groupElements.addWidget(self.combinePlotRadioButton)
 
-        # Add a spacer to push the two radio buttons to the left and the
+        # Add radio button for "Ensemble Plot" option, which summarizes
+        # all the selected files with percentile bands instead of one line each
+        self.ensemblePlotRadioButton = QRadioButton("Ensemble Plot")
+        # Connect this button to a function which handles the radio button selection
+        self.ensemblePlotRadioButton.toggled.connect(self.selectPlotOption)
+        self.groupElements.addWidget(self.ensemblePlotRadioButton)
+
+        # Add a spacer to push the radio buttons to the left and the
         # push button to the right
         self.groupElements.addStretch(1)
 
         # Add a button to clear the plot area and connect it to a 
         # function which handles the clear plot operation
         self.clearPlotButton = QPushButton("Clear Plot")
-        self.clearPlotButton.clicked.connect(plotHandler.plotCanvas.clearPlot)
+        self.clearPlotButton.clicked.connect(lambda: plotCanvas().clearPlot())
         self.groupElements.addWidget(self.clearPlotButton) 
 
     '''
@@ -163,22 +553,32 @@ class plotSelectButtonGroup(QGroupBox):
         # If the button is checked
         if radioButton.isChecked():
             # Pass that text to the plot handler
-            plotHandler.plotCanvas.setPlotOption(radioButton.text())
+            plotCanvas().setPlotOption(radioButton.text())
 
 '''
 plotGroup class defines all the GUI elements and operations
 related to the plotting section of the application window
 '''
 class plotGroup(QGroupBox):
+    # Emitted when the group is painted for the first time
+    firstPainted = pyqtSignal()
+    # Emitted once the plot canvas has been created
+    canvasCreated = pyqtSignal()
 
     '''
     plotGroup class constructor initializes the plotting
     section of the application window and arranges all the 
     sub groups in a vertical layout.
     This function also sets the group title
+
+    The plot canvas is not created here. Importing matplotlib and building
+    the figure is slow, so a placeholder is shown until the window has been
+    painted for the first time
     '''
     def __init__(self):
+        global plotArea
         super(plotGroup, self).__init__()
+        plotArea = self
 
         # Set title and vertical layout
         self.setTitle('Data Visualizer')
@@ -187,9 +587,195 @@ class plotGroup(QGroupBox):
 
         # Add the plot select group
         self.groupElements.addWidget(plotSelectButtonGroup())
-        # Add the plot handler group (from plot handler module)
-        self.groupElements.addWidget(plotHandler.plotCanvas())
-        
+        # Add a placeholder which is replaced by the plot canvas
+        self.canvas = None
+        self.placeholder = QLabel('Loading plot...')
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        # Take the size of the figure so the window does not change size later
+        self.placeholder.setMinimumSize(plotStyle.FIGURE_SIZE[0] * plotStyle.FIGURE_DPI,
+                                        plotStyle.FIGURE_SIZE[1] * plotStyle.FIGURE_DPI)
+        self.groupElements.addWidget(self.placeholder, 1)
+        self.painted = False
+
+        # Add a button to export the plot to an image file along with a
+        # progress bar showing the export, which runs on a separate process so
+        # the plot stays responsive
+        # The export row never changes its size (the progress bar stays
+        # visible and holds the status), which would resize the canvas and
+        # redraw every trace while the export runs
+        self.exportRow = QHBoxLayout()
+        self.exportButton = QPushButton('Export Plot...')
+        self.exportButton.clicked.connect(self.exportHandler)
+        self.exportRow.addWidget(self.exportButton)
+        self.exportCancelButton = QPushButton('Cancel')
+        self.exportCancelButton.setEnabled(False)
+        self.exportCancelButton.clicked.connect(self.exportCancelHandler)
+        self.exportRow.addWidget(self.exportCancelButton)
+        self.exportProgressBar = QProgressBar()
+        self.exportProgressBar.setRange(0, 100)
+        self.exportProgressBar.setValue(0)
+        self.exportProgressBar.setFormat('')
+        self.exportRow.addWidget(self.exportProgressBar, 1)
+        self.groupElements.addLayout(self.exportRow)
+        self.exportDialog = exportDialog(self)
+        self.exportRunner = taskHandler.exportRunner()
+        self.exportRunner.progress.connect(self.exportProgressHandler)
+        self.exportRunner.finished.connect(self.exportFinishedHandler)
+        self.exportRunner.failed.connect(self.exportFailedHandler)
+        QApplication.instance().aboutToQuit.connect(self.exportRunner.cancel)
+
+    '''
+    paintEvent function is called by Qt whenever the group is painted
+    After the first paint the plot canvas is created as soon as the event
+    loop is idle
+    '''
+    def paintEvent(self, event):
+        super(plotGroup, self).paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.firstPainted.emit()
+            QTimer.singleShot(0, self.createCanvas)
+
+    '''
+    createCanvas function imports the plotting modules of the selected plot
+    engine and replaces the placeholder with the plot canvas (and the
+    navigation toolbar for matplotlib), unless this was already done
+    matplotlib is used if pyqtgraph is selected but can not be imported
+    This function returns the plot canvas
+    '''
+    def createCanvas(self):
+        if self.canvas is None:
+            toolbar = None
+            if plotEngine == 'pyqtgraph':
+                try:
+                    # The graph handler module imports pyqtgraph
+                    from modules import graphHandler
+                except ImportError as error:
+                    # Tell the user once the canvas is in place, the canvas
+                    # can be created while a file is being plotted
+                    message = 'pyqtgraph is not available, using matplotlib:\n' + str(error)
+                    QTimer.singleShot(0, lambda: QMessageBox.warning(self, 'Plot Engine', message))
+                else:
+                    # pyqtgraph zooms and pans with the mouse, no toolbar is needed
+                    self.canvas = graphHandler.graphCanvas()
+
+            if self.canvas is None:
+                # The plot handler module imports matplotlib
+                from modules import plotHandler
+                # Add the plot handler group (from plot handler module)
+                self.canvas = plotHandler.plotCanvas()
+                # Add the matplotlib navigation toolbar to zoom and pan the plot
+                toolbar = plotHandler.NavigationToolbar(self.canvas, self)
+
+            self.groupElements.replaceWidget(self.placeholder, self.canvas)
+            self.placeholder.deleteLater()
+            if toolbar is not None:
+                self.groupElements.insertWidget(self.groupElements.indexOf(self.canvas) + 1, toolbar)
+            self.canvasCreated.emit()
+
+        return self.canvas
+
+    '''
+    exportHandler function asks for the image format, size and resolution
+    and the file to write, then snapshots the plot and exports it on a
+    separate process
+    '''
+    def exportHandler(self):
+        if self.exportDialog.exec_() != QDialog.Accepted:
+            return
+        outputFormat, width, height, dpi = self.exportDialog.options()
+        filePath, fileFilter = QFileDialog.getSaveFileName(self, 'Export plot', 'plot.' + outputFormat,
+                                                           '{} image (*.{})'.format(outputFormat.upper(), outputFormat))
+        if not filePath:
+            return
+        if not filePath.lower().endswith('.' + outputFormat):
+            filePath += '.' + outputFormat
+
+        # Only the data needed for the width of the image is sent to the export
+        snapshot = self.createCanvas().exportSnapshot(int(width * dpi))
+        self.exportRunner.start(snapshot, filePath, outputFormat, width, height, dpi)
+        self.exportCancelButton.setEnabled(True)
+        self.exportProgressHandler(0, 'Starting export')
+
+    '''
+    exportCancelHandler function stops the export which is running
+    '''
+    def exportCancelHandler(self):
+        self.exportRunner.cancel()
+        self.exportFailedHandler('Cancelled')
+
+    '''
+    exportProgressHandler function shows the progress of the export
+    '''
+    def exportProgressHandler(self, percent, message):
+        self.exportProgressBar.setValue(percent)
+        self.exportProgressBar.setFormat(message + ' (%p%)')
+
+    '''
+    exportFinishedHandler function shows the name of the exported file
+    '''
+    def exportFinishedHandler(self, filePath):
+        self.exportCancelButton.setEnabled(False)
+        self.exportProgressBar.setValue(100)
+        self.exportProgressBar.setFormat('Exported ' + os.path.basename(filePath))
+
+    '''
+    exportFailedHandler function shows why the export did not complete
+    '''
+    def exportFailedHandler(self, message):
+        self.exportCancelButton.setEnabled(False)
+        self.exportProgressBar.setValue(0)
+        self.exportProgressBar.setFormat('Export failed: ' + message)
+
+
+'''
+exportDialog class defines the dialog which asks for the format, size (in
+inches) and resolution of an exported plot
+The choices are kept for the next export
+'''
+class exportDialog(QDialog):
+
+    '''
+    exportDialog class constructor takes the parent widget and adds the
+    option fields in a form layout, starting with the size and resolution
+    of the plot figure
+    '''
+    def __init__(self, parent):
+        super(exportDialog, self).__init__(parent)
+        self.setWindowTitle('Export Plot')
+        self.formLayout = QFormLayout()
+        self.setLayout(self.formLayout)
+
+        self.formatBox = QComboBox()
+        self.formatBox.addItems([outputFormat.upper() for outputFormat in exportHandler.EXPORT_FORMATS])
+        self.formLayout.addRow('Format', self.formatBox)
+        self.widthBox = QDoubleSpinBox()
+        self.heightBox = QDoubleSpinBox()
+        for sizeBox, size in ((self.widthBox, plotStyle.FIGURE_SIZE[0]), (self.heightBox, plotStyle.FIGURE_SIZE[1])):
+            sizeBox.setRange(1, 100)
+            sizeBox.setSuffix(' in')
+            sizeBox.setValue(size)
+        self.formLayout.addRow('Width', self.widthBox)
+        self.formLayout.addRow('Height', self.heightBox)
+        self.dpiBox = QSpinBox()
+        self.dpiBox.setRange(10, 1200)
+        self.dpiBox.setSuffix(' dpi')
+        self.dpiBox.setValue(plotStyle.FIGURE_DPI)
+        self.formLayout.addRow('Resolution', self.dpiBox)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        self.formLayout.addRow(buttons)
+
+    '''
+    options function returns the chosen format (file extension), width and
+    height (in inches) and resolution
+    '''
+    def options(self):
+        return (self.formatBox.currentText().lower(), self.widthBox.value(), self.heightBox.value(),
+                self.dpiBox.value())
+
 
 '''
 dataLoggerGroup class defines all the GUI elements and operations
@@ -206,9 +792,26 @@ class dataLoggerGroup(QGroupBox):
     def __init__(self):
         super(dataLoggerGroup, self).__init__()
 
-        # Empty lists to hold time and temperature data
-        self.timeData = list()
-        self.temperatureData = list()
+        # Writer which streams the samples of the session to disk
+        # This is created when the logging is started
+        # The samples themselves are held by the table model (see the sample
+        # handler module) and handed to the writer in blocks
+        self.sessionWriter = None
+        # Number of samples already handed to the writer
+        self.journalCount = 0
+        # Timer to flush samples which were entered slowly
+        self.flushTimer = QTimer(self)
+        self.flushTimer.setInterval(1000)
+        self.flushTimer.timeout.connect(self.flushTimerHandler)
+
+        # Name of the live trace of the session on the plot
+        self.liveTraceName = None
+        # Timer which draws the live trace once entries have been made
+        # A burst of entries within one frame interval causes a single redraw
+        self.plotTimer = QTimer(self)
+        self.plotTimer.setSingleShot(True)
+        self.plotTimer.setInterval(LIVE_FRAME_INTERVAL)
+        self.plotTimer.timeout.connect(self.plotTimerHandler)
 
         # Set the title, minimum width and vertical layout
         self.setTitle('Data Logger')
@@ -280,22 +883,24 @@ class dataLoggerGroup(QGroupBox):
         self.groupElements.addStretch(1)
 
         # Add a table to display the data during the logging operation
-        self.dataTable = QTableWidget()
+        # The data is held by a table model which only creates the text
+        # of the rows which are visible
+        self.dataModel = tableHandler.sampleTableModel()
+        self.dataTable = QTableView()
+        self.dataTable.setModel(self.dataModel)
         # Enable alternate row colors to improve visibility between rows
         self.dataTable.setAlternatingRowColors(True)
         # Hide vertical headers
         self.dataTable.verticalHeader().hide()
+        # Use a fixed row height so the view never measures the rows
+        self.dataTable.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
         # Set the horizontal size to stretch to the available space 
         # and the vertical size to stay fixed to the initial size and enable
         # the scrolling option
         self.dataTable.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
         self.dataTable.setSizeAdjustPolicy(QtWidgets.QAbstractScrollArea.AdjustToContentsOnFirstShow)
         self.dataTable.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
-        # Set the table to 2 columns and 10 rows
-        self.dataTable.setColumnCount(2)
-        self.dataTable.setRowCount(10)
-        # Set table header text and font
-        self.dataTable.setHorizontalHeaderLabels(['Time', 'Temperature'])
+        # Set table header font (the header text comes from the table model)
         stylesheet = "::section{font-size: 10pt;border-radius:4px;padding: 10px}"
         self.dataTable.horizontalHeader().setStyleSheet(stylesheet)
         # Set the table invisible. This shall be visibile 
@@ -325,10 +930,16 @@ class dataLoggerGroup(QGroupBox):
     and reads the absolute path of the selected folder
     This function displays the selected folder in a text box and sets the
     file name text boxes and start logging button to visible
+
+    If the folder holds sessions which were never saved (for example because
+    the application crashed) the user is offered to recover them
     '''
     def selectFolderHandler(self):
         # Read the absolute path of the target folder
         self.folderpath = fileHandler.selectDirectory()
+        # Look for sessions which can be recovered
+        if self.folderpath:
+            self.recoverSessions()
         # Display the absolute path in the text box
         self.folderPathTextBox.setText(self.folderpath)
         # Set the file name text boxes and the start logging button to visible
@@ -346,7 +957,7 @@ class dataLoggerGroup(QGroupBox):
     This function then makes the temperature entry boxes, table and save button visible
     and makes the file name boxes invisible
 
-    This function also clears the data arrays to make sure any old data cleared before
+    This function also clears the samples to make sure any old data cleared before
     starting a new temperature log
     '''    
     def startLoggingHandler(self):
@@ -365,6 +976,20 @@ class dataLoggerGroup(QGroupBox):
         # Set the absolute path and file name for the csv file
         self.filePath = self.folderpath + '/' + timeStamp + fileName + '.csv'    
 
+        # Close the file of a session which was started but not saved
+        # It stays on disk and can be recovered later
+        if self.sessionWriter is not None:
+            self.writeJournal(force=True)
+            self.sessionWriter.close()
+
+        # Start streaming the session to disk
+        try:
+            self.sessionWriter = streamHandler.sessionWriter(self.filePath)
+        except OSError as error:
+            QMessageBox.warning(self, 'Data Logger', 'Could not create the log file:\n' + str(error))
+            return
+        self.flushTimer.start()
+
         # Set temperature entry text boxes to visible
         self.temperaturePrompt.setVisible(True)
         self.temperatureTextBox.setVisible(True)
@@ -376,33 +1001,38 @@ class dataLoggerGroup(QGroupBox):
         self.fileNamePrompt.setVisible(False)
         self.fileNameTextBox.setVisible(False)
 
-        # Clear data arrays
-        self.timeData.clear()
-        self.temperatureData.clear()
+        # Clear the samples
+        self.dataModel.clear()
+        self.journalCount = 0
+
+        # Replace the live trace of the previous session on the plot
+        self.removeLiveTrace()
+        self.liveTraceName = 'Logging ' + os.path.basename(self.filePath)
         
     '''
     enterTemperatureData function reads the input temperature
     string from the text box and adds the current time stamp
-    and the temperature value to the data lists and the table
-    if the entered data is a number
+    and the temperature value to the table and the session file
+    if the entered data is a number (decimals and negative values
+    are accepted)
     This function also clears the text in the text box to get
     it ready for the next entry
     '''
     def enterTemperatureData(self):
         # Read the string from the text box
-        temperature = self.temperatureTextBox.text()
-        # Capture current data & time stamp
-        now = datetime.now()
-        # Format the time stamp into HH:MM:SS format
-        timeStamp = now.strftime("%H:%M:%S")
-
-        # If the input string from the text box is a digit
-        if temperature.isdigit():
-            # Add the time stamp and temperature data to the lists
-            self.timeData.append(timeStamp)
-            self.temperatureData.append(temperature)
+        temperature = sampleHandler.parseTemperature(self.temperatureTextBox.text())
+        # Capture the current time stamp (nanoseconds since the epoch)
+        now = time.time_ns()
+
+        # If the input string from the text box is a number
+        if temperature is not None:
             # Add the time stamp and temperature data to the table
-            self.updateTable(timeStamp, temperature)
+            self.updateTable(now, temperature)
+            # Stream the samples to the session file once a block is ready
+            self.writeJournal(force=False)
+            # Draw the new sample on the plot at the end of the frame interval
+            if not self.plotTimer.isActive():
+                self.plotTimer.start()
         
         # Clear the text box to get it ready for next entry
         self.temperatureTextBox.clear()
@@ -410,47 +1040,95 @@ class dataLoggerGroup(QGroupBox):
     '''
     updateTable function is responsible for showing the entered data
     in a table format
-    This function updates the table with time and temperature data
-    The first 9 rows of data are added to the next available empty
-    row
-    If the data exceeds 9 rows, new row is added to the table and the
-    data is added to the next available empty row
-    '''
-    def updateTable(self, timeData, temperatureData):
-        # Read the current number of rows in the table
-        totalRows = self.dataTable.rowCount()
-        # For every row in the table
-        for currentRow in range(totalRows):
-            # If the current row is the last row
-            if currentRow >= (totalRows - 1):
-                # Add a new row
-                self.dataTable.setRowCount(totalRows + 1)
-                # Scroll to the bottom to make the latest data visible
-                self.dataTable.scrollToBottom()
-            
-            # Read the data from the first column in the current row
-            timeCellData = self.dataTable.item(currentRow, 0)
-            # If the data in current row is empty
-            if not timeCellData:
-                # Write time data in the first column
-                self.dataTable.setItem(currentRow, 0, QtWidgets.QTableWidgetItem(timeData))
-                # Write temperature data in the second column
-                self.dataTable.setItem(currentRow, 1, QtWidgets.QTableWidgetItem(temperatureData))
-                # Break out of the for loop after writing to the last empty row
-                break
-            
-    '''
-    saveDataHandler function calls the writeCSVData function from the file handler module
-    to save the temperture data to a csv file in a format that can be plotted
+    This function takes the time stamp of the entry (nanoseconds since the
+    epoch) and the temperature and appends them as a new row at the end of
+    the table model
+    '''
+    def updateTable(self, epochNs, temperatureData):
+        # Add a new row at the end of the table
+        self.dataModel.append(epochNs, temperatureData)
+        # Scroll to the bottom to make the latest data visible
+        self.dataTable.scrollToBottom()
+
+    '''
+    writeJournal function hands the samples which were not written yet to
+    the session writer as one block of csv lines
+    Unless force is True the samples are only handed over once there are
+    enough of them for the writer to flush
+    '''
+    def writeJournal(self, force):
+        samples = self.dataModel.samples
+        pendingCount = len(samples) - self.journalCount
+        if self.sessionWriter is None or not pendingCount:
+            return
+        if not force and pendingCount < self.sessionWriter.flushRows:
+            return
+
+        self.sessionWriter.appendLines(samples.csvLines(self.journalCount), pendingCount)
+        self.journalCount = len(samples)
+
+    '''
+    plotTimerHandler function draws all the samples of the session as a live
+    trace on the plot, including every sample entered since the last frame
+    '''
+    def plotTimerHandler(self):
+        if self.liveTraceName is not None:
+            plotCanvas().updateLiveTrace(self.liveTraceName, *self.dataModel.plotData())
+
+    '''
+    removeLiveTrace function removes the live trace of the session from the
+    plot
+    '''
+    def removeLiveTrace(self):
+        self.plotTimer.stop()
+        if self.liveTraceName is not None:
+            plotCanvas().removeLiveTrace(self.liveTraceName)
+            self.liveTraceName = None
+
+    '''
+    flushTimerHandler function writes the pending samples of the session
+    to disk once they have waited long enough
+    '''
+    def flushTimerHandler(self):
+        if self.sessionWriter is not None:
+            self.writeJournal(force=True)
+            self.sessionWriter.flushIfDue()
+
+    '''
+    saveDataHandler function finalizes the session file which already holds
+    all the entered samples, which makes it a csv file that can be plotted
     This function also calls the resetData function to clear all the data and reset
     the GUI once the data is saved
     '''
     def saveDataHandler(self):
-        # Write the data to CSV file
-        fileHandler.writeCSVData(self.filePath, self.timeData, self.temperatureData)
+        # Flush the last samples and rename the session file to the csv file
+        self.flushTimer.stop()
+        self.writeJournal(force=True)
+        self.sessionWriter.finalize()
+        self.sessionWriter = None
         # Reset the data and GUI
         self.resetData()
 
+    '''
+    recoverSessions function looks for sessions in the selected folder which
+    were never saved and asks the user if they should be recovered
+    Recovered sessions are saved as csv files with the data written so far
+    '''
+    def recoverSessions(self):
+        journals = streamHandler.findJournals(self.folderpath)
+        # Skip the session which is still in progress
+        if self.sessionWriter is not None:
+            journals = [journal for journal in journals if journal != self.sessionWriter.journalPath]
+        if not journals:
+            return
+
+        fileNames = '\n'.join(os.path.basename(journal) for journal in journals)
+        answer = QMessageBox.question(self, 'Data Logger',
+                                      'Unsaved sessions were found in this folder:\n' + fileNames + '\n\nRecover them?')
+        if answer == QMessageBox.Yes:
+            for journal in journals:
+                streamHandler.recoverJournal(journal)
+
     '''
     resetData function clears and resets the data and the table 
     and hides the data table, save button and temperature entry text boxes
@@ -458,15 +1136,11 @@ class dataLoggerGroup(QGroupBox):
     to enter a new file name if they need to enter new data
     '''
     def resetData(self):
-        # Clear the data lists
-        self.timeData.clear()
-        self.temperatureData.clear()
         # Clear the data in the table
-        self.dataTable.clear()
-        # Reset the data table to 10 rows
-        self.dataTable.setRowCount(10)
-        # Reset the table headers. Clearing the table also clears the headers
-        self.dataTable.setHorizontalHeaderLabels(['Time', 'Temperature'])
+        self.dataModel.clear()
+        self.journalCount = 0
+        # Remove the live trace from the plot
+        self.removeLiveTrace()
         # Hide the data table
         self.dataTable.setVisible(False)
         # Hide the temperature entry text boxes and prompts
@@ -479,7 +1153,237 @@ class dataLoggerGroup(QGroupBox):
         
         
 
-               
+'''
+sensorGroup class defines all the GUI elements and operations related to
+the live sensor section of the application window
+'''
+class sensorGroup(QGroupBox):
+
+    '''
+    sensorGroup class constructor initializes the live sensor section of the
+    application window and arranges all the GUI elements in a vertical layout
+    This function also sets the group title
+    '''
+    def __init__(self):
+        super(sensorGroup, self).__init__()
+
+        # Server which receives the sensor readings while the sensors are connected
+        self.sensorServer = None
+        # Number of readings of every channel when the traces were last drawn
+        self.drawnCounts = dict()
+        # Number of readings and time when the reading rate was last measured
+        self.rateCount = 0
+        self.rateTime = None
+
+        # Timer which draws the new readings at a capped frame rate
+        # However fast the readings arrive, the plot is redrawn at most once per interval
+        self.frameTimer = QTimer(self)
+        self.frameTimer.setInterval(LIVE_FRAME_INTERVAL)
+        self.frameTimer.timeout.connect(self.frameTimerHandler)
+
+        # Set the title and vertical layout
+        self.setTitle('Live Sensors')
+        self.groupElements = QVBoxLayout()
+        self.setLayout(self.groupElements)
+
+        # Add a drop down box to select the protocol and a text box for the
+        # address (host:port for sockets or the path of the named pipe)
+        connectionElements = QHBoxLayout()
+        self.protocolBox = QComboBox()
+        self.protocolBox.addItems(sensorHandler.PROTOCOLS)
+        connectionElements.addWidget(self.protocolBox)
+        self.addressTextBox = QLineEdit(sensorHandler.DEFAULT_ADDRESS)
+        connectionElements.addWidget(self.addressTextBox)
+        self.groupElements.addLayout(connectionElements)
+
+        # Add a check box to record the readings to csv files
+        self.recordCheckBox = QCheckBox('Record to csv files')
+        self.groupElements.addWidget(self.recordCheckBox)
+
+        # Add a button to connect and disconnect the sensors
+        self.connectButton = QPushButton('Connect')
+        self.connectButton.clicked.connect(self.connectHandler)
+        self.groupElements.addWidget(self.connectButton)
+
+        # Add a label to show the state of the connection
+        self.statusLabel = QLabel('Not connected')
+        self.groupElements.addWidget(self.statusLabel)
+
+    '''
+    connectHandler function starts the sensor server with the selected
+    protocol and address, or stops it if it is already running
+    If the readings are recorded the user is asked for the target folder
+    '''
+    def connectHandler(self):
+        if self.sensorServer is not None:
+            self.disconnectSensors()
+            return
+
+        recordFolder = None
+        if self.recordCheckBox.isChecked():
+            recordFolder = fileHandler.selectDirectory()
+            if not recordFolder:
+                return
+
+        sensorServer = sensorHandler.sensorServer(self.protocolBox.currentText(), self.addressTextBox.text(), recordFolder)
+        try:
+            sensorServer.start()
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, 'Live Sensors', 'Could not listen for the sensors:\n' + str(error))
+            return
+
+        self.sensorServer = sensorServer
+        self.drawnCounts.clear()
+        self.rateCount = 0
+        self.rateTime = None
+        self.frameTimer.start()
+
+        self.connectButton.setText('Disconnect')
+        self.protocolBox.setEnabled(False)
+        self.addressTextBox.setEnabled(False)
+        self.recordCheckBox.setEnabled(False)
+        self.statusLabel.setText('Waiting for readings')
+
+    '''
+    disconnectSensors function stops the sensor server, saves the recorded
+    csv files and removes the live traces from the plot
+    '''
+    def disconnectSensors(self):
+        self.frameTimer.stop()
+        filePaths = self.sensorServer.stop()
+        recordErrors = self.sensorServer.recordErrors()
+        for channel in self.drawnCounts:
+            plotCanvas().removeLiveTrace('Sensor ' + channel)
+        self.sensorServer = None
+
+        self.connectButton.setText('Connect')
+        self.protocolBox.setEnabled(True)
+        self.addressTextBox.setEnabled(True)
+        self.recordCheckBox.setEnabled(True)
+        if filePaths:
+            self.statusLabel.setText('Recorded ' + ', '.join(os.path.basename(filePath) for filePath in filePaths))
+        else:
+            self.statusLabel.setText('Not connected')
+        if recordErrors:
+            QMessageBox.warning(self, 'Live Sensors', 'Could not record the readings of:\n' + '\n'.join(
+                'Sensor {}: {}'.format(channel, message) for channel, message in sorted(recordErrors.items())))
+
+    '''
+    frameTimerHandler function draws the channels which received readings
+    since the last frame and updates the reading rate shown in the status
+    '''
+    def frameTimerHandler(self):
+        totalCount = 0
+        for channel, buffer in self.sensorServer.channels():
+            count = buffer.totalCount
+            totalCount += count
+            if count != self.drawnCounts.get(channel):
+                self.drawnCounts[channel] = count
+                xData, yData = self.sensorServer.channelData(buffer)
+                plotCanvas().updateLiveTrace('Sensor ' + channel, xData, yData)
+
+        # Measure the reading rate about once per second
+        now = datetime.now()
+        if self.rateTime is None:
+            self.rateTime = now
+            self.rateCount = totalCount
+        elif (now - self.rateTime).total_seconds() >= 1:
+            rate = (totalCount - self.rateCount) / (now - self.rateTime).total_seconds()
+            status = '{} channels, {:.0f} readings/s, {} bad lines'.format(
+                len(self.drawnCounts), rate, self.sensorServer.errorCount)
+            # Channels which could not be recorded are still plotted
+            recordErrors = self.sensorServer.recordErrors()
+            if recordErrors:
+                status += ', not recording ' + ', '.join(sorted(recordErrors))
+            self.statusLabel.setText(status)
+            self.rateTime = now
+            self.rateCount = totalCount
+
+
+'''
+performanceOverlay class defines a panel shown over the application window
+which lists the timings of the most recent operations (see the trace
+handler module) and the memory used by the application
+'''
+class performanceOverlay(QFrame):
+
+    '''
+    performanceOverlay class constructor takes the window the panel is
+    shown over and creates the hidden panel
+    '''
+    def __init__(self, parent):
+        super(performanceOverlay, self).__init__(parent)
+
+        # Semi transparent panel with a monospace font so the columns line up
+        self.setFrameShape(QFrame.StyledPanel)
+        self.setAutoFillBackground(True)
+        self.setStyleSheet('performanceOverlay {background-color: rgba(255, 255, 255, 230);}')
+        self.groupElements = QVBoxLayout()
+        self.setLayout(self.groupElements)
+
+        self.timingsLabel = QLabel()
+        self.timingsLabel.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.groupElements.addWidget(self.timingsLabel)
+
+        # Add a button to export every recorded operation to a trace file
+        self.exportButton = QPushButton('Export trace...')
+        self.exportButton.clicked.connect(self.exportHandler)
+        self.groupElements.addWidget(self.exportButton)
+
+        # Timer which updates the timings while the panel is shown
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setInterval(OVERLAY_UPDATE_INTERVAL)
+        self.updateTimer.timeout.connect(self.updateTimings)
+
+        self.setVisible(False)
+
+    '''
+    toggle function shows the panel if it is hidden and hides it otherwise
+    '''
+    def toggle(self):
+        if self.isVisible():
+            self.updateTimer.stop()
+            self.setVisible(False)
+        else:
+            self.updateTimings()
+            self.setVisible(True)
+            self.raise_()
+            self.updateTimer.start()
+
+    '''
+    updateTimings function shows the memory use and the durations of the
+    most recent operations, newest first. Operations which ran on a worker
+    thread are marked with an asterisk
+    '''
+    def updateTimings(self):
+        memory = traceHandler.memoryUsage()
+        lines = ['Memory: ' + ('unknown' if memory is None else '{:.1f} MB'.format(memory / 1024 ** 2)),
+                 '{:>10}  {}'.format('ms', 'operation')]
+        mainThread = threading.main_thread().ident
+        for name, start, duration, threadId, details in reversed(traceHandler.recentSpans(OVERLAY_SPAN_COUNT)):
+            lines.append('{:>10.2f} {}{}'.format(duration / 1e6, ' ' if threadId == mainThread else '*', name))
+        if not traceHandler.enabled:
+            lines.append('Tracing is switched off (TEACUP_TRACE=0)')
+
+        self.timingsLabel.setText('\n'.join(lines))
+        self.adjustSize()
+
+    '''
+    exportHandler function asks for a file name and exports every recorded
+    operation in the Chrome trace format or as JSON lines
+    '''
+    def exportHandler(self):
+        filePath, fileFilter = QFileDialog.getSaveFileName(self, 'Export trace', 'trace.json',
+                                                           'Chrome trace (*.json);;JSON lines (*.jsonl)')
+        if filePath:
+            if 'jsonl' in fileFilter and not filePath.endswith('.jsonl'):
+                filePath += 'l' if filePath.endswith('.json') else '.jsonl'
+            try:
+                traceHandler.export(filePath)
+            except OSError as error:
+                QMessageBox.warning(self, 'Export trace', 'Could not write the trace:\n' + str(error))
+
+
 '''
 mainWindow class defines the main application window and adds the
 required sections of the GUI
@@ -499,8 +1403,13 @@ class mainWindow(QMainWindow):
         self.main_layout = QHBoxLayout(self.main_widget)
 
         self.main_layout.addWidget(fileSelectGroup())
-        self.main_layout.addWidget(plotGroup())
-        self.main_layout.addWidget(dataLoggerGroup())
+        self.plotArea = plotGroup()
+        self.main_layout.addWidget(self.plotArea)
+        # The data logger and the live sensors share the right column
+        self.loggerLayout = QVBoxLayout()
+        self.loggerLayout.addWidget(dataLoggerGroup())
+        self.loggerLayout.addWidget(sensorGroup())
+        self.main_layout.addLayout(self.loggerLayout)
 
 
         self.main_widget.setLayout(self.main_layout)
@@ -511,4 +1420,11 @@ class mainWindow(QMainWindow):
         scriptDir = os.path.dirname(os.path.realpath(__file__))
         self.setWindowIcon(QtGui.QIcon(scriptDir + os.path.sep + 'icon.png'))
 
+        # Add the performance overlay in the top left corner, shown and
+        # hidden with a keyboard shortcut
+        self.performanceOverlay = performanceOverlay(self)
+        self.performanceOverlay.move(10, 10)
+        self.overlayShortcut = QShortcut(QtGui.QKeySequence(OVERLAY_SHORTCUT), self)
+        self.overlayShortcut.activated.connect(self.performanceOverlay.toggle)
+
         self.show()
@@ -0,0 +1,250 @@
+'''
+Index Handler Module
+This module keeps an index of the data files (csv files, and Parquet and
+Arrow files if pyarrow is installed) in a data folder and all its sub folders
+
+The index is a manifest (relative path, size, modification time and number
+of rows of every data file) stored in an SQLite database in the cache folder
+of the data folder. Opening a folder which was indexed before lists the files
+straight from the manifest, and refreshing the index only stats the files
+(using os.scandir) and counts the rows of the files which are new or changed
+'''
+
+import os
+import sqlite3
+import threading
+
+from modules import sidecarHandler
+from modules import storageHandler
+from modules import traceHandler
+
+# Name of the index database inside the cache folder
+INDEX_FILE_NAME = 'index.sqlite'
+# Size of the blocks read when counting the rows of a file
+ROW_COUNT_BLOCK_SIZE = 1024 * 1024
+# Number of rows counted before the index is committed
+ROW_COUNT_BATCH = 200
+
+
+'''
+scanFolder function takes a folder path and returns a dictionary of the
+relative path (using / separators) of every data file in that folder and its
+sub folders mapped to its size and modification time (in nanoseconds),
+along with the list of all the folders that were scanned
+Cache folders are skipped, and so are the sub folders in skipFolders (which
+are returned as a third list when they are found)
+A run stored both as csv and in a columnar format is only listed once (see
+storageHandler.preferredDataFiles)
+
+The relative paths are built relative to the root folder
+'''
+@traceHandler.traced('scanFolder')
+def scanFolder(rootPath, folderPath, skipFolders=()):
+    files = dict()
+    scannedFolders = []
+    skippedFolders = []
+    folders = [folderPath]
+    while folders:
+        currentFolder = folders.pop()
+        try:
+            entries = list(os.scandir(currentFolder))
+        except OSError:
+            # Folders can disappear while they are scanned
+            continue
+        scannedFolders.append(os.path.normpath(currentFolder))
+
+        # Relative path, size and modification time of the data files of
+        # the folder, keyed by file name
+        folderFiles = dict()
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if os.path.normpath(entry.path) in skipFolders:
+                    skippedFolders.append(os.path.normpath(entry.path))
+                elif entry.name != sidecarHandler.CACHE_DIR_NAME:
+                    folders.append(entry.path)
+            elif storageHandler.isDataFile(entry.name) and entry.is_file():
+                try:
+                    fileStat = entry.stat()
+                except OSError:
+                    continue
+                relativePath = os.path.relpath(entry.path, rootPath).replace(os.sep, '/')
+                folderFiles[entry.name] = (relativePath, fileStat.st_size, fileStat.st_mtime_ns)
+
+        for fileName in storageHandler.preferredDataFiles({name: entry[2] for name, entry in folderFiles.items()}):
+            relativePath, size, mtime = folderFiles[fileName]
+            files[relativePath] = (size, mtime)
+
+    return files, scannedFolders, skippedFolders
+
+
+'''
+isInFolders function takes a relative path and a set of relative folder
+paths (ending with /) and returns True if the path is inside one of them
+'''
+def isInFolders(path, folderPrefixes):
+    if not folderPrefixes:
+        return False
+
+    parts = path.split('/')
+    return any('/'.join(parts[:depth]) + '/' in folderPrefixes for depth in range(1, len(parts)))
+
+
+'''
+countRows function takes a file path and returns the number of data rows
+(lines after the header) in the file
+The file is read in large binary blocks without parsing it. The rows of
+columnar files are read from their metadata
+'''
+def countRows(filePath):
+    if storageHandler.columnarFormat(filePath) is not None:
+        return storageHandler.countRows(filePath)
+
+    lines = 0
+    lastByte = b'\n'
+    with open(filePath, 'rb') as csvFile:
+        block = csvFile.read(ROW_COUNT_BLOCK_SIZE)
+        while block:
+            lines += block.count(b'\n')
+            lastByte = block[-1:]
+            block = csvFile.read(ROW_COUNT_BLOCK_SIZE)
+
+    # Count a last line without a line break
+    if lastByte != b'\n':
+        lines += 1
+
+    # Do not count the header
+    return max(lines - 1, 0)
+
+
+'''
+folderIndex class holds the manifest of the data files of a data folder
+The index can be used from any thread, the database connection is guarded
+by a lock
+'''
+class folderIndex:
+
+    '''
+    folderIndex class constructor takes the path of the data folder and opens
+    (or creates) its index database
+    If the cache folder can not be written the index is kept in memory
+    '''
+    def __init__(self, folderPath):
+        self.folderPath = os.path.abspath(folderPath)
+        self.lock = threading.Lock()
+        # Every folder found while refreshing the index
+        self.scannedFolders = set()
+
+        cacheFolder = os.path.join(self.folderPath, sidecarHandler.CACHE_DIR_NAME)
+        try:
+            os.makedirs(cacheFolder, exist_ok=True)
+            self.connection = sqlite3.connect(os.path.join(cacheFolder, INDEX_FILE_NAME), check_same_thread=False)
+            self.createTables()
+        except (OSError, sqlite3.Error):
+            self.connection = sqlite3.connect(':memory:', check_same_thread=False)
+            self.createTables()
+
+    '''
+    createTables function creates the manifest table if it does not exist
+    '''
+    def createTables(self):
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files ('
+                                    'path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, rows INTEGER)')
+
+    '''
+    entries function returns a list of (relative path, row count) tuples of
+    every data file in the manifest, sorted by path
+    The row count is None for files which were not counted yet
+    '''
+    def entries(self):
+        with self.lock:
+            return self.connection.execute('SELECT path, rows FROM files ORDER BY path').fetchall()
+
+    '''
+    paths function returns the sorted list of relative paths of every data
+    file in the manifest
+    '''
+    def paths(self):
+        return [entry[0] for entry in self.entries()]
+
+    '''
+    refresh function scans the data folder (or only one of its sub folders)
+    and updates the manifest with the files which were added, changed or
+    removed. Changed files lose their row count until it is counted again
+    If recursive is False only the files of that folder and its new sub
+    folders are scanned, the sub folders found before are left alone (the
+    folder watcher reports their changes on their own)
+    This function returns True if the manifest has changed
+    '''
+    def refresh(self, subFolder=None, recursive=True):
+        scanPath = self.folderPath if subFolder is None else os.path.abspath(subFolder)
+        with self.lock:
+            # Forget the folders which were deleted, so they are scanned again
+            # if they come back
+            self.scannedFolders = {folder for folder in self.scannedFolders if os.path.isdir(folder)}
+            skipFolders = set() if recursive else self.scannedFolders - {os.path.normpath(scanPath)}
+        files, scannedFolders, skippedFolders = scanFolder(self.folderPath, scanPath, skipFolders)
+
+        # Only the manifest entries inside the scanned folder are compared
+        prefix = os.path.relpath(scanPath, self.folderPath).replace(os.sep, '/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        # Relative paths of the sub folders which were skipped
+        skippedPrefixes = {os.path.relpath(folder, self.folderPath).replace(os.sep, '/') + '/'
+                           for folder in skippedFolders}
+
+        with self.lock:
+            self.scannedFolders.update(scannedFolders)
+            known = {path: (size, mtime) for path, size, mtime in self.connection.execute(
+                'SELECT path, size, mtime FROM files WHERE substr(path, 1, ?) = ?', (len(prefix), prefix))
+                if not isInFolders(path, skippedPrefixes)}
+
+            changed = [(path, size, mtime) for path, (size, mtime) in files.items() if known.get(path) != (size, mtime)]
+            removed = [(path,) for path in known if path not in files]
+
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO files (path, size, mtime, rows) VALUES (?, ?, ?, NULL)', changed)
+                self.connection.executemany('DELETE FROM files WHERE path = ?', removed)
+
+        return bool(changed or removed)
+
+    '''
+    countMissingRows function counts the rows of every file in the manifest
+    which was not counted yet and stores the counts
+    Files which can no longer be read are left uncounted
+    This function returns the number of files counted
+    '''
+    @traceHandler.traced('countMissingRows')
+    def countMissingRows(self):
+        with self.lock:
+            missing = [entry[0] for entry in self.connection.execute('SELECT path FROM files WHERE rows IS NULL')]
+
+        counted = 0
+        for start in range(0, len(missing), ROW_COUNT_BATCH):
+            rows = []
+            for path in missing[start:start + ROW_COUNT_BATCH]:
+                try:
+                    rows.append((countRows(os.path.join(self.folderPath, path)), path))
+                except (OSError, ValueError):
+                    continue
+
+            with self.lock, self.connection:
+                self.connection.executemany('UPDATE files SET rows = ? WHERE path = ?', rows)
+            counted += len(rows)
+
+        return counted
+
+    '''
+    folders function returns the absolute paths of the data folder and all
+    its sub folders found while refreshing the index
+    These are the folders which have to be watched for changes
+    '''
+    def folders(self):
+        with self.lock:
+            return sorted(self.scannedFolders | {os.path.normpath(self.folderPath)})
+
+    '''
+    close function closes the index database
+    '''
+    def close(self):
+        with self.lock:
+            self.connection.close()
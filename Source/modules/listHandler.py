@@ -0,0 +1,319 @@
+'''
+List Handler Module
+This module defines the list model which holds the csv files of the selected
+data folder, and the delegate which draws every file with a sparkline
+preview of its data
+'''
+
+import bisect
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QRect
+from PyQt5.QtCore import QSize
+from PyQt5.QtCore import QModelIndex
+from PyQt5.QtCore import QAbstractListModel
+from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QPalette
+from PyQt5.QtWidgets import QStyle
+from PyQt5.QtWidgets import QStyledItemDelegate
+from PyQt5.QtWidgets import QStyleOptionViewItem
+
+from modules import thumbnailHandler
+
+# Number of files added to the view at a time
+FETCH_BATCH_SIZE = 1000
+# Item data role which holds the relative path of the file
+FILE_PATH_ROLE = Qt.UserRole
+# Space (in pixels) around and between the thumbnail and the text of a row
+ROW_PADDING = 3
+# Widest statistics line expected, used to size the rows
+DETAIL_TEXT_SAMPLE = '~ 100.0 to 100.0 deg C, 1000.0 min'
+
+
+'''
+fileListModel class holds the relative paths (and row counts) of the csv
+files of a folder
+The view is filled lazily: only the first batch of files is shown at
+first and more batches are added as the user scrolls down
+
+If a message is set (for example when there are no csv files) the model
+shows that message as its only row
+'''
+class fileListModel(QAbstractListModel):
+
+    '''
+    fileListModel class constructor initializes an empty list
+    '''
+    def __init__(self):
+        super(fileListModel, self).__init__()
+        self.paths = []
+        self.rowCounts = []
+        self.rowOfPath = dict()
+        self.fetchedCount = 0
+        self.message = None
+        self.loadingPath = None
+
+    '''
+    setEntries function takes a list of (relative path, row count) tuples
+    and replaces the files in the list. Only the first batch is shown
+    '''
+    def setEntries(self, entries):
+        self.beginResetModel()
+        self.paths = [entry[0] for entry in entries]
+        self.rowCounts = [entry[1] for entry in entries]
+        self.rowOfPath = {path: row for row, path in enumerate(self.paths)}
+        self.fetchedCount = min(len(self.paths), FETCH_BATCH_SIZE)
+        self.message = None
+        self.endResetModel()
+
+    '''
+    updateEntries function takes the new sorted list of (relative path, row
+    count) tuples of the same folder and removes and inserts only the rows
+    which changed, so the selection and the scroll position of the view
+    are kept. Rows which are not shown yet are changed without telling the
+    view
+    '''
+    def updateEntries(self, entries):
+        if self.message is not None or not self.paths:
+            self.setEntries(entries)
+            return
+
+        newCounts = dict(entries)
+
+        # Remove the rows of the files which are gone, from the bottom up in
+        # runs of consecutive rows
+        row = len(self.paths) - 1
+        while row >= 0:
+            if self.paths[row] in newCounts:
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self.paths[row - 1] not in newCounts:
+                row -= 1
+            self.removeRange(row, last)
+            row -= 1
+
+        # Insert the rows of the new files at their sorted position
+        known = set(self.paths)
+        for path, rows in entries:
+            if path in known:
+                continue
+            row = bisect.bisect_left(self.paths, path)
+            shown = row < self.fetchedCount or self.fetchedCount == len(self.paths)
+            if shown:
+                self.beginInsertRows(QModelIndex(), row, row)
+            self.paths.insert(row, path)
+            self.rowCounts.insert(row, rows)
+            if shown:
+                self.fetchedCount += 1
+                self.endInsertRows()
+
+        self.rowOfPath = {path: row for row, path in enumerate(self.paths)}
+        self.updateRowCounts(entries)
+
+    '''
+    removeRange function removes the rows first to last (included) from the
+    list, telling the view about the ones which are shown
+    '''
+    def removeRange(self, first, last):
+        shownLast = min(last, self.fetchedCount - 1)
+        if first <= shownLast:
+            self.beginRemoveRows(QModelIndex(), first, shownLast)
+        del self.paths[first:last + 1]
+        del self.rowCounts[first:last + 1]
+        if first <= shownLast:
+            self.fetchedCount -= shownLast - first + 1
+            self.endRemoveRows()
+
+    '''
+    setMessage function replaces the files in the list with a message
+    '''
+    def setMessage(self, message):
+        self.setEntries([])
+        self.beginResetModel()
+        self.message = message
+        self.endResetModel()
+
+    '''
+    rowCount function returns the number of rows shown in the view
+    '''
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self.message is not None:
+            return 1
+        return self.fetchedCount
+
+    '''
+    canFetchMore function tells the view if there are files which are not
+    shown yet
+    '''
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.fetchedCount < len(self.paths)
+
+    '''
+    fetchMore function adds the next batch of files to the view
+    '''
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(len(self.paths) - self.fetchedCount, FETCH_BATCH_SIZE)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.fetchedCount, self.fetchedCount + count - 1)
+        self.fetchedCount += count
+        self.endInsertRows()
+
+    '''
+    data function returns the text, tool tip, font and file path of a row
+    The file being loaded is shown in italics
+    '''
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if self.message is not None:
+            return self.message if role == Qt.DisplayRole else None
+
+        path = self.paths[index.row()]
+        if role == Qt.DisplayRole or role == FILE_PATH_ROLE:
+            return path
+        if role == Qt.ToolTipRole:
+            if path == self.loadingPath:
+                return 'Loading...'
+            if self.rowCounts[index.row()] is not None:
+                return '{} rows'.format(self.rowCounts[index.row()])
+        if role == Qt.FontRole and path == self.loadingPath:
+            font = QFont()
+            font.setItalic(True)
+            return font
+        return None
+
+    '''
+    flags function makes the message row not selectable
+    '''
+    def flags(self, index):
+        if self.message is not None:
+            return Qt.ItemIsEnabled
+        return super(fileListModel, self).flags(index)
+
+    '''
+    setLoadingPath function marks the file which is being loaded and
+    clears the mark of the previous file. Passing None clears the mark
+    '''
+    def setLoadingPath(self, path):
+        previousPath = self.loadingPath
+        self.loadingPath = path
+        for changedPath in (previousPath, path):
+            row = self.rowOfPath.get(changedPath)
+            if row is not None and row < self.fetchedCount:
+                self.dataChanged.emit(self.index(row), self.index(row))
+
+    '''
+    updateRowCounts function takes a list of (relative path, row count)
+    tuples and updates the row counts of the files already in the list
+    '''
+    def updateRowCounts(self, entries):
+        for path, rows in entries:
+            row = self.rowOfPath.get(path)
+            if row is not None:
+                self.rowCounts[row] = rows
+
+    '''
+    updatePath function takes the relative path of a file whose row has to
+    be painted again (for example once its thumbnail is ready)
+    '''
+    def updatePath(self, path):
+        row = self.rowOfPath.get(path)
+        if row is not None and row < self.fetchedCount and self.message is None:
+            self.dataChanged.emit(self.index(row), self.index(row))
+
+
+'''
+thumbnailDelegate class draws the rows of the file list with the sparkline
+thumbnail of the file on the left, and its name along with the start
+temperature, end temperature and duration of the run on the right
+Thumbnails are asked from the thumbnail loader when a row is painted, so
+only the files scrolled into view are ever read. Rows whose thumbnail is not
+ready yet are drawn with an empty thumbnail until the loader has it
+'''
+class thumbnailDelegate(QStyledItemDelegate):
+
+    '''
+    thumbnailDelegate class constructor takes the thumbnail loader
+    '''
+    def __init__(self, thumbnailLoader, parent=None):
+        super(thumbnailDelegate, self).__init__(parent)
+        self.thumbnailLoader = thumbnailLoader
+
+    '''
+    detailText function returns the second line of a row, made of the
+    statistics of the file (or why it has no thumbnail)
+    '''
+    def detailText(self, entry):
+        if entry is None:
+            return 'Loading preview...'
+        image, statistics, error = entry
+        if error is not None:
+            return 'Unreadable file'
+        if statistics is None:
+            return 'No data'
+        # Approximate statistics come from a few blocks of a large file
+        text = '{:.1f} to {:.1f} deg C, {:.1f} min'.format(*statistics[:3])
+        return '~ ' + text if statistics[3] else text
+
+    '''
+    paint function draws a row of the file list
+    The message shown when there are no files is drawn as plain text
+    '''
+    def paint(self, painter, option, index):
+        path = index.data(FILE_PATH_ROLE)
+        if path is None:
+            super(thumbnailDelegate, self).paint(painter, option, index)
+            return
+
+        option = QStyleOptionViewItem(option)
+        self.initStyleOption(option, index)
+        style = option.widget.style() if option.widget is not None else None
+        entry = self.thumbnailLoader.thumbnail(path)
+
+        # Draw the background (and the selection) of the row
+        option.text = ''
+        if style is not None:
+            style.drawControl(QStyle.CE_ItemViewItem, option, painter, option.widget)
+
+        painter.save()
+        rect = option.rect.adjusted(ROW_PADDING, ROW_PADDING, -ROW_PADDING, -ROW_PADDING)
+
+        # Draw the thumbnail centered vertically on the left
+        thumbnailRect = QRect(rect.left(), rect.top() + (rect.height() - thumbnailHandler.THUMBNAIL_HEIGHT) // 2,
+                              thumbnailHandler.THUMBNAIL_WIDTH, thumbnailHandler.THUMBNAIL_HEIGHT)
+        if entry is not None and entry[0] is not None:
+            painter.drawImage(thumbnailRect, entry[0])
+
+        # Draw the file name and the statistics below it
+        selected = option.state & QStyle.State_Selected
+        painter.setPen(option.palette.color(QPalette.HighlightedText if selected else QPalette.Text))
+        textRect = rect.adjusted(thumbnailHandler.THUMBNAIL_WIDTH + 2 * ROW_PADDING, 0, 0, 0)
+        lineHeight = option.fontMetrics.height()
+        painter.setFont(option.font)
+        painter.drawText(QRect(textRect.left(), textRect.top(), textRect.width(), lineHeight),
+                         Qt.AlignLeft | Qt.AlignVCenter,
+                         option.fontMetrics.elidedText(path, Qt.ElideMiddle, textRect.width()))
+        if not selected:
+            painter.setPen(option.palette.color(QPalette.Disabled, QPalette.Text))
+        painter.drawText(QRect(textRect.left(), textRect.top() + lineHeight, textRect.width(), lineHeight),
+                         Qt.AlignLeft | Qt.AlignVCenter, self.detailText(entry))
+        painter.restore()
+
+    '''
+    sizeHint function returns the size of a row, tall enough for the
+    thumbnail and two lines of text
+    '''
+    def sizeHint(self, option, index):
+        size = super(thumbnailDelegate, self).sizeHint(option, index)
+        if index.data(FILE_PATH_ROLE) is None:
+            return size
+
+        # The statistics line is often wider than the file name
+        textWidth = max(size.width(), option.fontMetrics.width(DETAIL_TEXT_SAMPLE))
+        height = max(2 * option.fontMetrics.height(), thumbnailHandler.THUMBNAIL_HEIGHT) + 2 * ROW_PADDING
+        return QSize(textWidth + thumbnailHandler.THUMBNAIL_WIDTH + 3 * ROW_PADDING, height)
@@ -2,22 +2,40 @@
 Plot Handler Module
 This module handles all operations related to plotting the time vs. temperature
 graphs on the GUI
+
+Importing this module imports the whole plotting stack (matplotlib and its Qt
+backend), so the GUI only imports it once the window is on the screen
 '''
 
+import numpy
 import matplotlib
 from modules import fileHandler
+from modules import taskHandler
+from modules import decimationHandler
+from modules import ensembleHandler
+from modules import exportHandler
+from modules import plotStyle
+from modules import traceHandler
 matplotlib.use('Qt5Agg')
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
+from PyQt5.QtCore import QTimer
+
+# Canvas of the application window, set once it has been created
+activeCanvas = None
 
-# Default plot option is configured as Single Plot
-plotOption = 'Single Plot'
+# Largest part of a file (in bytes) read at full resolution when zooming in
+# Wider ranges are drawn from the reduced data of the file
+RANGE_READ_MAX_BYTES = 16 * 1024 * 1024
+# Part of the visible time span also read on either side, so panning a little
+# does not read the file again
+RANGE_READ_MARGIN = 0.5
+# Time (in milliseconds) the axes limits have to stay the same before the
+# visible range is read, so zooming and panning do not start a read per step
+RANGE_READ_DELAY = 50
 
-# Matplot lib figure with a single plot1 is defined
-fig = Figure(figsize=(10, 8), dpi=100)
-temperaturePlot = fig.add_subplot(111)
-        
 '''
 plotCanvas class defines all the functionality required to plot
 the time vs. temperature data
@@ -25,57 +43,521 @@ the time vs. temperature data
 class plotCanvas(FigureCanvas):
 
     '''
-    plotCanvas class constructor initializes the figure
-    by defining the plot title and axes labels
+    plotCanvas class constructor creates the figure with a single plot and
+    initializes it by defining the plot title and axes labels
+    The canvas becomes the active canvas of the module
     '''
     def __init__(self):
-        fig.suptitle('Temperature Decay Curve')
-        temperaturePlot.set_xlabel('Time (minutes)')
-        temperaturePlot.set_ylabel('Temperature (deg Celcius)')
-        super(plotCanvas, self).__init__(fig)
+        global activeCanvas
+
+        # Default plot option is configured as Single Plot
+        self.plotOption = 'Single Plot'
+
+        # Registry of every trace on the plot keyed by file path
+        # Each file path maps to a list of its Line2D artist, the full resolution
+        # time and temperature data and a flag which tells if the time data is sorted
+        # The artists only hold the points which are visible at the current zoom level
+        self.traces = dict()
+
+        # Lines of the live traces (data which keeps growing while it is plotted,
+        # like a sensor) keyed by name. Their data is held by the caller, which
+        # updates them on a timer
+        self.liveTraces = dict()
+
+        # Runs summarized by the ensemble plot keyed by file path, along with the
+        # artists drawing the summary (percentile bands, median and mean)
+        # The summary is computed again before the next full draw whenever a run
+        # has been added, so adding many runs at once only computes it once
+        self.ensemble = ensembleHandler.ensemble()
+        self.ensembleArtists = []
+        self.ensembleChanged = False
+
+        # Pixels of the plot area saved after the last full draw (including every
+        # trace on the plot). New traces are drawn over this background and only the
+        # plot area is copied to the screen (blitting) instead of redrawing everything
+        # This is None whenever a full draw is pending
+        self.blitBackground = None
+
+        # X axis limits and bucket count used for the last decimation of the traces
+        self.lastDecimation = None
+
+        # Large files are plotted from a reduced copy of their data. The time
+        # indexes of those files are kept here keyed by file path, so the rows
+        # of the visible range can be read at full resolution after zooming in
+        # The rows read are kept along with the time range they cover, and the
+        # files being read are tracked so a file is not read twice at once
+        self.rangeIndexes = dict()
+        self.rangeDetails = dict()
+        self.rangeReads = set()
+        self.rangeRunner = taskHandler.backgroundRunner()
+        self.rangeTimer = QTimer()
+        self.rangeTimer.setSingleShot(True)
+        self.rangeTimer.setInterval(RANGE_READ_DELAY)
+        self.rangeTimer.timeout.connect(self.readVisibleRanges)
+
+        # Matplot lib figure with a single plot is defined
+        self.fig = Figure(figsize=plotStyle.FIGURE_SIZE, dpi=plotStyle.FIGURE_DPI)
+        self.temperaturePlot = self.fig.add_subplot(111)
+        plotStyle.styleFigure(self.fig)
+        super(plotCanvas, self).__init__(self.fig)
+        self.resetAxes()
+        activeCanvas = self
+        # The number of visible points depends on the plot width,
+        # so reduce the data again whenever the canvas is resized
+        self.mpl_connect('resize_event', self.decimateTraces)
+        # Save the plot area after every full draw for blitting
+        self.mpl_connect('draw_event', self.saveBackground)
 
     '''
     updatePlot function is responsible for updating the plot with new data
     This function takes the folder path and file name of the csv file which
-    contains the data. This data is read into xData and yData lists which are
-    then plotted on the figure
+    contains the data. This data is read into xData and yData arrays which are
+    then plotted on the figure using the plotData function. The data of recently
+    plotted files is served from the dataset cache in the file handler module
+
+    This function reads the file on the calling thread. The GUI reads files on
+    a worker thread and calls plotData directly once the data is ready
+    '''
+    @traceHandler.traced('updatePlot')
+    def updatePlot(self, folderPath, fileName):
+        filePath = folderPath + "/" + fileName
+
+        xData, yData = fileHandler.readPlotData(filePath)
+
+        self.plotData(filePath, fileName, xData, yData)
+
+    '''
+    plotData function is responsible for drawing already loaded data
+    This function takes the file path (used to identify the trace), the file
+    name (used in the legend) along with the time and temperature data and
+    plots it on the figure
 
     If the plot option is selected as single plot, this function clears any
-    previous plots before drawing the new data
+    previous plots before drawing the new data (unless the only trace on the
+    plot is the same file)
+
+    If the plot option is selected as ensemble plot, the data is added to the
+    ensemble instead of being drawn as a trace (see drawEnsemble)
+
+    Only the points needed for the width of the plot are drawn (see the
+    decimation handler module). The full resolution data is kept in the
+    traces registry
+
+    A file which is already on the plot is not drawn twice. Its trace is
+    updated in place if the data has changed and left alone otherwise. Large
+    files which are read in chunks are extended this way as the chunks arrive
+
+    A new trace which fits in the current axes limits is drawn by blitting:
+    only the new line and the legend are drawn over the saved background, so
+    the cost stays the same however many traces are already on the plot
+    Everything else triggers a full draw
 
     This function also updates the legend with the file name of the plot that
     is being drawn
     '''
-    def updatePlot(folderPath, fileName):
-        if 'Single Plot' == plotOption:
-            temperaturePlot.cla()
-        
-        filePath = folderPath + "/" + fileName
+    @traceHandler.traced('plotData')
+    def plotData(self, filePath, fileName, xData, yData):
+        if 'Single Plot' == self.plotOption and list(self.traces) != [filePath]:
+            self.resetAxes()
+
+        if 'Ensemble Plot' == self.plotOption:
+            self.ensemble.add(filePath, xData, yData)
+            self.ensembleChanged = True
+            self.redraw()
+            return
+
+        trace = self.traces.get(filePath)
+        if trace is not None:
+            # Nothing to do if the same data is already on the plot
+            if trace[1] is xData and trace[2] is yData:
+                return
+
+            # Replace the data of the existing trace
+            trace[1:] = [xData, yData, decimationHandler.isSorted(xData)]
+            self.attachRangeIndex(filePath)
+            # Reduce the data over its whole range so the axes limits can be
+            # updated, then again for the visible range
+            if len(xData):
+                trace[0].set_data(*decimationHandler.minMaxDecimate(xData, yData, xData.min(), xData.max(),
+                                                                    self.bucketCount(), trace[3]))
+            else:
+                trace[0].set_data(xData, yData)
+            self.temperaturePlot.relim()
+            self.temperaturePlot.autoscale_view()
+            self.lastDecimation = None
+            self.decimateTraces()
+            # The old line has to be erased, which needs a full draw
+            self.redraw()
+            return
 
-        xData, yData = fileHandler.readCSVData(filePath)
+        # Reduce the data over its whole range. The data is reduced again
+        # for the visible range if the axes limits change
+        xSorted = decimationHandler.isSorted(xData)
+        if len(xData):
+            xVisible, yVisible = decimationHandler.minMaxDecimate(xData, yData, xData.min(), xData.max(),
+                                                                  self.bucketCount(), xSorted)
+        else:
+            xVisible, yVisible = xData, yData
 
-        temperaturePlot.set_xlabel('Time (minutes)')
-        temperaturePlot.set_ylabel('Temperature (deg Celcius)')
-        temperaturePlot.plot(xData, yData, 'o-', label=fileName)
-        temperaturePlot.legend()
-        fig.canvas.draw_idle()
+        # Axes limits before the new trace is added
+        oldLimits = (self.temperaturePlot.get_xlim(), self.temperaturePlot.get_ylim())
+
+        line, = self.temperaturePlot.plot(xVisible, yVisible, plotStyle.LINE_STYLE, label=fileName)
+        self.traces[filePath] = [line, xData, yData, xSorted]
+        self.attachRangeIndex(filePath)
+        legend = self.updateLegend()
+
+        # Reading the limits applies any pending autoscaling for the new trace
+        newLimits = (self.temperaturePlot.get_xlim(), self.temperaturePlot.get_ylim())
+
+        if self.blitBackground is not None and oldLimits == newLimits:
+            # Reduce the new trace for the visible range
+            line.set_data(*decimationHandler.minMaxDecimate(xData, yData, newLimits[0][0], newLimits[0][1],
+                                                            self.bucketCount(), xSorted))
+            # Draw only the new line and the legend over the saved background
+            with traceHandler.span('canvas.blit'):
+                self.restore_region(self.blitBackground)
+                self.temperaturePlot.draw_artist(line)
+                self.temperaturePlot.draw_artist(legend)
+                self.blit(self.temperaturePlot.bbox)
+                # The background now includes the new trace
+                self.blitBackground = self.copy_from_bbox(self.temperaturePlot.bbox)
+        else:
+            self.redraw()
+
+    '''
+    plotBatch function takes a list of (file path, file name, time data,
+    temperature data) tuples and plots all of them with a single full draw
+    and a single legend build, instead of one of each for every file
+    If the plot option is selected as single plot, the plot is cleared once
+    and all the files are plotted together
+    '''
+    @traceHandler.traced('plotBatch')
+    def plotBatch(self, batch):
+        if 'Single Plot' == self.plotOption:
+            self.resetAxes()
+
+        if 'Ensemble Plot' == self.plotOption:
+            for filePath, fileName, xData, yData in batch:
+                self.ensemble.add(filePath, xData, yData)
+            self.ensembleChanged = True
+            self.redraw()
+            return
+
+        bucketCount = self.bucketCount()
+        for filePath, fileName, xData, yData in batch:
+            # Reduce the data over its whole range so the axes limits can be
+            # found, it is reduced again for the visible range at the end
+            xSorted = decimationHandler.isSorted(xData)
+            if len(xData):
+                xVisible, yVisible = decimationHandler.minMaxDecimate(xData, yData, xData.min(), xData.max(),
+                                                                      bucketCount, xSorted)
+            else:
+                xVisible, yVisible = xData, yData
+
+            trace = self.traces.get(filePath)
+            if trace is not None:
+                trace[0].set_data(xVisible, yVisible)
+                trace[1:] = [xData, yData, xSorted]
+            else:
+                line, = self.temperaturePlot.plot(xVisible, yVisible, plotStyle.LINE_STYLE, label=fileName)
+                self.traces[filePath] = [line, xData, yData, xSorted]
+
+        self.temperaturePlot.relim()
+        self.temperaturePlot.autoscale_view()
+        self.lastDecimation = None
+        self.decimateTraces()
+        self.updateLegend()
+        self.redraw()
+
+    '''
+    updateLegend function updates the legend after a trace is added and
+    returns the legend artist
+    The legend is anchored to the upper right corner with an opaque frame
+    so a new legend always covers the previous one when blitting
+    Once the legend is full only its title is updated
+    '''
+    def updateLegend(self):
+        legend = self.temperaturePlot.get_legend()
+        traceCount = len(self.ensembleArtists) + len(self.traces) + len(self.liveTraces)
+        if legend is None or traceCount <= plotStyle.MAX_LEGEND_ENTRIES:
+            lines = self.ensembleArtists + [trace[0] for trace in self.traces.values()] + list(self.liveTraces.values())
+            legend = plotStyle.addLegend(self.temperaturePlot, lines)
+        else:
+            plotStyle.setLegendCount(legend, traceCount)
+
+        return legend
+
+    '''
+    draw function is called by matplotlib for every full draw of the figure
+    (also the ones requested with draw_idle) and times it
+    The ensemble summary is brought up to date first if runs were added
+    '''
+    def draw(self):
+        with traceHandler.span('canvas.draw', traces=len(self.traces) + len(self.liveTraces)):
+            if self.ensembleChanged:
+                self.drawEnsemble()
+            super(plotCanvas, self).draw()
+
+    '''
+    drawEnsemble function replaces the artists of the ensemble plot
+    Every run is resampled onto a common time grid and the percentile bands,
+    the median and the mean are drawn, so the plot holds a handful of artists
+    however many runs it summarizes
+    '''
+    def drawEnsemble(self):
+        self.ensembleChanged = False
+        for artist in self.ensembleArtists:
+            artist.remove()
+        self.ensembleArtists = []
+
+        with traceHandler.span('ensemble.statistics', runs=len(self.ensemble)):
+            summary = self.ensemble.statistics()
+        if summary is None:
+            return
+        grid, statistics = summary
+
+        labels = plotStyle.ensembleLabels(len(self.ensemble))
+        median, = self.temperaturePlot.plot(grid, statistics[50], '-', color=plotStyle.ENSEMBLE_COLOR,
+                                            linewidth=2, label=labels[0])
+        mean, = self.temperaturePlot.plot(grid, statistics['mean'], '--', color=plotStyle.ENSEMBLE_COLOR,
+                                          linewidth=1, label=labels[1])
+        self.ensembleArtists = [median, mean]
+        # relim only looks at lines, so the limits are found before the bands
+        # are added (adding a band extends the limits to cover it)
+        self.temperaturePlot.relim()
+        for (lower, upper, opacity), label in zip(plotStyle.ENSEMBLE_BANDS, labels[2:]):
+            self.ensembleArtists.append(self.temperaturePlot.fill_between(
+                grid, statistics[lower], statistics[upper], color=plotStyle.ENSEMBLE_COLOR, alpha=opacity,
+                linewidth=0, label=label))
+        self.temperaturePlot.autoscale_view()
+        self.updateLegend()
+
+    '''
+    redraw function requests a full draw of the figure
+    The saved background is dropped until the draw is done
+    '''
+    def redraw(self):
+        self.blitBackground = None
+        self.draw_idle()
+
+    '''
+    saveBackground function saves the pixels of the plot area after every
+    full draw so that new traces can be blitted over them
+    '''
+    def saveBackground(self, event):
+        self.blitBackground = self.copy_from_bbox(self.temperaturePlot.bbox)
+
+    '''
+    resetAxes function clears the plot, resets the axes labels and forgets
+    the data of all the traces along with the saved background
+    Clearing the axes also removes its callbacks, so the function which
+    reduces the data when the x axis limits change is connected again
+    '''
+    def resetAxes(self):
+        self.blitBackground = None
+        self.lastDecimation = None
+        self.temperaturePlot.cla()
+        self.traces.clear()
+        self.rangeIndexes.clear()
+        self.rangeDetails.clear()
+        self.liveTraces.clear()
+        self.ensemble.clear()
+        self.ensembleArtists = []
+        self.ensembleChanged = False
+        plotStyle.styleAxes(self.temperaturePlot)
+        self.temperaturePlot.callbacks.connect('xlim_changed', self.decimateTraces)
+
+    '''
+    bucketCount function returns the number of buckets used to reduce the
+    data, which is the width of the plot area in pixels
+    '''
+    def bucketCount(self):
+        return max(int(self.temperaturePlot.bbox.width), 1)
+
+    '''
+    decimateTraces function reduces the data of every trace to the points
+    needed for the current x axis limits and plot width
+    This function is called when the x axis limits change (zoom and pan)
+    and when the canvas is resized. The argument (axes or event) is not used
+    Large files are reduced from the rows read at full resolution if they
+    cover the visible range, and a read of the visible range is scheduled
+    otherwise (see readVisibleRanges)
+    '''
+    def decimateTraces(self, *args):
+        xMin, xMax = self.temperaturePlot.get_xlim()
+        bucketCount = self.bucketCount()
+
+        # Nothing to do if the limits and the plot width have not changed
+        # (autoscaling sets the limits again every time a trace is added)
+        if (xMin, xMax, bucketCount) == self.lastDecimation:
+            return
+        self.lastDecimation = (xMin, xMax, bucketCount)
+
+        for filePath, trace in self.traces.items():
+            xData, yData, xSorted = self.visibleData(filePath, xMin, xMax)
+            trace[0].set_data(*decimationHandler.minMaxDecimate(xData, yData, xMin, xMax, bucketCount, xSorted))
+
+        if self.rangeIndexes:
+            self.rangeTimer.start()
+
+    '''
+    visibleData function takes the file path of a trace and the x axis
+    limits and returns the time and temperature data to reduce for those
+    limits (the rows read at full resolution if they cover the limits, the
+    data of the trace otherwise) along with the sorted flag of the time data
+    '''
+    def visibleData(self, filePath, xMin, xMax):
+        detail = self.rangeDetails.get(filePath)
+        if detail is not None and detail[0] <= xMin and xMax <= detail[1]:
+            return detail[2], detail[3], True
+
+        line, xData, yData, xSorted = self.traces[filePath]
+        return xData, yData, xSorted
+
+    '''
+    attachRangeIndex function takes the file path of a trace and keeps the
+    time index of the file if it is plotted from reduced data (a large file
+    read in chunks). The index is written once the whole file has been read,
+    so this is checked again every time the data of the trace is replaced
+    '''
+    def attachRangeIndex(self, filePath):
+        if filePath not in self.rangeIndexes:
+            index = fileHandler.readRangeIndex(filePath)
+            if index is not None:
+                self.rangeIndexes[filePath] = index
+
+    '''
+    readVisibleRanges function starts reading the rows of the visible time
+    range (plus a margin) on a worker thread for every large file on the plot
+    which does not have them yet. Files whose visible range is too large to
+    read keep being drawn from their reduced data
+    '''
+    def readVisibleRanges(self):
+        xMin, xMax = self.temperaturePlot.get_xlim()
+        margin = (xMax - xMin) * RANGE_READ_MARGIN
+
+        for filePath, index in self.rangeIndexes.items():
+            detail = self.rangeDetails.get(filePath)
+            if filePath in self.rangeReads or (detail is not None and detail[0] <= xMin and xMax <= detail[1]):
+                continue
+
+            byteCount = index.byteCount(xMin - margin, xMax + margin)
+            if byteCount is None or byteCount > RANGE_READ_MAX_BYTES:
+                # Release the rows of the previous zoom level
+                self.rangeDetails.pop(filePath, None)
+                continue
+
+            self.rangeReads.add(filePath)
+            self.rangeRunner.start(fileHandler.readCSVRange, (filePath, index, xMin - margin, xMax + margin),
+                                   onFinished=lambda result, filePath=filePath, xLow=xMin - margin, xHigh=xMax + margin:
+                                   self.rangeReadFinished(filePath, xLow, xHigh, result),
+                                   onFailed=lambda message, filePath=filePath: self.rangeReads.discard(filePath))
+
+    '''
+    rangeReadFinished function keeps the rows read for a time range and draws
+    the trace from them
+    Rows of a file which is no longer on the plot are dropped
+    '''
+    def rangeReadFinished(self, filePath, xLow, xHigh, result):
+        self.rangeReads.discard(filePath)
+        if result is None or filePath not in self.rangeIndexes:
+            return
+
+        self.rangeDetails[filePath] = (xLow, xHigh, result[0], result[1])
+        self.lastDecimation = None
+        self.decimateTraces()
+        self.redraw()
+
+    '''
+    updateLiveTrace function takes the name of a live trace (used in the
+    legend) along with all its time and temperature data so far and draws it
+    The trace is created the first time it is updated
+    The data is reduced for the plot width over its whole range while the
+    axes are autoscaling, or over the visible range once the user has zoomed
+    in. The draw is requested with draw_idle, so the caller decides how often
+    the trace is redrawn by how often it calls this function
+    '''
+    def updateLiveTrace(self, name, xData, yData):
+        line = self.liveTraces.get(name)
+        if line is None:
+            line, = self.temperaturePlot.plot([], [], '-', label=name)
+            self.liveTraces[name] = line
+            self.updateLegend()
+
+        if len(xData):
+            if self.temperaturePlot.get_autoscalex_on():
+                xMin, xMax = xData.min(), xData.max()
+            else:
+                xMin, xMax = self.temperaturePlot.get_xlim()
+            line.set_data(*decimationHandler.minMaxDecimate(xData, yData, xMin, xMax, self.bucketCount(),
+                                                            decimationHandler.isSorted(xData)))
+        else:
+            line.set_data(xData, yData)
+
+        self.temperaturePlot.relim()
+        self.temperaturePlot.autoscale_view()
+        self.redraw()
+
+    '''
+    removeLiveTrace function removes a live trace from the plot
+    '''
+    def removeLiveTrace(self, name):
+        line = self.liveTraces.pop(name, None)
+        if line is not None:
+            line.remove()
+            if self.ensembleArtists or self.traces or self.liveTraces:
+                self.updateLegend()
+            elif self.temperaturePlot.get_legend() is not None:
+                self.temperaturePlot.get_legend().remove()
+            self.redraw()
+
+    '''
+    getTraceData function returns a list with the legend label and the full
+    resolution time and temperature data of every trace on the plot
+    This is used when the plotted data has to be exported
+    '''
+    def getTraceData(self):
+        return [(line.get_label(), xData, yData) for line, xData, yData, xSorted in self.traces.values()]
+
+    '''
+    exportSnapshot function takes the width (in pixels) of the image to
+    export and returns a snapshot of the plot (see the export handler module)
+    The traces are reduced for the current x axis limits and that width, so
+    the snapshot stays small however much data is on the plot
+    '''
+    def exportSnapshot(self, width):
+        xMin, xMax = self.temperaturePlot.get_xlim()
+        snapshot = exportHandler.newSnapshot((xMin, xMax), self.temperaturePlot.get_ylim())
+
+        if self.ensembleArtists:
+            summary = self.ensemble.statistics()
+            if summary is not None:
+                exportHandler.setEnsemble(snapshot, summary[0], summary[1], plotStyle.ensembleLabels(len(self.ensemble)))
+        for filePath, trace in self.traces.items():
+            xData, yData, xSorted = self.visibleData(filePath, xMin, xMax)
+            exportHandler.addTrace(snapshot, trace[0].get_label(), trace[0].get_color(), plotStyle.LINE_STYLE,
+                                   *decimationHandler.minMaxDecimate(xData, yData, xMin, xMax, width, xSorted))
+        # Live traces already hold their reduced data
+        for name, line in self.liveTraces.items():
+            exportHandler.addTrace(snapshot, name, line.get_color(), '-',
+                                   numpy.asarray(line.get_xdata()), numpy.asarray(line.get_ydata()))
+
+        return snapshot
 
     '''
     clearPlot function is responsible for clearing all the plots on the figure
     The funtion resets the axes labels after clearing the plot
     '''
-    def clearPlot():
-        temperaturePlot.cla()
-        temperaturePlot.set_xlabel('Time (minutes)')
-        temperaturePlot.set_ylabel('Temperature (deg Celcius)')
-        
-        fig.canvas.draw_idle()
+    def clearPlot(self):
+        self.resetAxes()
+
+        self.redraw()
 
     '''
     setPlotOption function reads the text from the radio button selection
     and updates the plot option variable.
-    This is used to select Single Plot or Combine Plot options
+    This is used to select Single Plot, Combine Plot or Ensemble Plot options
     '''
-    def setPlotOption(radioButtonText):
-        global plotOption
-        plotOption = radioButtonText
+    def setPlotOption(self, radioButtonText):
+        self.plotOption = radioButtonText
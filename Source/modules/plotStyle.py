@@ -0,0 +1,73 @@
+'''
+Plot Style Module
+This module holds the look of the time vs. temperature plots (titles, labels,
+line style and legend) so the GUI and the command line tools draw the same
+plots. It does not depend on Qt
+'''
+
+# Figure title, axes labels and line style of the temperature plots
+PLOT_TITLE = 'Temperature Decay Curve'
+X_LABEL = 'Time (minutes)'
+Y_LABEL = 'Temperature (deg Celcius)'
+LINE_STYLE = 'o-'
+
+# Default figure size (in inches) and resolution
+FIGURE_SIZE = (10, 8)
+FIGURE_DPI = 100
+
+# Maximum number of traces listed in the legend
+# Building a legend is slow for hundreds of entries (and unreadable), so
+# beyond this number the legend title only shows the total number of traces
+MAX_LEGEND_ENTRIES = 20
+
+# Look of the ensemble plot (the summary of many runs, see the ensemble
+# handler module): its color and the percentile bands drawn around the median
+# as (lower percentile, upper percentile, opacity)
+ENSEMBLE_COLOR = '#1f77b4'
+ENSEMBLE_BANDS = [(5, 95, 0.2), (25, 75, 0.4)]
+
+
+'''
+styleFigure function sets the title of the figure
+'''
+def styleFigure(figure):
+    figure.suptitle(PLOT_TITLE)
+
+
+'''
+styleAxes function sets the labels of the axes
+'''
+def styleAxes(axes):
+    axes.set_xlabel(X_LABEL)
+    axes.set_ylabel(Y_LABEL)
+
+
+'''
+addLegend function takes the axes and the list of line artists on it and
+adds a legend listing up to MAX_LEGEND_ENTRIES of them
+The legend is anchored to the upper right corner with an opaque frame
+This function returns the legend artist
+'''
+def addLegend(axes, lines):
+    legend = axes.legend(handles=lines[:MAX_LEGEND_ENTRIES], loc='upper right', framealpha=1)
+    if len(lines) > MAX_LEGEND_ENTRIES:
+        setLegendCount(legend, len(lines))
+
+    return legend
+
+
+'''
+setLegendCount function updates the legend title with the total number of
+traces when not all of them are listed
+'''
+def setLegendCount(legend, traceCount):
+    legend.set_title('{} of {} traces listed'.format(MAX_LEGEND_ENTRIES, traceCount))
+
+
+'''
+ensembleLabels function takes the number of runs in the ensemble and returns
+the legend labels of the median, the mean and every percentile band
+'''
+def ensembleLabels(runCount):
+    return (['Median of {} run{}'.format(runCount, '' if 1 == runCount else 's'), 'Mean'] +
+            ['{}-{} percentile'.format(lower, upper) for lower, upper, opacity in ENSEMBLE_BANDS])
@@ -0,0 +1,233 @@
+'''
+Range Handler Module
+This module handles the sparse time index of large csv files, which maps
+elapsed time values to byte offsets in the file
+
+Large files are read in chunks and only a reduced copy of their data is kept
+for the plot (see the decimation handler module). While a large file is read
+for the first time, the position of a line is recorded every
+INDEX_STRIDE_BYTES bytes along with its elapsed time. Once the user zooms
+into a small part of the file, only the bytes between the index entries
+around the visible time range are read and parsed (see
+fileHandler.readCSVRange), so a deep zoom costs the same however long the
+file is
+
+The index is written into the cache folder next to the csv file, like the
+sidecar files, and is only used while the modification time and size of the
+csv file match the ones stored in its header
+
+Index layout (little endian):
+    48 byte header - magic, format version, entry count, csv mtime (ns),
+                     csv size, time of the first row (ns), end of the data
+    int64 array    - byte offset of every entry
+    float64 array  - elapsed time (minutes) of the row at every entry
+    float64 array  - seconds added to that row by the midnight unwrapping
+'''
+
+import os
+import struct
+
+import numpy
+
+from modules import sidecarHandler
+
+# File extension of the index files
+INDEX_EXTENSION = '.tci'
+# Number of bytes between two entries of the index
+INDEX_STRIDE_BYTES = 256 * 1024
+
+# Header layout and identification of the index files
+HEADER_FORMAT = '<4sHxxqqqqq'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+INDEX_MAGIC = b'TCRI'
+INDEX_VERSION = 1
+
+
+'''
+indexPath function takes the path of a csv file and returns the path of its
+index file inside the cache folder next to the csv file
+'''
+def indexPath(filePath):
+    folderPath, fileName = os.path.split(os.path.abspath(filePath))
+    return os.path.join(folderPath, sidecarHandler.CACHE_DIR_NAME, fileName + INDEX_EXTENSION)
+
+
+'''
+rangeIndex class holds the entries of the index of a csv file and finds the
+bytes to read for a time range
+'''
+class rangeIndex:
+
+    '''
+    rangeIndex class constructor takes the entry arrays, the time of the
+    first row (nanoseconds, as parsed by pandas) and the offset of the end
+    of the data
+    '''
+    def __init__(self, offsets, xValues, dayOffsets, firstTime, endOffset):
+        self.offsets = offsets
+        self.xValues = xValues
+        self.dayOffsets = dayOffsets
+        self.firstTime = firstTime
+        self.endOffset = endOffset
+        # Time ranges can only be looked up in files whose time keeps increasing
+        self.isSorted = bool(len(xValues)) and bool(numpy.all(numpy.diff(xValues) >= 0))
+
+    '''
+    __len__ function returns the number of entries
+    '''
+    def __len__(self):
+        return len(self.offsets)
+
+    '''
+    byteRange function takes a time range (in minutes) and returns the entry
+    to start reading from and the offset to stop reading at, so every row in
+    the range is read. This function returns None if the file is not sorted
+    '''
+    def byteRange(self, xMin, xMax):
+        if not self.isSorted:
+            return None
+
+        entry = max(int(numpy.searchsorted(self.xValues, xMin, 'right')) - 1, 0)
+        stop = int(numpy.searchsorted(self.xValues, xMax, 'right'))
+        stopOffset = int(self.offsets[stop]) if stop < len(self.offsets) else self.endOffset
+
+        return entry, stopOffset
+
+    '''
+    byteCount function returns the number of bytes to read for a time range,
+    or None if the file is not sorted
+    '''
+    def byteCount(self, xMin, xMax):
+        byteRange = self.byteRange(xMin, xMax)
+        if byteRange is None:
+            return None
+
+        return byteRange[1] - int(self.offsets[byteRange[0]])
+
+
+'''
+indexBuilder class collects the entries of the index while a csv file is
+read in chunks (see fileHandler.readCSVChunks)
+'''
+class indexBuilder:
+
+    '''
+    indexBuilder class constructor takes the number of bytes between two
+    entries
+    '''
+    def __init__(self, strideBytes=INDEX_STRIDE_BYTES):
+        self.strideBytes = strideBytes
+        self.offsets = []
+        self.xValues = []
+        self.dayOffsets = []
+        self.firstTime = None
+        self.endOffset = 0
+        self.nextOffset = 0
+
+    '''
+    addBlock function takes the offset of a block of complete lines in the
+    file, the bytes of the block, the time of the first row of the file
+    (pandas time stamp) and the elapsed time (minutes) and midnight offsets
+    (seconds) of the rows of the block and records an entry every stride
+    bytes
+    Blocks whose line count does not match the rows (blank lines) are not
+    indexed, so the reads around them simply start from an earlier entry
+    '''
+    def addBlock(self, blockOffset, data, firstTime, xData, dayOffsets):
+        self.firstTime = firstTime.value
+        self.endOffset = blockOffset + len(data)
+        lineCount = data.count(b'\n') + (0 if data.endswith(b'\n') else 1)
+        if lineCount != len(xData):
+            return
+
+        lineStart = max(self.nextOffset - blockOffset, 0)
+        # Rows are counted from the previous entry instead of the block start
+        row = 0
+        rowStart = 0
+        while lineStart < len(data):
+            # Move to the start of the next line unless already on one
+            if lineStart and data[lineStart - 1:lineStart] != b'\n':
+                lineStart = data.find(b'\n', lineStart) + 1
+                if not lineStart or lineStart >= len(data):
+                    break
+
+            row += data.count(b'\n', rowStart, lineStart)
+            rowStart = lineStart
+            self.offsets.append(blockOffset + lineStart)
+            self.xValues.append(xData[row])
+            self.dayOffsets.append(dayOffsets[row])
+            lineStart += self.strideBytes
+
+        self.nextOffset = blockOffset + lineStart
+
+    '''
+    finish function returns the index, or None if no rows were read
+    '''
+    def finish(self):
+        if self.firstTime is None:
+            return None
+
+        return rangeIndex(numpy.array(self.offsets, dtype=numpy.int64),
+                          numpy.array(self.xValues, dtype=numpy.float64),
+                          numpy.array(self.dayOffsets, dtype=numpy.float64), self.firstTime, self.endOffset)
+
+
+'''
+readIndex function takes the path and the fingerprint of a csv file and
+returns its index, or None if there is no index or if it does not match the
+current modification time and size of the csv file
+'''
+def readIndex(filePath, fingerprint):
+    try:
+        with open(indexPath(filePath), 'rb') as indexFile:
+            header = indexFile.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                return None
+
+            magic, version, entries, csvMtime, csvSize, firstTime, endOffset = struct.unpack(HEADER_FORMAT, header)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or (csvMtime, csvSize) != fingerprint[1:]:
+                return None
+
+            offsets = numpy.fromfile(indexFile, dtype='<i8', count=entries)
+            xValues = numpy.fromfile(indexFile, dtype='<f8', count=entries)
+            dayOffsets = numpy.fromfile(indexFile, dtype='<f8', count=entries)
+    except OSError:
+        return None
+
+    # Check the file is not truncated
+    if len(dayOffsets) != entries:
+        return None
+
+    return rangeIndex(offsets, xValues, dayOffsets, firstTime, endOffset)
+
+
+'''
+writeIndex function takes the path and the fingerprint of a csv file along
+with its index and writes the index file
+The index is written to a temporary file first and then renamed so a
+partially written index is never read
+
+Failing to write the index is not an error, the file will simply be read
+with its reduced data only
+This function returns True if the index was written
+'''
+def writeIndex(filePath, fingerprint, index):
+    path = indexPath(filePath)
+    tempPath = path + '.tmp'
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tempPath, 'wb') as indexFile:
+            indexFile.write(struct.pack(HEADER_FORMAT, INDEX_MAGIC, INDEX_VERSION, len(index),
+                                        fingerprint[1], fingerprint[2], index.firstTime, index.endOffset))
+            numpy.asarray(index.offsets, dtype='<i8').tofile(indexFile)
+            numpy.asarray(index.xValues, dtype='<f8').tofile(indexFile)
+            numpy.asarray(index.dayOffsets, dtype='<f8').tofile(indexFile)
+        os.replace(tempPath, path)
+    except OSError:
+        # Remove any partially written file
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        return False
+
+    return True
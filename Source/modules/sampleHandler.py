@@ -0,0 +1,162 @@
+'''
+Sample Handler Module
+This module holds the samples of a logging session in typed arrays
+
+Every sample is a time stamp (nanoseconds since the epoch, int64) and a
+temperature (float32), 12 bytes in total. The arrays grow geometrically, so
+appending stays cheap however long the session is. Time stamps keep their
+date and sub-second part, so sessions running past midnight or for several
+days stay in order
+
+The samples are turned into text in batches (whole blocks of csv lines)
+with vectorized NumPy operations instead of one string per sample
+'''
+
+import math
+import time
+from datetime import datetime
+
+import numpy
+
+from modules import arrayHandler
+
+# Number of nanoseconds in a minute, used to find the elapsed time
+NANOSECONDS_PER_MINUTE = 60 * 1000000000
+
+
+'''
+localUTCOffset function returns the offset of the local time from UTC in
+nanoseconds
+'''
+def localUTCOffset():
+    return int(datetime.now().astimezone().utcoffset().total_seconds()) * 1000000000
+
+
+'''
+parseTemperature function takes the text entered by the user and returns
+the temperature as a float, or None if the text is not a finite number
+Decimals and negative values are accepted
+'''
+def parseTemperature(text):
+    try:
+        temperature = float(text.strip())
+    except ValueError:
+        return None
+
+    return temperature if math.isfinite(temperature) else None
+
+
+'''
+formatCSVLines function takes an array of local date time values and the
+array of temperatures and returns them as a block of csv lines (time,temp)
+with ISO 8601 time stamps with milliseconds (the format of the sensor
+recordings), built with vectorized string operations
+'''
+def formatCSVLines(localTimes, temperatures):
+    if not len(localTimes):
+        return ''
+
+    lines = numpy.char.add(numpy.char.add(numpy.datetime_as_string(localTimes, unit='ms'), ','),
+                           numpy.asarray(temperatures).astype(str))
+    return '\n'.join(lines.tolist()) + '\n'
+
+
+'''
+sampleStore class holds the time stamps and temperatures of a session
+The time stamps are shown and written in local time, using the offset from
+UTC at the start of the session
+'''
+class sampleStore:
+
+    '''
+    sampleStore class constructor takes the initial capacity and allocates
+    the empty arrays
+    '''
+    def __init__(self, capacity=arrayHandler.DEFAULT_CAPACITY):
+        self.timeData = arrayHandler.growableArray(numpy.int64, capacity)
+        self.temperatureData = arrayHandler.growableArray(numpy.float32, capacity)
+        self.utcOffset = localUTCOffset()
+
+    '''
+    __len__ function returns the number of samples
+    '''
+    def __len__(self):
+        return len(self.timeData)
+
+    '''
+    append function takes a time stamp (nanoseconds since the epoch, the
+    current time if None) and a temperature and adds them as a new sample
+    '''
+    def append(self, epochNs, temperature):
+        self.timeData.append(time.time_ns() if epochNs is None else epochNs)
+        self.temperatureData.append(temperature)
+
+    '''
+    extend function takes arrays of time stamps and temperatures and adds
+    all of them
+    '''
+    def extend(self, epochNs, temperatures):
+        self.timeData.extend(epochNs)
+        self.temperatureData.extend(temperatures)
+
+    '''
+    clear function removes all the samples (keeping the memory for the next
+    session) and takes the offset from UTC again
+    '''
+    def clear(self):
+        self.timeData.clear()
+        self.temperatureData.clear()
+        self.utcOffset = localUTCOffset()
+
+    '''
+    nbytes function returns the memory held by the arrays
+    '''
+    def nbytes(self):
+        return self.timeData.buffer.nbytes + self.temperatureData.buffer.nbytes
+
+    '''
+    localTimes function returns the local date time values (datetime64) of
+    the samples in the given range
+    '''
+    def localTimes(self, start=0, stop=None):
+        return (self.timeData.view()[start:stop] + self.utcOffset).view('datetime64[ns]')
+
+    '''
+    temperatures function returns a view of the temperatures of the samples
+    in the given range
+    '''
+    def temperatures(self, start=0, stop=None):
+        return self.temperatureData.view()[start:stop]
+
+    '''
+    elapsedMinutes function returns the elapsed time (in minutes since the
+    first sample) of every sample, ready to be plotted
+    '''
+    def elapsedMinutes(self):
+        epochNs = self.timeData.view()
+        if not len(epochNs):
+            return numpy.empty(0, dtype=numpy.float64)
+
+        return (epochNs - epochNs[0]) / NANOSECONDS_PER_MINUTE
+
+    '''
+    formatTime function returns the local time of a sample in HH:MM:SS.mmm
+    format (used by the table, which only formats the visible rows)
+    '''
+    def formatTime(self, row):
+        return str(numpy.datetime64(int(self.timeData[row]) + self.utcOffset, 'ns'))[11:23]
+
+    '''
+    formatTimes function returns the local time stamps of the samples in the
+    given range as ISO 8601 strings with milliseconds (the format of the
+    sensor recordings), formatted in one vectorized call
+    '''
+    def formatTimes(self, start=0, stop=None):
+        return numpy.datetime_as_string(self.localTimes(start, stop), unit='ms')
+
+    '''
+    csvLines function returns the samples in the given range as a block of
+    csv lines (time,temp), built with vectorized string operations
+    '''
+    def csvLines(self, start=0, stop=None):
+        return formatCSVLines(self.localTimes(start, stop), self.temperatures(start, stop))
@@ -0,0 +1,458 @@
+'''
+Sensor Handler Module
+This module receives live temperature readings from sensors over a UDP or TCP
+socket or a named pipe
+
+Every reading is one line of text
+    <channel>,<time stamp>,<temperature>
+where the time stamp is given in seconds since the epoch. The channel can be
+left out (<time stamp>,<temperature>) for a single sensor
+
+The most recent readings of every channel are kept in a fixed size ring
+buffer and can be recorded to one csv file per channel through the stream
+handler module. The connections are served by an asyncio event loop running
+on its own thread, so bursts of readings never hold up the GUI, which reads
+the ring buffers on a timer. The recorded readings are formatted and written
+on another thread, so syncing the files to disk never holds up the sockets
+'''
+
+import os
+import re
+import queue
+import asyncio
+import threading
+from datetime import datetime
+
+import numpy
+
+from modules import sampleHandler
+from modules import streamHandler
+
+# Protocols the sensor server can listen on
+PROTOCOLS = ['UDP', 'TCP', 'Pipe']
+# Default address of the sockets (host:port)
+DEFAULT_ADDRESS = '127.0.0.1:50007'
+# Channel name used for readings without a channel
+DEFAULT_CHANNEL = '0'
+
+# Number of readings kept per channel (about 4 minutes at 1 kHz)
+RING_CAPACITY = 2 ** 18
+# Number of bytes read from a stream at a time
+READ_SIZE = 64 * 1024
+
+# Recorded readings are flushed to disk once there are this many of them
+# or once the oldest one is this many seconds old
+RECORD_FLUSH_ROWS = 1000
+RECORD_FLUSH_SECONDS = 1.0
+
+
+'''
+ringBuffer class holds the most recent time stamps and temperatures of a
+channel in two fixed size NumPy arrays
+Once the buffer is full every new reading overwrites the oldest one, so the
+memory used never grows however long the sensor runs
+The buffer is written by the sensor thread and read by the GUI thread, so it
+is guarded by a lock
+'''
+class ringBuffer:
+
+    '''
+    ringBuffer class constructor takes the number of readings to keep and
+    allocates the arrays
+    '''
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = int(capacity)
+        self.timeData = numpy.empty(self.capacity, dtype=numpy.float64)
+        self.temperatureData = numpy.empty(self.capacity, dtype=numpy.float32)
+        # Number of readings added since the buffer was created
+        self.totalCount = 0
+        self.lock = threading.Lock()
+
+    '''
+    __len__ function returns the number of readings in the buffer
+    '''
+    def __len__(self):
+        return min(self.totalCount, self.capacity)
+
+    '''
+    extend function takes arrays of time stamps and temperatures and adds
+    them to the buffer, overwriting the oldest readings if it is full
+    '''
+    def extend(self, timeData, temperatureData):
+        count = len(timeData)
+        # Only the last readings fit if there are more than the capacity
+        skipped = max(count - self.capacity, 0)
+        timeData = timeData[skipped:]
+        temperatureData = temperatureData[skipped:]
+
+        with self.lock:
+            start = (self.totalCount + skipped) % self.capacity
+            # Copy up to the end of the arrays and wrap the rest to the start
+            firstPart = min(len(timeData), self.capacity - start)
+            self.timeData[start:start + firstPart] = timeData[:firstPart]
+            self.temperatureData[start:start + firstPart] = temperatureData[:firstPart]
+            self.timeData[:len(timeData) - firstPart] = timeData[firstPart:]
+            self.temperatureData[:len(timeData) - firstPart] = temperatureData[firstPart:]
+            self.totalCount += count
+
+    '''
+    data function returns copies of the time stamps and temperatures in the
+    buffer, oldest first
+    '''
+    def data(self):
+        with self.lock:
+            if self.totalCount <= self.capacity:
+                return self.timeData[:self.totalCount].copy(), self.temperatureData[:self.totalCount].copy()
+
+            start = self.totalCount % self.capacity
+            return (numpy.concatenate((self.timeData[start:], self.timeData[:start])),
+                    numpy.concatenate((self.temperatureData[start:], self.temperatureData[:start])))
+
+
+'''
+sensorRecorder class writes the readings of every channel to its own csv
+file on a thread of its own
+The readings arrive in batches through a queue and every batch is formatted
+in one vectorized call. A channel whose file can not be created or written
+stops being recorded and its error is kept, the other channels carry on
+'''
+class sensorRecorder:
+
+    '''
+    sensorRecorder class constructor takes the folder the csv files are
+    written to
+    '''
+    def __init__(self, recordFolder):
+        self.recordFolder = recordFolder
+        self.batches = queue.Queue()
+        # Session writer and error message of every channel
+        self.writers = dict()
+        self.errors = dict()
+        self.thread = threading.Thread(target=self.run, name='sensorRecorder', daemon=True)
+
+    '''
+    start function starts the recording thread
+    '''
+    def start(self):
+        self.thread.start()
+
+    '''
+    add function takes the channel name and the time stamp and temperature
+    arrays of a batch of readings and queues them for recording
+    '''
+    def add(self, channel, timeData, temperatureData):
+        self.batches.put((channel, timeData, temperatureData))
+
+    '''
+    run function writes the queued batches until the recorder is stopped
+    The pending readings are flushed once they have waited long enough, even
+    if the sensors stopped sending
+    '''
+    def run(self):
+        while True:
+            try:
+                batch = self.batches.get(timeout=RECORD_FLUSH_SECONDS)
+            except queue.Empty:
+                batch = False
+            if batch is None:
+                break
+
+            if batch:
+                self.write(*batch)
+            for channel, writer in list(self.writers.items()):
+                self.tryWriter(channel, writer.flushIfDue)
+
+    '''
+    write function appends a batch of readings of a channel to its csv file,
+    which is created for the first reading of the channel
+    The time stamps are written as local ISO date and time with milliseconds
+    '''
+    def write(self, channel, timeData, temperatureData):
+        if channel in self.errors:
+            return
+
+        writer = self.writers.get(channel)
+        if writer is None:
+            # Keep only the characters which are safe in a file name
+            channelName = re.sub(r'[^A-Za-z0-9_-]', '_', channel)
+            timeStamp = datetime.now().strftime('%Y_%m_%d_%H_%M_%S_')
+            filePath = os.path.join(self.recordFolder, timeStamp + 'Sensor_' + channelName + '.csv')
+            try:
+                writer = self.writers[channel] = streamHandler.sessionWriter(filePath, RECORD_FLUSH_ROWS,
+                                                                             RECORD_FLUSH_SECONDS)
+            except OSError as error:
+                self.errors[channel] = str(error)
+                return
+
+        # Round the time stamps to microseconds like datetime does before
+        # cutting them to milliseconds
+        epochNs = numpy.round(timeData * 1e6).astype(numpy.int64) * 1000
+        localTimes = (epochNs + sampleHandler.localUTCOffset()).view('datetime64[ns]')
+        lines = sampleHandler.formatCSVLines(localTimes, temperatureData)
+        self.tryWriter(channel, writer.appendLines, lines, len(timeData))
+
+    '''
+    tryWriter function calls a function of the session writer of a channel
+    and stops recording the channel if it fails
+    The journal of the channel is kept so the readings written so far can
+    still be recovered
+    '''
+    def tryWriter(self, channel, function, *args):
+        try:
+            function(*args)
+        except OSError as error:
+            self.errors[channel] = str(error)
+            writer = self.writers.pop(channel)
+            try:
+                writer.journal.close()
+            except OSError:
+                pass
+
+    '''
+    stop function writes the readings still queued, stops the recording
+    thread and saves the csv files
+    This function returns the paths of the csv files saved
+    '''
+    def stop(self):
+        self.batches.put(None)
+        self.thread.join()
+
+        filePaths = []
+        for channel, writer in list(self.writers.items()):
+            try:
+                filePaths.append(writer.finalize())
+            except OSError as error:
+                self.errors[channel] = str(error)
+        self.writers.clear()
+
+        return filePaths
+
+
+'''
+datagramProtocol class passes the readings of every UDP datagram received
+to the sensor server
+'''
+class datagramProtocol(asyncio.DatagramProtocol):
+
+    '''
+    datagramProtocol class constructor takes the sensor server
+    '''
+    def __init__(self, server):
+        self.server = server
+
+    '''
+    datagram_received function is called by the event loop with the data of
+    every datagram, which can hold any number of complete lines
+    '''
+    def datagram_received(self, data, address):
+        self.server.addLines(data.splitlines())
+
+
+'''
+sensorServer class listens for the readings of any number of sensors and
+keeps them in one ring buffer per channel
+'''
+class sensorServer:
+
+    '''
+    sensorServer class constructor takes the protocol (see PROTOCOLS), the
+    address (host:port for sockets or the path of the named pipe) and the
+    folder the readings are recorded to (None to not record them)
+    '''
+    def __init__(self, protocol, address, recordFolder=None, capacity=RING_CAPACITY):
+        if protocol not in PROTOCOLS:
+            raise ValueError('Unknown protocol ' + protocol)
+        self.protocol = protocol
+        self.address = address
+        self.recordFolder = recordFolder
+        self.capacity = capacity
+
+        # Ring buffer of every channel and the recorder of the csv files
+        self.buffers = dict()
+        self.recorder = None if recordFolder is None else sensorRecorder(recordFolder)
+        self.buffersLock = threading.Lock()
+        # Time stamp of the first reading, used as the start of the elapsed time
+        self.firstTime = None
+        # Number of lines which could not be read
+        self.errorCount = 0
+
+        self.loop = None
+        self.thread = None
+        # Socket, server or pipe transport which is listening for readings
+        self.listener = None
+        self.startError = None
+        self.started = threading.Event()
+
+    '''
+    start function starts the event loop thread and waits until the server
+    is listening
+    This function raises OSError (or ValueError for a bad address) if the
+    server could not be started
+    '''
+    def start(self):
+        if self.recorder is not None:
+            self.recorder.start()
+        self.thread = threading.Thread(target=self.run, name='sensorServer', daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.startError is not None:
+            self.thread.join()
+            if self.recorder is not None:
+                self.recorder.stop()
+            raise self.startError
+
+    '''
+    stop function stops the event loop thread and saves the recorded csv
+    files
+    This function returns the paths of the recorded csv files
+    '''
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+        return [] if self.recorder is None else self.recorder.stop()
+
+    '''
+    recordErrors function returns the error message of every channel which
+    could not be recorded, keyed by channel name
+    '''
+    def recordErrors(self):
+        return {} if self.recorder is None else dict(self.recorder.errors)
+
+    '''
+    run function runs the event loop on the server thread until the server
+    is stopped
+    '''
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            try:
+                self.loop.run_until_complete(self.listen())
+            except (OSError, ValueError) as error:
+                self.startError = error
+                return
+            finally:
+                self.started.set()
+
+            self.loop.run_forever()
+        finally:
+            if self.listener is not None:
+                self.listener.close()
+            # Cancel the connections which are still open
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    '''
+    listen function opens the socket or the named pipe for the readings
+    '''
+    async def listen(self):
+        if self.protocol == 'Pipe':
+            if os.name != 'posix':
+                raise ValueError('Named pipes are only supported on POSIX systems')
+            if not os.path.exists(self.address):
+                os.mkfifo(self.address)
+            # Opening the pipe for writing as well keeps it open when the
+            # sensors disconnect, so they can reconnect at any time
+            pipeFile = os.fdopen(os.open(self.address, os.O_RDWR | os.O_NONBLOCK), 'rb', buffering=0)
+            reader = asyncio.StreamReader()
+            self.listener = (await self.loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipeFile))[0]
+            self.loop.create_task(self.readStream(reader))
+            return
+
+        host, separator, port = self.address.rpartition(':')
+        if not separator or not port.isdigit():
+            raise ValueError('The address has to be given as host:port')
+
+        if self.protocol == 'UDP':
+            self.listener = (await self.loop.create_datagram_endpoint(lambda: datagramProtocol(self),
+                                                                      local_addr=(host, int(port))))[0]
+        else:
+            self.listener = await asyncio.start_server(self.readStream, host, int(port))
+
+    '''
+    readStream function reads the lines of a TCP connection or the named
+    pipe until it is closed
+    '''
+    async def readStream(self, reader, writer=None):
+        remainder = b''
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            # Only complete lines are read, the rest waits for the next block
+            data = remainder + data
+            lineEnd = data.rfind(b'\n') + 1
+            self.addLines(data[:lineEnd].splitlines())
+            remainder = data[lineEnd:]
+
+        if writer is not None:
+            writer.close()
+
+    '''
+    addLines function takes a list of lines (bytes) and adds their readings
+    to the ring buffers (and the csv files) of their channels
+    Lines which can not be read are counted and skipped
+    '''
+    def addLines(self, lines):
+        readings = dict()
+        for line in lines:
+            fields = line.split(b',')
+            try:
+                if len(fields) == 3:
+                    channel = fields[0].strip().decode()
+                    timeStamp, temperature = float(fields[1]), float(fields[2])
+                elif len(fields) == 2:
+                    channel = DEFAULT_CHANNEL
+                    timeStamp, temperature = float(fields[0]), float(fields[1])
+                else:
+                    raise ValueError(line)
+            except (ValueError, UnicodeDecodeError):
+                if line.strip():
+                    self.errorCount += 1
+                continue
+            channelReadings = readings.setdefault(channel, ([], []))
+            channelReadings[0].append(timeStamp)
+            channelReadings[1].append(temperature)
+
+        for channel, (timeData, temperatureData) in readings.items():
+            if self.firstTime is None:
+                self.firstTime = timeData[0]
+            # The buffer keeps float32 temperatures, the recording the values as read
+            timeData = numpy.array(timeData)
+            temperatureData = numpy.array(temperatureData)
+            self.channelBuffer(channel).extend(timeData, temperatureData)
+            if self.recorder is not None:
+                self.recorder.add(channel, timeData, temperatureData)
+
+    '''
+    channelBuffer function returns the ring buffer of a channel, creating it
+    for the first reading of the channel
+    '''
+    def channelBuffer(self, channel):
+        buffer = self.buffers.get(channel)
+        if buffer is None:
+            with self.buffersLock:
+                buffer = self.buffers[channel] = ringBuffer(self.capacity)
+        return buffer
+
+    '''
+    channels function returns a list of the channel names and their ring
+    buffers, sorted by channel name
+    '''
+    def channels(self):
+        with self.buffersLock:
+            return sorted(self.buffers.items())
+
+    '''
+    channelData function takes a ring buffer and returns the elapsed time
+    (in minutes since the first reading of the server) and temperature arrays
+    of its readings
+    '''
+    def channelData(self, buffer):
+        timeData, temperatureData = buffer.data()
+        return (timeData - self.firstTime) / 60, temperatureData
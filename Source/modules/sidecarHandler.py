@@ -0,0 +1,238 @@
+'''
+Sidecar Handler Module
+This module handles the binary sidecar files which hold the parsed time and
+temperature data of csv files
+
+A sidecar is written into a cache folder next to the csv file the first time
+the csv file is parsed. Later reads load the binary arrays of the sidecar
+instead of parsing the csv text again, as long as the modification time and
+size of the csv file still match the values stored in the sidecar header
+
+Sidecar layout (little endian):
+    32 byte header - magic, format version, row count, csv mtime (ns), csv size
+    float64 array  - elapsed time in minutes
+    float32 array  - temperature in deg Celcius
+
+The sidecars of a whole folder can be rebuilt or pruned from the command line
+(run from the Source folder):
+    python -m modules.sidecarHandler rebuild <folder> [--recursive] [--force]
+    python -m modules.sidecarHandler prune <folder> [--recursive] [--all]
+'''
+
+import os
+import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from modules import cacheHandler
+
+# Name of the cache folder created next to the csv files
+CACHE_DIR_NAME = '.teacup_cache'
+# File extension of the sidecar files
+SIDECAR_EXTENSION = '.tcs'
+
+# Header layout and identification of the sidecar files
+HEADER_FORMAT = '<4sHxxqqq'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+SIDECAR_MAGIC = b'TCSC'
+SIDECAR_VERSION = 1
+
+
+'''
+sidecarPath function takes the path of a csv file and returns the path of
+its sidecar file inside the cache folder next to the csv file
+'''
+def sidecarPath(filePath):
+    folderPath, fileName = os.path.split(os.path.abspath(filePath))
+    return os.path.join(folderPath, CACHE_DIR_NAME, fileName + SIDECAR_EXTENSION)
+
+
+'''
+readHeader function takes the path of a sidecar file and returns its row count
+and the csv modification time and size stored in the header
+This function returns None if the file is not a valid sidecar
+'''
+def readHeader(path):
+    try:
+        with open(path, 'rb') as sidecarFile:
+            header = sidecarFile.read(HEADER_SIZE)
+    except OSError:
+        return None
+
+    if len(header) != HEADER_SIZE:
+        return None
+
+    magic, version, rows, csvMtime, csvSize = struct.unpack(HEADER_FORMAT, header)
+    if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION:
+        return None
+
+    return rows, csvMtime, csvSize
+
+
+'''
+readSidecar function takes the path and the fingerprint of a csv file and
+reads the time and temperature arrays from its sidecar file
+The arrays are read straight into memory without any parsing. They are not
+memory mapped, since every mapping would keep the sidecar file open for as
+long as the arrays stay in the dataset cache
+
+This function returns None if there is no sidecar or if the sidecar does not
+match the current modification time and size of the csv file
+'''
+def readSidecar(filePath, fingerprint):
+    try:
+        with open(sidecarPath(filePath), 'rb') as sidecarFile:
+            header = sidecarFile.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                return None
+
+            magic, version, rows, csvMtime, csvSize = struct.unpack(HEADER_FORMAT, header)
+            # Check the sidecar was written for the current version of the csv file
+            if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION or (csvMtime, csvSize) != fingerprint[1:]:
+                return None
+
+            xData = numpy.fromfile(sidecarFile, dtype='<f8', count=rows)
+            yData = numpy.fromfile(sidecarFile, dtype='<f4', count=rows)
+    except OSError:
+        return None
+
+    # Check the file is not truncated
+    if len(yData) != rows:
+        return None
+
+    return xData, yData
+
+
+'''
+writeSidecar function takes the path and the fingerprint of a csv file along
+with its parsed time and temperature arrays and writes the sidecar file
+The sidecar is written to a temporary file first and then renamed so a
+partially written sidecar is never read
+
+Failing to write the sidecar (read only folder, sidecar in use etc.) is not
+an error, the csv file will simply be parsed again next time
+This function returns True if the sidecar was written
+'''
+def writeSidecar(filePath, fingerprint, xData, yData):
+    path = sidecarPath(filePath)
+    tempPath = path + '.tmp'
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tempPath, 'wb') as sidecarFile:
+            sidecarFile.write(struct.pack(HEADER_FORMAT, SIDECAR_MAGIC, SIDECAR_VERSION,
+                                          len(xData), fingerprint[1], fingerprint[2]))
+            numpy.asarray(xData, dtype='<f8').tofile(sidecarFile)
+            numpy.asarray(yData, dtype='<f4').tofile(sidecarFile)
+        os.replace(tempPath, path)
+    except OSError:
+        # Remove any partially written file
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        return False
+
+    return True
+
+
+'''
+isSidecarValid function takes the path of a csv file and returns True if it
+has a sidecar which matches the current modification time and size
+'''
+def isSidecarValid(filePath):
+    header = readHeader(sidecarPath(filePath))
+    return header is not None and header[1:] == cacheHandler.fileFingerprint(filePath)[1:]
+
+
+'''
+findCSVFiles function takes a folder path and returns the paths of all the csv
+files in that folder (and in all its sub folders if recursive is True)
+Cache folders are skipped
+'''
+def findCSVFiles(folderPath, recursive):
+    csvFiles = []
+    for entry in os.scandir(folderPath):
+        if entry.is_dir():
+            if recursive and entry.name != CACHE_DIR_NAME:
+                csvFiles.extend(findCSVFiles(entry.path, recursive))
+        elif entry.is_file() and entry.name.endswith('.csv'):
+            csvFiles.append(entry.path)
+
+    return csvFiles
+
+
+'''
+rebuildSidecar function takes the path of a csv file, parses it and writes a
+new sidecar file
+This function returns the csv path and the number of rows parsed
+'''
+def rebuildSidecar(filePath):
+    # Imported here since the file handler module imports this module
+    from modules import fileHandler
+
+    fingerprint = cacheHandler.fileFingerprint(filePath)
+    xData, yData = fileHandler.readCSVData(filePath)
+    writeSidecar(filePath, fingerprint, xData, yData)
+
+    return filePath, len(xData)
+
+
+'''
+rebuildFolder function writes the sidecar files of all the csv files in a
+folder using a pool of processes
+Csv files which already have a valid sidecar are skipped unless force is True
+'''
+def rebuildFolder(folderPath, recursive=False, force=False):
+    csvFiles = findCSVFiles(folderPath, recursive)
+    if not force:
+        csvFiles = [filePath for filePath in csvFiles if not isSidecarValid(filePath)]
+
+    print('Rebuilding {} sidecar files'.format(len(csvFiles)))
+    with ProcessPoolExecutor() as executor:
+        for filePath, rows in executor.map(rebuildSidecar, csvFiles, chunksize=8):
+            print('{} ({} rows)'.format(filePath, rows))
+
+
+'''
+pruneFolder function removes the sidecar files in a folder which no longer
+match their csv file (or whose csv file was deleted)
+All sidecar files are removed if removeAll is True
+Only the files with the sidecar extension are considered, every other file
+of the cache folder is kept
+'''
+def pruneFolder(folderPath, recursive=False, removeAll=False):
+    removed = 0
+    for entry in os.scandir(folderPath):
+        if entry.is_dir() and entry.name == CACHE_DIR_NAME:
+            for sidecar in os.scandir(entry.path):
+                # The cache folder also holds the folder index, the fit
+                # database, the thumbnails and the range indexes, which are
+                # not sidecars and are left alone
+                if not sidecar.name.endswith(SIDECAR_EXTENSION):
+                    continue
+
+                csvPath = os.path.join(folderPath, sidecar.name[:-len(SIDECAR_EXTENSION)])
+                stale = not os.path.isfile(csvPath) or not isSidecarValid(csvPath)
+                if removeAll or stale:
+                    os.remove(sidecar.path)
+                    removed += 1
+        elif entry.is_dir() and recursive:
+            removed += pruneFolder(entry.path, recursive, removeAll)
+
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rebuild or prune the binary sidecar files of a data folder')
+    parser.add_argument('command', choices=['rebuild', 'prune'])
+    parser.add_argument('folder', help='folder containing the csv files')
+    parser.add_argument('--recursive', action='store_true', help='include all sub folders')
+    parser.add_argument('--force', action='store_true', help='rebuild sidecars which are still valid')
+    parser.add_argument('--all', action='store_true', help='prune every sidecar, not only the stale ones')
+    arguments = parser.parse_args()
+
+    if 'rebuild' == arguments.command:
+        rebuildFolder(arguments.folder, arguments.recursive, arguments.force)
+    else:
+        print('Removed {} sidecar files'.format(pruneFolder(arguments.folder, arguments.recursive, arguments.all)))
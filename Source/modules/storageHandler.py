@@ -0,0 +1,297 @@
+'''
+Storage Handler Module
+This module reads and writes the temperature logs in columnar formats besides
+csv: Parquet (.parquet) and Arrow IPC (.arrow)
+
+Columnar files store the time as a typed time stamp column and the
+temperature as a float column, so reading them needs no text or date time
+parsing. Both formats are compressed (zstd), Parquet files are written in row
+groups with min/max statistics of every column. Time stamps without a date
+(HH:MM:SS) are unwrapped at midnight when they are converted, so the stored
+time stamps always increase
+
+The columnar formats need pyarrow. Without it only csv files are listed and
+read, and the functions of this module raise ImportError
+
+The csv files of a whole folder can be converted from the command line (run
+from the Source folder):
+    python -m modules.storageHandler <folder> [--format parquet|arrow] [--recursive] [--force] [--workers N]
+'''
+
+import os
+import time
+import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from modules import sidecarHandler
+
+# File extension of every columnar format
+COLUMNAR_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+# pyarrow is only imported when a columnar file is read or written, but
+# whether it is installed is known up front
+COLUMNAR_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+# File extensions of the data files listed in a data folder
+DATA_EXTENSIONS = ('.csv',) + (tuple(COLUMNAR_EXTENSIONS.values()) if COLUMNAR_AVAILABLE else ())
+
+# Compression codec and number of rows per Parquet row group (and per Arrow
+# record batch)
+COMPRESSION = 'zstd'
+ROW_GROUP_ROWS = 1024 * 1024
+# Resolution of the stored time stamps
+TIME_UNIT = 'us'
+# Number of seconds in a day, used to unwrap time stamps at midnight
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+'''
+isDataFile function takes a file name and returns True if it is a data file
+which can be listed and read (csv, or a columnar file if pyarrow is installed)
+'''
+def isDataFile(fileName):
+    return fileName.endswith(DATA_EXTENSIONS)
+
+
+'''
+preferredDataFiles function takes a dictionary of the names of the data
+files of one folder mapped to their modification time and returns the set
+of names to list
+A run converted to a columnar format (see convertFolder) sits in the folder
+as several files with the same name, only one of them is listed: the
+columnar file (in the order of COLUMNAR_EXTENSIONS) if it is at least as new
+as the csv file, and the csv file otherwise (the log grew after it was
+converted)
+'''
+def preferredDataFiles(fileTimes):
+    runs = dict()
+    for fileName in fileTimes:
+        runs.setdefault(os.path.splitext(fileName)[0], []).append(fileName)
+
+    fileNames = set()
+    for runFiles in runs.values():
+        if len(runFiles) == 1:
+            fileNames.update(runFiles)
+            continue
+
+        csvFiles = [fileName for fileName in runFiles if columnarFormat(fileName) is None]
+        csvTime = max((fileTimes[fileName] for fileName in csvFiles), default=None)
+        columnarFiles = [fileName for formatExtension in COLUMNAR_EXTENSIONS.values()
+                         for fileName in runFiles if os.path.splitext(fileName)[1].lower() == formatExtension
+                         and (csvTime is None or fileTimes[fileName] >= csvTime)]
+        fileNames.update(columnarFiles[:1] or csvFiles)
+
+    return fileNames
+
+
+'''
+columnarFormat function takes a file path and returns the name of its
+columnar format ('parquet' or 'arrow'), or None for any other file
+'''
+def columnarFormat(filePath):
+    extension = os.path.splitext(filePath)[1].lower()
+    for formatName, formatExtension in COLUMNAR_EXTENSIONS.items():
+        if extension == formatExtension:
+            return formatName
+
+    return None
+
+
+'''
+unwrapMidnight function takes an array of date time values (numpy
+datetime64) and adds a day to every entry after each jump back of more than
+half a day, so time stamps without a date keep increasing past midnight
+'''
+def unwrapMidnight(timeData):
+    steps = numpy.diff(timeData) < -numpy.timedelta64(SECONDS_PER_DAY // 2, 's')
+    if steps.any():
+        timeData = timeData.copy()
+        timeData[1:] += numpy.cumsum(steps) * numpy.timedelta64(1, 'D')
+
+    return timeData
+
+
+'''
+buildTable function takes the date time and temperature arrays and returns a
+pyarrow table with a typed time stamp column and a float column
+'''
+def buildTable(timeData, tempData):
+    import pyarrow
+
+    timeData = numpy.asarray(timeData, dtype='datetime64[' + TIME_UNIT + ']')
+    tempData = numpy.asarray(tempData, dtype=numpy.float64)
+    schema = pyarrow.schema([('time', pyarrow.timestamp(TIME_UNIT)), ('temp', pyarrow.float64())])
+
+    return pyarrow.Table.from_arrays([pyarrow.array(timeData), pyarrow.array(tempData)], schema=schema)
+
+
+'''
+writeColumnar function takes a file path (.parquet or .arrow), an array of
+date time values and an array of temperatures and writes them into a
+columnar file
+The file is written under a temporary name and renamed once it is complete,
+so readers never see a partly written file
+'''
+def writeColumnar(filePath, timeData, tempData):
+    import pyarrow
+    import pyarrow.parquet
+
+    table = buildTable(timeData, tempData)
+    tempPath = filePath + '.tmp'
+    try:
+        if 'parquet' == columnarFormat(filePath):
+            pyarrow.parquet.write_table(table, tempPath, compression=COMPRESSION, row_group_size=ROW_GROUP_ROWS,
+                                        write_statistics=True)
+        else:
+            options = pyarrow.ipc.IpcWriteOptions(compression=COMPRESSION)
+            with pyarrow.OSFile(tempPath, 'wb') as sink:
+                with pyarrow.ipc.new_file(sink, table.schema, options=options) as writer:
+                    writer.write_table(table, max_chunksize=ROW_GROUP_ROWS)
+        os.replace(tempPath, filePath)
+    finally:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+
+
+'''
+readTable function takes the path of a columnar file and returns its time
+and temperature columns as a pyarrow table
+Arrow IPC files are memory mapped
+'''
+def readTable(filePath):
+    import pyarrow
+    import pyarrow.parquet
+
+    if 'parquet' == columnarFormat(filePath):
+        return pyarrow.parquet.read_table(filePath, columns=['time', 'temp'])
+
+    with pyarrow.memory_map(filePath) as source:
+        return pyarrow.ipc.open_file(source).read_all().select(['time', 'temp'])
+
+
+'''
+readColumnar function takes the path of a columnar file and returns the
+elapsed time (in minutes, relative to the first entry) and temperature
+arrays, like readCSVData in the file handler module
+'''
+def readColumnar(filePath):
+    table = readTable(os.path.normpath(filePath))
+
+    # Every column can be split in chunks (row groups, record batches)
+    timeData = numpy.concatenate([chunk.to_numpy() for chunk in table.column('time').chunks] or
+                                 [numpy.empty(0, dtype='datetime64[' + TIME_UNIT + ']')])
+    yData = numpy.concatenate([chunk.to_numpy(zero_copy_only=False) for chunk in table.column('temp').chunks] or
+                              [numpy.empty(0)]).astype(numpy.float64, copy=False)
+
+    if not len(timeData):
+        return numpy.empty(0, dtype=numpy.float64), yData
+
+    # Elapsed time in minutes, whatever the resolution of the time stamps
+    xData = (timeData - timeData[0]) / numpy.timedelta64(1, 'm')
+
+    return xData, yData
+
+
+'''
+countRows function takes the path of a columnar file and returns its number
+of rows, read from the file metadata without reading the data
+'''
+def countRows(filePath):
+    import pyarrow
+    import pyarrow.parquet
+
+    if 'parquet' == columnarFormat(filePath):
+        return pyarrow.parquet.ParquetFile(filePath).metadata.num_rows
+
+    with pyarrow.memory_map(filePath) as source:
+        reader = pyarrow.ipc.open_file(source)
+        return sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+
+
+'''
+readCSVTimes function takes the path of a csv file and returns its time
+column as date time values (unwrapped at midnight) and its temperature column
+'''
+def readCSVTimes(filePath):
+    import pandas
+    # Imported here since the file handler module imports this module
+    from modules import fileHandler
+
+    dataFrame = pandas.read_csv(os.path.normpath(filePath), usecols=['time', 'temp'], dtype={'temp': numpy.float64})
+    tempData = dataFrame.temp.to_numpy(dtype=numpy.float64)
+    if not len(dataFrame):
+        return numpy.empty(0, dtype='datetime64[' + TIME_UNIT + ']'), tempData
+
+    timeData = fileHandler.parseTimeColumn(dataFrame.time).to_numpy(dtype='datetime64[ns]')
+    return unwrapMidnight(timeData), tempData
+
+
+'''
+convertFile function takes the path of a csv file and the name of a columnar
+format and writes the data into a file with the same name and the extension
+of that format
+This function returns the paths of both files, the number of rows and the
+sizes of both files
+'''
+def convertFile(filePath, formatName):
+    targetPath = os.path.splitext(filePath)[0] + COLUMNAR_EXTENSIONS[formatName]
+    timeData, tempData = readCSVTimes(filePath)
+    writeColumnar(targetPath, timeData, tempData)
+
+    return filePath, targetPath, len(tempData), os.path.getsize(filePath), os.path.getsize(targetPath)
+
+
+'''
+convertFolder function converts all the csv files in a folder (and its sub
+folders if recursive is True) into the given columnar format using a pool of
+processes
+Files which already have a converted file newer than the csv file are skipped
+unless force is True
+This function returns the list of results of convertFile
+'''
+def convertFolder(folderPath, formatName='parquet', recursive=False, force=False, workers=None):
+    csvFiles = sidecarHandler.findCSVFiles(folderPath, recursive)
+    if not force:
+        csvFiles = [filePath for filePath in csvFiles if not isConverted(filePath, formatName)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convertFile, filePath, formatName) for filePath in csvFiles]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                print('Failed: {}'.format(error))
+
+    return results
+
+
+'''
+isConverted function returns True if a csv file already has a converted file
+of the given format which is newer than the csv file
+'''
+def isConverted(filePath, formatName):
+    targetPath = os.path.splitext(filePath)[0] + COLUMNAR_EXTENSIONS[formatName]
+    return os.path.isfile(targetPath) and os.path.getmtime(targetPath) >= os.path.getmtime(filePath)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert the csv files of a data folder into a columnar format')
+    parser.add_argument('folder', help='folder containing the csv files')
+    parser.add_argument('--format', choices=list(COLUMNAR_EXTENSIONS), default='parquet', help='columnar format')
+    parser.add_argument('--recursive', action='store_true', help='include all sub folders')
+    parser.add_argument('--force', action='store_true', help='convert files which were already converted')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    arguments = parser.parse_args()
+
+    if not COLUMNAR_AVAILABLE:
+        parser.exit(1, 'The columnar formats need pyarrow (pip install pyarrow)\n')
+
+    start = time.perf_counter()
+    results = convertFolder(arguments.folder, arguments.format, arguments.recursive, arguments.force, arguments.workers)
+    elapsed = time.perf_counter() - start
+
+    for filePath, targetPath, rows, csvSize, targetSize in results:
+        print('{} ({} rows, {:.1f}x smaller)'.format(targetPath, rows, csvSize / max(targetSize, 1)))
+    print('Converted {} files ({} rows) in {:.2f} s'.format(len(results), sum(result[2] for result in results), elapsed))
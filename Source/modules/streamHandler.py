@@ -0,0 +1,161 @@
+'''
+Stream Handler Module
+This module writes the data of a logging session to disk while it is being
+entered, so nothing is lost if the application crashes
+
+Every sample is appended to a journal file (the csv file name followed by
+.part) which is flushed and synced to disk once enough samples are pending
+or enough time has passed. Saving the session only flushes the last samples
+and renames the journal to the csv file name
+
+Journals left behind by a crash can be found and turned back into csv files
+with the findJournals and recoverJournal functions
+'''
+
+import os
+import time
+
+# File extension added to the csv file name while the session is in progress
+JOURNAL_EXTENSION = '.part'
+
+# Pending samples are flushed once there are this many of them
+DEFAULT_FLUSH_ROWS = 50
+# Pending samples are flushed once the oldest one is this many seconds old
+DEFAULT_FLUSH_SECONDS = 2.0
+
+
+'''
+sessionWriter class appends the samples of a logging session to a journal
+file and turns it into the final csv file once the session is saved
+'''
+class sessionWriter:
+
+    '''
+    sessionWriter class constructor takes the path of the csv file to create
+    along with the flush thresholds and opens the journal file
+    The csv header is written and synced right away
+    '''
+    def __init__(self, filePath, flushRows=DEFAULT_FLUSH_ROWS, flushSeconds=DEFAULT_FLUSH_SECONDS):
+        self.filePath = filePath
+        self.journalPath = filePath + JOURNAL_EXTENSION
+        self.flushRows = flushRows
+        self.flushSeconds = flushSeconds
+
+        # Lines (or blocks of lines) waiting to be written, the number of
+        # samples they hold and the time of the oldest one
+        self.pendingLines = []
+        self.pendingRows = 0
+        self.pendingSince = None
+        self.rowCount = 0
+
+        self.journal = open(self.journalPath, 'w', newline='')
+        self.journal.write('time,temp\n')
+        self.sync()
+
+    '''
+    append function takes a time stamp and a temperature value and adds
+    them to the session
+    The pending samples are written to disk if a flush threshold is reached
+    '''
+    def append(self, timeData, tempData):
+        self.appendLines('{},{}\n'.format(timeData, tempData), 1)
+
+    '''
+    appendLines function takes a block of csv lines which were already
+    formatted (like the ones of a sample store) along with the number of
+    samples in the block and adds them to the session
+    The pending samples are written to disk if a flush threshold is reached
+    '''
+    def appendLines(self, lines, rowCount):
+        if not self.pendingLines:
+            self.pendingSince = time.monotonic()
+        self.pendingLines.append(lines)
+        self.pendingRows += rowCount
+        self.rowCount += rowCount
+
+        self.flushIfDue()
+
+    '''
+    flushIfDue function writes the pending samples to disk if there are
+    enough of them or if the oldest one has waited long enough
+    This function should also be called on a timer so samples entered
+    slowly still reach the disk in time
+    '''
+    def flushIfDue(self):
+        if not self.pendingLines:
+            return
+
+        if self.pendingRows >= self.flushRows or time.monotonic() - self.pendingSince >= self.flushSeconds:
+            self.flush()
+
+    '''
+    flush function writes all the pending samples to the journal file and
+    syncs it to disk
+    '''
+    def flush(self):
+        if self.pendingLines:
+            self.journal.write(''.join(self.pendingLines))
+            self.pendingLines.clear()
+            self.pendingRows = 0
+            self.pendingSince = None
+        self.sync()
+
+    '''
+    sync function pushes the journal file through the Python and operating
+    system buffers onto the disk
+    '''
+    def sync(self):
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    '''
+    finalize function flushes the last samples, closes the journal and
+    renames it to the csv file name
+    This function returns the path of the csv file
+    '''
+    def finalize(self):
+        self.flush()
+        self.journal.close()
+        os.replace(self.journalPath, self.filePath)
+
+        return self.filePath
+
+    '''
+    close function flushes the last samples and closes the journal without
+    renaming it. The session can then be recovered with recoverJournal
+    '''
+    def close(self):
+        if not self.journal.closed:
+            self.flush()
+            self.journal.close()
+
+
+'''
+findJournals function takes a folder path and returns the paths of the
+journal files of sessions which were never saved
+'''
+def findJournals(folderPath):
+    return [entry.path for entry in os.scandir(folderPath)
+            if entry.is_file() and entry.name.endswith('.csv' + JOURNAL_EXTENSION)]
+
+
+'''
+recoverJournal function takes the path of a journal file and turns it into
+a csv file
+A crash can leave the last line half written, so anything after the last
+complete line is removed first
+This function returns the path of the recovered csv file
+'''
+def recoverJournal(journalPath):
+    with open(journalPath, 'rb+') as journal:
+        # Only the end of the file has to be read to find the last line break
+        tailStart = max(os.path.getsize(journalPath) - 65536, 0)
+        journal.seek(tailStart)
+        tail = journal.read()
+        # Keep everything up to (and including) the last line break
+        journal.truncate(tailStart + tail.rfind(b'\n') + 1)
+
+    filePath = journalPath[:-len(JOURNAL_EXTENSION)]
+    os.replace(journalPath, filePath)
+
+    return filePath
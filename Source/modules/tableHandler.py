@@ -0,0 +1,95 @@
+'''
+Table Handler Module
+This module defines the table model which holds the time and temperature
+data of the data logger
+'''
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QModelIndex
+from PyQt5.QtCore import QAbstractTableModel
+
+from modules import sampleHandler
+
+# Column titles of the table
+TABLE_HEADERS = ['Time', 'Temperature']
+
+
+'''
+sampleTableModel class holds the logged samples in a sample store (see the
+sample handler module) and serves them to a table view
+Appending a sample only inserts one row at the end, and the text of a cell
+is only created when the view paints it, so the cost of an entry does not
+depend on the number of samples already in the table
+'''
+class sampleTableModel(QAbstractTableModel):
+
+    '''
+    sampleTableModel class constructor initializes the empty sample store
+    '''
+    def __init__(self):
+        super(sampleTableModel, self).__init__()
+        self.samples = sampleHandler.sampleStore()
+
+    '''
+    rowCount function returns the number of samples in the table
+    '''
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.samples)
+
+    '''
+    columnCount function returns the number of columns in the table
+    '''
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(TABLE_HEADERS)
+
+    '''
+    data function returns the text of a cell
+    The time is shown in HH:MM:SS.mmm format and the temperature without
+    trailing zeros
+    '''
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+
+        if 0 == index.column():
+            return self.samples.formatTime(index.row())
+        return '{:g}'.format(self.samples.temperatureData[index.row()])
+
+    '''
+    headerData function returns the column titles
+    '''
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return TABLE_HEADERS[section]
+        return None
+
+    '''
+    append function takes the time stamp (nanoseconds since the epoch, the
+    current time if None) and temperature of a sample and adds it as a new
+    row at the end of the table
+    '''
+    def append(self, epochNs, temperature):
+        row = len(self.samples)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.samples.append(epochNs, temperature)
+        self.endInsertRows()
+
+    '''
+    clear function removes all the samples from the table
+    '''
+    def clear(self):
+        self.beginResetModel()
+        self.samples.clear()
+        self.endResetModel()
+
+    '''
+    plotData function returns the elapsed time (in minutes since the first
+    sample) and temperature arrays of the samples, ready to be plotted
+    The time stamps include the date, so sessions past midnight stay in order
+    '''
+    def plotData(self):
+        return self.samples.elapsedMinutes(), self.samples.temperatures().copy()
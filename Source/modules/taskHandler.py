@@ -0,0 +1,627 @@
+'''
+Task Handler Module
+This module runs slow operations (like reading large csv files) on a pool of
+worker threads so the GUI stays responsive
+Results are sent back to the GUI thread using Qt signals
+
+Many files at once are parsed on a pool of worker processes instead (see
+bulkLoader), so the parsing is not limited to a single core, and plots are
+exported on a process of their own (see exportRunner)
+'''
+
+import time
+import queue
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import QObject
+from PyQt5.QtCore import QRunnable
+from PyQt5.QtCore import QThreadPool
+from PyQt5.QtCore import pyqtSignal
+
+from modules import fileHandler
+from modules import cacheHandler
+from modules import rangeHandler
+from modules import decimationHandler
+from modules import exportHandler
+from modules import thumbnailHandler
+
+# Minimum number of seconds between two partial results of a streamed file
+PARTIAL_INTERVAL = 0.5
+# Number of worker processes of the bulk loader (None uses every core)
+BULK_WORKERS = None
+# Time (in milliseconds) between two checks of the export process messages
+EXPORT_POLL_INTERVAL = 100
+# Number of seconds an export process is given to end before it is terminated
+EXPORT_JOIN_TIMEOUT = 1.0
+
+
+'''
+taskSignals class defines the signals emitted by a worker task
+QRunnable is not a QObject, so every task owns one of these objects
+Signals emitted from the worker thread are queued and delivered on the
+GUI thread
+'''
+class taskSignals(QObject):
+    # Task id, progress in percent (-1 when unknown) and a status message
+    progress = pyqtSignal(int, int, str)
+    # Task id and the data read so far by a task which streams its result
+    partial = pyqtSignal(int, object)
+    # Task id and the result of the task
+    finished = pyqtSignal(int, object)
+    # Task id and the error message
+    failed = pyqtSignal(int, str)
+    # Task id, emitted when the task stops running (even if cancelled)
+    done = pyqtSignal(int)
+
+
+'''
+fileLoadTask class reads the time and temperature data of a file on a
+worker thread
+The task can be cancelled at any time. A cancelled task does not start
+reading, and if it is already reading the result is dropped
+
+Large files are read in chunks. The reduced data read so far is sent back
+regularly so the start of the file can be plotted right away
+'''
+class fileLoadTask(QRunnable):
+
+    '''
+    fileLoadTask class constructor takes a task id and the path of the file
+    to read
+    '''
+    def __init__(self, taskId, filePath):
+        super(fileLoadTask, self).__init__()
+        self.taskId = taskId
+        self.filePath = filePath
+        self.cancelled = False
+        self.signals = taskSignals()
+        # The task is deleted by the caller, not by the thread pool
+        self.setAutoDelete(False)
+
+    '''
+    cancel function marks the task as cancelled
+    '''
+    def cancel(self):
+        self.cancelled = True
+
+    '''
+    run function is called by the thread pool on a worker thread and
+    reads the file using the file handler module
+    '''
+    def run(self):
+        try:
+            self.readFile()
+        finally:
+            self.signals.done.emit(self.taskId)
+
+    '''
+    readFile function reads the file using the file handler module and
+    emits the result unless the task was cancelled
+    '''
+    def readFile(self):
+        if self.cancelled:
+            return
+
+        self.signals.progress.emit(self.taskId, -1, 'Reading')
+        try:
+            if fileHandler.isLargeFile(self.filePath):
+                xData, yData = self.streamFile()
+            else:
+                xData, yData = fileHandler.readPlotData(self.filePath)
+        except Exception as error:
+            if not self.cancelled:
+                self.signals.failed.emit(self.taskId, str(error))
+            return
+
+        if not self.cancelled:
+            self.signals.progress.emit(self.taskId, 100, 'Done')
+            self.signals.finished.emit(self.taskId, (xData, yData))
+
+    '''
+    streamFile function reads a large file in chunks, emitting the progress
+    and the reduced data read so far after every chunk (at most every
+    PARTIAL_INTERVAL seconds)
+    The time index of the file is built along the way and saved once the
+    whole file has been read, so zooming into the plot can read the rows of
+    the visible range at full resolution (see the range handler module),
+    and the thumbnail of the file is rendered from the reduced data
+    This function returns the reduced data of the whole file, or None if the
+    task was cancelled
+    '''
+    def streamFile(self):
+        fingerprint = cacheHandler.fileFingerprint(self.filePath)
+        indexBuilder = None
+        if rangeHandler.readIndex(self.filePath, fingerprint) is None:
+            indexBuilder = rangeHandler.indexBuilder()
+
+        accumulator = decimationHandler.streamAccumulator()
+        lastPartial = None
+        for xBlock, yBlock, bytesRead, fileSize in fileHandler.readCSVChunks(self.filePath,
+                                                                             indexBuilder=indexBuilder):
+            if self.cancelled:
+                return None, None
+            accumulator.add(xBlock, yBlock)
+
+            if lastPartial is None or time.monotonic() - lastPartial >= PARTIAL_INTERVAL:
+                lastPartial = time.monotonic()
+                self.signals.progress.emit(self.taskId, 100 * bytesRead // max(fileSize, 1), 'Reading')
+                self.signals.partial.emit(self.taskId, accumulator.snapshot())
+
+        if indexBuilder is not None:
+            index = indexBuilder.finish()
+            if index is not None:
+                rangeHandler.writeIndex(self.filePath, fingerprint, index)
+
+        # The reduced data keeps the first and last rows, so the thumbnail
+        # rendered from it has exact statistics
+        xData, yData = accumulator.snapshot()
+        thumbnailHandler.renderThumbnail(self.filePath, fingerprint, xData, yData)
+
+        return xData, yData
+
+
+'''
+fileLoader class loads files on the global thread pool, one at a time
+Requesting a new file supersedes the file being loaded: the old task is
+removed from the pool if it has not started yet, or cancelled so its result
+is ignored
+'''
+class fileLoader(QObject):
+    # Key, file path, time data and temperature data of a loaded file
+    loaded = pyqtSignal(object, str, object, object)
+    # Key, file path, time data and temperature data read so far of a file
+    # which is read in chunks
+    partial = pyqtSignal(object, str, object, object)
+    # Key, progress in percent (-1 when unknown) and a status message
+    progress = pyqtSignal(object, int, str)
+    # Key and error message of a file which could not be loaded
+    failed = pyqtSignal(object, str)
+
+    '''
+    fileLoader class constructor initializes the loader with no task
+    '''
+    def __init__(self):
+        super(fileLoader, self).__init__()
+        self.threadPool = QThreadPool.globalInstance()
+        self.lastTaskId = 0
+        self.currentTask = None
+        self.currentKey = None
+        # Tasks are kept alive here until the thread pool is done with them
+        self.tasks = dict()
+
+    '''
+    load function starts loading the given file on the thread pool
+    The key is passed back with the signals so the caller can tell which
+    request the result belongs to
+    '''
+    def load(self, key, filePath):
+        self.cancel()
+
+        self.lastTaskId += 1
+        self.currentKey = key
+        self.currentTask = fileLoadTask(self.lastTaskId, filePath)
+        self.currentTask.signals.progress.connect(self.taskProgress)
+        self.currentTask.signals.partial.connect(self.taskPartial)
+        self.currentTask.signals.finished.connect(self.taskFinished)
+        self.currentTask.signals.failed.connect(self.taskFailed)
+        self.currentTask.signals.done.connect(self.taskDone)
+        self.tasks[self.lastTaskId] = self.currentTask
+        self.threadPool.start(self.currentTask)
+
+    '''
+    cancel function cancels the file being loaded (if any)
+    '''
+    def cancel(self):
+        if self.currentTask is not None:
+            self.currentTask.cancel()
+            # Remove the task from the queue if it has not started yet
+            if self.threadPool.tryTake(self.currentTask):
+                self.tasks.pop(self.currentTask.taskId, None)
+            self.currentTask = None
+
+    '''
+    isBusy function returns True while a file is being loaded
+    '''
+    def isBusy(self):
+        return self.currentTask is not None
+
+    '''
+    taskProgress function forwards the progress of the current task
+    '''
+    def taskProgress(self, taskId, percent, message):
+        if self.currentTask is not None and taskId == self.currentTask.taskId:
+            self.progress.emit(self.currentKey, percent, message)
+
+    '''
+    taskPartial function forwards the data read so far by the current task
+    '''
+    def taskPartial(self, taskId, result):
+        if self.currentTask is not None and taskId == self.currentTask.taskId:
+            self.partial.emit(self.currentKey, self.currentTask.filePath, result[0], result[1])
+
+    '''
+    taskFinished function forwards the result of the current task
+    Results of superseded tasks are ignored
+    '''
+    def taskFinished(self, taskId, result):
+        if self.currentTask is not None and taskId == self.currentTask.taskId:
+            filePath = self.currentTask.filePath
+            self.currentTask = None
+            self.loaded.emit(self.currentKey, filePath, result[0], result[1])
+
+    '''
+    taskFailed function forwards the error of the current task
+    '''
+    def taskFailed(self, taskId, message):
+        if self.currentTask is not None and taskId == self.currentTask.taskId:
+            self.currentTask = None
+            self.failed.emit(self.currentKey, message)
+
+    '''
+    taskDone function releases a task once the thread pool is done with it
+    '''
+    def taskDone(self, taskId):
+        self.tasks.pop(taskId, None)
+
+
+'''
+functionTask class calls any function with the given arguments on a worker
+thread and emits its return value (or the error message if it raised)
+'''
+class functionTask(QRunnable):
+
+    '''
+    functionTask class constructor takes a task id, the function to call and
+    the arguments of the function
+    '''
+    def __init__(self, taskId, function, args):
+        super(functionTask, self).__init__()
+        self.taskId = taskId
+        self.function = function
+        self.args = args
+        self.signals = taskSignals()
+        # The task is deleted by the caller, not by the thread pool
+        self.setAutoDelete(False)
+
+    '''
+    run function is called by the thread pool on a worker thread and calls
+    the function
+    '''
+    def run(self):
+        try:
+            result = self.function(*self.args)
+        except Exception as error:
+            self.signals.failed.emit(self.taskId, str(error))
+        else:
+            self.signals.finished.emit(self.taskId, result)
+        finally:
+            self.signals.done.emit(self.taskId)
+
+
+'''
+backgroundRunner class runs functions on the global thread pool and calls
+back on the GUI thread with their results
+'''
+class backgroundRunner(QObject):
+
+    '''
+    backgroundRunner class constructor initializes the runner with no task
+    '''
+    def __init__(self):
+        super(backgroundRunner, self).__init__()
+        self.threadPool = QThreadPool.globalInstance()
+        self.lastTaskId = 0
+        # Tasks and their callbacks are kept here until the task is done
+        self.tasks = dict()
+
+    '''
+    start function calls the function with the given arguments on the thread
+    pool. onFinished is called with the return value and onFailed with the
+    error message (both on the GUI thread)
+    '''
+    def start(self, function, args=(), onFinished=None, onFailed=None):
+        self.lastTaskId += 1
+        task = functionTask(self.lastTaskId, function, args)
+        task.signals.finished.connect(self.taskFinished)
+        task.signals.failed.connect(self.taskFailed)
+        task.signals.done.connect(self.taskDone)
+        self.tasks[self.lastTaskId] = (task, onFinished, onFailed)
+        self.threadPool.start(task)
+
+    '''
+    taskFinished function passes the return value of a task to its callback
+    '''
+    def taskFinished(self, taskId, result):
+        task, onFinished, onFailed = self.tasks[taskId]
+        if onFinished is not None:
+            onFinished(result)
+
+    '''
+    taskFailed function passes the error message of a task to its callback
+    '''
+    def taskFailed(self, taskId, message):
+        task, onFinished, onFailed = self.tasks[taskId]
+        if onFailed is not None:
+            onFailed(message)
+
+    '''
+    taskDone function releases a task once the thread pool is done with it
+    '''
+    def taskDone(self, taskId):
+        self.tasks.pop(taskId, None)
+
+
+'''
+bulkLoader class loads many files at once on a pool of worker processes
+Every file is parsed by fileHandler.readDataset on a worker process and its
+data is sent back as soon as it is ready. Files which are in the dataset
+cache are not sent to the pool at all, and the parsed files are added to the
+cache so they can be plotted again without parsing
+The worker processes are started the first time they are needed and kept
+for the next batch. They are started with spawn, which does not copy the
+threads of the application into the workers
+
+Loading a new batch cancels the files of the previous batch which have not
+started yet, and the results of the previous batch are ignored
+'''
+class bulkLoader(QObject):
+    # Key, file path, time data and temperature data of every loaded file
+    loaded = pyqtSignal(object, str, object, object)
+    # Key and error message of a file which could not be loaded
+    failed = pyqtSignal(object, str)
+    # Number of files done (loaded or failed) and number of files in the batch
+    progress = pyqtSignal(int, int)
+    # Emitted once every file of the batch is done
+    finished = pyqtSignal()
+    # Batch id, key, file path and future of a file parsed by the pool
+    # The futures complete on a thread of the pool, this signal passes them
+    # to the GUI thread
+    futureDone = pyqtSignal(int, object, str, object)
+
+    '''
+    bulkLoader class constructor takes the number of worker processes
+    '''
+    def __init__(self, workers=BULK_WORKERS):
+        super(bulkLoader, self).__init__()
+        self.workers = workers
+        self.executor = None
+        self.batchId = 0
+        self.futures = []
+        self.doneCount = 0
+        self.totalCount = 0
+        self.futureDone.connect(self.futureDoneHandler)
+
+    '''
+    load function takes a list of (key, file path) tuples and starts loading
+    all the files. The key is passed back with the signals
+    '''
+    def load(self, files):
+        self.cancel()
+        self.batchId += 1
+        self.doneCount = 0
+        self.totalCount = len(files)
+
+        for key, filePath in files:
+            # Serve the files which have not changed from the cache
+            try:
+                cachedData = cacheHandler.dataCache.get(cacheHandler.fileFingerprint(filePath))
+            except OSError as error:
+                self.fileDone(key, error=str(error))
+                continue
+            if cachedData is not None:
+                self.fileDone(key, filePath, *cachedData)
+                continue
+
+            try:
+                future = self.submit(filePath)
+            except BrokenProcessPool as error:
+                self.fileDone(key, error=str(error))
+                continue
+            future.add_done_callback(functools.partial(self.emitFutureDone, self.batchId, key, filePath))
+            self.futures.append(future)
+
+        if not self.totalCount:
+            self.finished.emit()
+
+    '''
+    submit function sends a file to the pool of worker processes, starting
+    the pool if needed, and returns its future
+    A pool whose worker died (killed or out of memory) can not take any more
+    files, it is replaced by a new one once
+    '''
+    def submit(self, filePath):
+        if self.executor is not None:
+            try:
+                return self.executor.submit(fileHandler.readDataset, filePath)
+            except BrokenProcessPool:
+                self.resetExecutor()
+
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor.submit(fileHandler.readDataset, filePath)
+
+    '''
+    resetExecutor function shuts down the pool of worker processes, a new
+    one is started for the next file
+    '''
+    def resetExecutor(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    '''
+    emitFutureDone function is called by the pool when a file is done and
+    passes it to the GUI thread
+    '''
+    def emitFutureDone(self, batchId, key, filePath, future):
+        self.futureDone.emit(batchId, key, filePath, future)
+
+    '''
+    futureDoneHandler function adds the data of a parsed file to the cache
+    and forwards it (or its error) unless the batch was superseded
+    '''
+    def futureDoneHandler(self, batchId, key, filePath, future):
+        if batchId != self.batchId or future.cancelled():
+            return
+
+        try:
+            fingerprint, xData, yData = future.result()
+        except BrokenProcessPool as error:
+            # A worker died, the files it did not finish fail and the next
+            # files go to a new pool
+            self.resetExecutor()
+            self.fileDone(key, error=str(error))
+            return
+        except Exception as error:
+            self.fileDone(key, error=str(error))
+            return
+        self.fileDone(key, filePath, *cacheHandler.dataCache.put(fingerprint, xData, yData))
+
+    '''
+    fileDone function emits the result of a file along with the progress,
+    and the finished signal after the last file of the batch
+    '''
+    def fileDone(self, key, filePath=None, xData=None, yData=None, error=None):
+        self.doneCount += 1
+        if error is None:
+            self.loaded.emit(key, filePath, xData, yData)
+        else:
+            self.failed.emit(key, error)
+        self.progress.emit(self.doneCount, self.totalCount)
+
+        if self.doneCount == self.totalCount:
+            self.futures = []
+            self.finished.emit()
+
+    '''
+    cancel function cancels the files of the current batch which have not
+    started yet and ignores the results of the others
+    '''
+    def cancel(self):
+        self.batchId += 1
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    '''
+    isBusy function returns True while a batch is being loaded
+    '''
+    def isBusy(self):
+        return bool(self.futures)
+
+
+'''
+exportRunner class exports a snapshot of the plot (see the export handler
+module) on a separate process, one export at a time
+The process is started with spawn and receives the snapshot through a queue,
+so starting it returns right away whatever the size of the snapshot. Its
+progress messages are read on a timer on the GUI thread and forwarded with
+signals
+'''
+class exportRunner(QObject):
+    # Progress in percent and a status message
+    progress = pyqtSignal(int, str)
+    # Path of the exported file
+    finished = pyqtSignal(str)
+    # Error message of an export which failed
+    failed = pyqtSignal(str)
+
+    '''
+    exportRunner class constructor initializes the runner with no export
+    '''
+    def __init__(self):
+        super(exportRunner, self).__init__()
+        self.process = None
+        self.jobQueue = None
+        self.messageQueue = None
+        self.pollTimer = QTimer(self)
+        self.pollTimer.setInterval(EXPORT_POLL_INTERVAL)
+        self.pollTimer.timeout.connect(self.readMessages)
+
+    '''
+    start function takes a snapshot of the plot, the path and format of the
+    file to write, the size of the image (in inches) and its resolution and
+    starts the export process. Any export still running is cancelled
+    '''
+    def start(self, snapshot, filePath, outputFormat, width, height, dpi):
+        self.cancel()
+
+        # The queues are kept until the process ends, the process can not
+        # attach to them once they are released
+        context = multiprocessing.get_context('spawn')
+        self.jobQueue = context.Queue()
+        self.messageQueue = context.Queue()
+        self.process = context.Process(target=exportHandler.renderProcess, args=(self.jobQueue, self.messageQueue),
+                                       daemon=True)
+        self.process.start()
+        self.jobQueue.put((snapshot, filePath, outputFormat, width, height, dpi))
+        self.pollTimer.start()
+
+    '''
+    readMessages function forwards the messages sent by the export process
+    The process is released once it has finished or failed (or stopped
+    without a word)
+    '''
+    def readMessages(self):
+        while self.process is not None:
+            # A process which just ended may still have its last message in
+            # the pipe, so it is given a moment to arrive
+            alive = self.process.is_alive()
+            try:
+                if alive:
+                    message = self.messageQueue.get_nowait()
+                else:
+                    message = self.messageQueue.get(timeout=0.5)
+            except queue.Empty:
+                if not alive:
+                    self.stop()
+                    self.failed.emit('The export process stopped unexpectedly')
+                return
+
+            if 'progress' == message[0]:
+                self.progress.emit(message[1], message[2])
+            else:
+                self.stop()
+                if 'finished' == message[0]:
+                    self.finished.emit(message[1])
+                else:
+                    self.failed.emit(message[1])
+
+    '''
+    stop function stops polling and waits for the export process to end,
+    terminating it if it does not end in time, then releases the queues
+    A job the process never read is dropped, so the thread which feeds it
+    into the queue does not hold up the exit of the application
+    '''
+    def stop(self):
+        self.pollTimer.stop()
+        if self.process is not None:
+            self.process.join(EXPORT_JOIN_TIMEOUT)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(EXPORT_JOIN_TIMEOUT)
+            self.jobQueue.cancel_join_thread()
+            self.jobQueue.close()
+            self.messageQueue.close()
+            self.process = None
+            self.jobQueue = None
+            self.messageQueue = None
+
+    '''
+    cancel function stops the export which is running (if any)
+    '''
+    def cancel(self):
+        if self.process is not None:
+            self.jobQueue.cancel_join_thread()
+            if self.process.is_alive():
+                self.process.terminate()
+        self.stop()
+
+    '''
+    isBusy function returns True while an export is running
+    '''
+    def isBusy(self):
+        return self.process is not None
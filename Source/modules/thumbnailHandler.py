@@ -0,0 +1,400 @@
+'''
+Thumbnail Handler Module
+This module renders the sparkline previews shown next to every file in the
+file list, along with the start and end temperature and the duration of
+the run
+
+Thumbnails are rendered on worker threads into QImages from decimated data
+(at most two points per pixel column). Every thumbnail is cached on disk as
+a small PNG file in the cache folder next to the data file (like the sidecar
+files). The fingerprint of the data file and the statistics are stored as
+text chunks of the PNG, so an outdated thumbnail is recognized without
+reading the data file
+
+Thumbnails are only requested for the rows the list view paints, so opening
+a folder with thousands of files does not render anything until the rows
+are scrolled into view
+
+Large files (see fileHandler.isLargeFile) are never read in full for their
+thumbnail. Once such a file has been plotted, its thumbnail is rendered from
+the reduced data kept while it was read (see taskHandler.fileLoadTask).
+Before that only a few evenly spaced blocks of the file are read, and the
+statistics are marked as approximate unless the time index of the file
+gives the exact elapsed time of the rows read
+'''
+
+import os
+from collections import OrderedDict
+
+import numpy
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QObject
+from PyQt5.QtCore import QPointF
+from PyQt5.QtCore import QRunnable
+from PyQt5.QtCore import QThreadPool
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtGui import QPen
+from PyQt5.QtGui import QColor
+from PyQt5.QtGui import QImage
+from PyQt5.QtGui import QPainter
+from PyQt5.QtGui import QPolygonF
+
+from modules import fileHandler
+from modules import cacheHandler
+from modules import rangeHandler
+from modules import sidecarHandler
+from modules import decimationHandler
+
+# Size of the sparklines in pixels
+THUMBNAIL_WIDTH = 96
+THUMBNAIL_HEIGHT = 24
+# Empty border around the sparkline in pixels
+THUMBNAIL_MARGIN = 2
+# Color of the sparklines
+THUMBNAIL_COLOR = '#1f77b4'
+# File extension of the thumbnails in the cache folder
+THUMBNAIL_EXTENSION = '.spark.png'
+# Version of the thumbnails, stored with them so a change of the rendering
+# makes the cached ones outdated
+THUMBNAIL_VERSION = '2'
+# Number of thumbnails kept in memory
+MAX_MEMORY_THUMBNAILS = 1000
+# Number and size of the evenly spaced blocks read for the thumbnail of a
+# large file which has not been plotted yet
+THUMBNAIL_SAMPLE_BLOCKS = 2 * THUMBNAIL_WIDTH
+THUMBNAIL_SAMPLE_BYTES = 16 * 1024
+
+
+'''
+thumbnailPath function takes the path of a data file and returns the path
+of its thumbnail inside the cache folder next to the data file
+'''
+def thumbnailPath(filePath):
+    folderPath, fileName = os.path.split(os.path.abspath(filePath))
+    return os.path.join(folderPath, sidecarHandler.CACHE_DIR_NAME, fileName + THUMBNAIL_EXTENSION)
+
+
+'''
+fingerprintText function turns the modification time and size of a file
+fingerprint into the text stored with its thumbnail
+'''
+def fingerprintText(fingerprint):
+    return '{}:{}:{}'.format(THUMBNAIL_VERSION, fingerprint[1], fingerprint[2])
+
+
+'''
+runStatistics function takes the time and temperature arrays of a run and
+returns its start temperature, end temperature, duration (in minutes) and
+whether they are approximate (1.0) or exact (0.0), or None if the run has
+no data
+'''
+def runStatistics(xData, yData, approximate=False):
+    if not len(xData):
+        return None
+
+    return (float(yData[0]), float(yData[-1]), float(numpy.nanmax(xData) - numpy.nanmin(xData)),
+            1.0 if approximate else 0.0)
+
+
+'''
+renderSparkline function takes the time and temperature arrays of a run and
+draws them as a line on a transparent image of the thumbnail size
+Only the minimum and maximum temperature of every pixel column are drawn
+'''
+def renderSparkline(xData, yData, width=THUMBNAIL_WIDTH, height=THUMBNAIL_HEIGHT):
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+
+    finite = numpy.isfinite(xData) & numpy.isfinite(yData)
+    if not finite.any():
+        return image
+    if not finite.all():
+        xData, yData = xData[finite], yData[finite]
+
+    xMin, xMax = xData.min(), xData.max()
+    xPoints, yPoints = decimationHandler.minMaxDecimate(xData, yData, xMin, xMax, width,
+                                                        decimationHandler.isSorted(xData))
+    yMin, yMax = yPoints.min(), yPoints.max()
+
+    # Scale the points to the image, with the highest temperature at the top
+    plotWidth = width - 2 * THUMBNAIL_MARGIN
+    plotHeight = height - 2 * THUMBNAIL_MARGIN
+    xPixels = THUMBNAIL_MARGIN + (xPoints - xMin) * (plotWidth / max(xMax - xMin, 1e-12))
+    yPixels = THUMBNAIL_MARGIN + (yMax - yPoints) * (plotHeight / max(yMax - yMin, 1e-12))
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(QColor(THUMBNAIL_COLOR), 1.2))
+    painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xPixels.tolist(), yPixels.tolist())]))
+    painter.end()
+
+    return image
+
+
+'''
+readThumbnail function takes the path of a data file and its fingerprint and
+returns the cached thumbnail image and statistics, or None if there is no
+thumbnail for this version of the file
+'''
+def readThumbnail(filePath, fingerprint):
+    image = QImage(thumbnailPath(filePath))
+    if image.isNull() or image.text('fingerprint') != fingerprintText(fingerprint):
+        return None
+
+    statistics = image.text('statistics')
+    return image, tuple(float(value) for value in statistics.split(',')) if statistics else None
+
+
+'''
+writeThumbnail function saves a thumbnail image along with the fingerprint
+of its data file and the statistics as text chunks of a PNG file
+Thumbnails which can not be written (read only folders) are only kept in
+memory
+'''
+def writeThumbnail(filePath, fingerprint, image, statistics):
+    image.setText('fingerprint', fingerprintText(fingerprint))
+    image.setText('statistics', ','.join(repr(value) for value in statistics) if statistics else '')
+
+    path = thumbnailPath(filePath)
+    tempPath = path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if image.save(tempPath, 'PNG'):
+            os.replace(tempPath, path)
+    except OSError:
+        pass
+
+
+'''
+readRunData function reads the time and temperature arrays of a data file
+for its thumbnail without adding them to the dataset cache, and whether the
+statistics of these arrays are approximate
+Only evenly spaced blocks of large files are read. The statistics are exact
+if the time index of the file gives the elapsed time of these blocks
+'''
+def readRunData(filePath, fingerprint):
+    if not fileHandler.isLargeFile(filePath):
+        # Scrolling through the list does not write a sidecar for every file
+        xData, yData = fileHandler.readFileData(filePath, fingerprint, writeSidecar=False)
+        return xData, yData, False
+
+    index = rangeHandler.readIndex(filePath, fingerprint)
+    xData, yData = fileHandler.readCSVSamples(filePath, THUMBNAIL_SAMPLE_BLOCKS, THUMBNAIL_SAMPLE_BYTES, index)
+    return xData, yData, index is None or not index.isSorted
+
+
+'''
+renderThumbnail function takes the path and the fingerprint of a data file
+along with its (possibly reduced) time and temperature arrays, renders its
+thumbnail and writes it to the disk cache
+This function returns the thumbnail image and statistics
+'''
+def renderThumbnail(filePath, fingerprint, xData, yData, approximate=False):
+    xData = numpy.asarray(xData, dtype=numpy.float64)
+    yData = numpy.asarray(yData, dtype=numpy.float64)
+    image = renderSparkline(xData, yData)
+    statistics = runStatistics(xData, yData, approximate)
+    writeThumbnail(filePath, fingerprint, image, statistics)
+
+    return image, statistics
+
+
+'''
+makeThumbnail function takes the path of a data file and returns its
+thumbnail image and statistics, read from the disk cache if it is up to date
+and rendered (and cached) otherwise
+'''
+def makeThumbnail(filePath):
+    fingerprint = cacheHandler.fileFingerprint(filePath)
+    cached = readThumbnail(filePath, fingerprint)
+    if cached is not None:
+        return cached
+
+    return renderThumbnail(filePath, fingerprint, *readRunData(filePath, fingerprint))
+
+
+'''
+thumbnailSignals class defines the signals of a thumbnail task
+'''
+class thumbnailSignals(QObject):
+    # Task id, thumbnail image and statistics (None if the file is empty)
+    finished = pyqtSignal(int, object, object)
+    # Task id and error message
+    failed = pyqtSignal(int, str)
+    # Task id, emitted once the task has finished running
+    done = pyqtSignal(int)
+
+
+'''
+thumbnailTask class makes the thumbnail of a file on a worker thread
+'''
+class thumbnailTask(QRunnable):
+
+    '''
+    thumbnailTask class constructor takes a task id, the relative path of
+    the data file and its full path
+    '''
+    def __init__(self, taskId, path, filePath):
+        super(thumbnailTask, self).__init__()
+        self.taskId = taskId
+        self.path = path
+        self.filePath = filePath
+        self.signals = thumbnailSignals()
+        # The task is released by the loader, not by the thread pool
+        self.setAutoDelete(False)
+
+    '''
+    run function is called by the thread pool on a worker thread
+    '''
+    def run(self):
+        try:
+            image, statistics = makeThumbnail(self.filePath)
+        except Exception as error:
+            self.signals.failed.emit(self.taskId, str(error))
+        else:
+            self.signals.finished.emit(self.taskId, image, statistics)
+        finally:
+            self.signals.done.emit(self.taskId)
+
+
+'''
+thumbnailLoader class hands out the thumbnails of the files of a folder
+Thumbnails which are not in memory are made on a thread pool of their own
+(so they never hold up the loading of the files being plotted) and the
+ready signal tells when they arrive. The most recently requested thumbnail
+is made first, so the rows in view come before the ones scrolled past
+'''
+class thumbnailLoader(QObject):
+    # Relative path of a file whose thumbnail is now available
+    ready = pyqtSignal(str)
+
+    '''
+    thumbnailLoader class constructor initializes the loader with no folder
+    '''
+    def __init__(self):
+        super(thumbnailLoader, self).__init__()
+        self.threadPool = QThreadPool()
+        self.threadPool.setMaxThreadCount(max(QThreadPool.globalInstance().maxThreadCount() // 2, 1))
+        self.folderPath = None
+        # Thumbnails in memory keyed by relative path, the most recently used
+        # at the end. Each holds the image and the statistics (or the error
+        # message if the file could not be read)
+        self.thumbnails = OrderedDict()
+        # Id of the task which is queued or running keyed by relative path
+        self.pending = dict()
+        # Tasks keyed by task id, kept until the thread pool is done with them
+        self.tasks = dict()
+        self.lastTaskId = 0
+        # Priority of the next task, rising so the latest request runs first
+        self.nextPriority = 0
+
+    '''
+    setFolder function takes the path of the data folder whose files are
+    listed and forgets the thumbnails of the previous folder
+    '''
+    def setFolder(self, folderPath):
+        self.dropPending(set(), True)
+        self.thumbnails.clear()
+        self.folderPath = folderPath
+
+    '''
+    thumbnail function takes the relative path of a file and returns its
+    thumbnail as (image, statistics, error), or None if it is not ready yet
+    in which case it is requested
+    '''
+    def thumbnail(self, path):
+        entry = self.thumbnails.get(path)
+        if entry is not None:
+            self.thumbnails.move_to_end(path)
+            return entry
+
+        if path not in self.pending and self.folderPath is not None:
+            self.lastTaskId += 1
+            task = thumbnailTask(self.lastTaskId, path, self.folderPath + '/' + path)
+            task.signals.finished.connect(self.taskFinished)
+            task.signals.failed.connect(self.taskFailed)
+            task.signals.done.connect(self.taskDone)
+            self.tasks[self.lastTaskId] = task
+            self.pending[path] = self.lastTaskId
+            self.nextPriority += 1
+            self.threadPool.start(task, self.nextPriority)
+
+        return None
+
+    '''
+    taskFinished function keeps the thumbnail made by a task
+    '''
+    def taskFinished(self, taskId, image, statistics):
+        self.keepThumbnail(taskId, (image, statistics, None))
+
+    '''
+    taskFailed function keeps the error message of a file which could not
+    be read, so it is not requested again
+    '''
+    def taskFailed(self, taskId, message):
+        self.keepThumbnail(taskId, (None, None, message))
+
+    '''
+    taskDone function releases a task once the thread pool is done with it
+    '''
+    def taskDone(self, taskId):
+        self.tasks.pop(taskId, None)
+
+    '''
+    keepThumbnail function keeps the thumbnail of a task, unless the folder
+    has changed since it was requested
+    '''
+    def keepThumbnail(self, taskId, entry):
+        task = self.tasks.get(taskId)
+        if task is None or self.pending.get(task.path) != taskId:
+            return
+        path = task.path
+        del self.pending[path]
+
+        self.thumbnails[path] = entry
+        while len(self.thumbnails) > MAX_MEMORY_THUMBNAILS:
+            self.thumbnails.popitem(last=False)
+        self.ready.emit(path)
+
+    '''
+    forget function takes the relative path of a file and drops its
+    thumbnail from memory, so it is read again from the disk cache the next
+    time its row is painted (a large file gets an exact thumbnail once it
+    has been plotted)
+    '''
+    def forget(self, path):
+        if self.thumbnails.pop(path, None) is not None:
+            self.ready.emit(path)
+
+    '''
+    keepOnly function takes the relative paths of the rows in view and drops
+    the requests for every other file which have not started yet
+    '''
+    def keepOnly(self, paths):
+        self.dropPending(paths)
+
+    '''
+    dropPending function drops the requests which have not started yet for
+    every file not in the given relative paths. The requests which are
+    running are kept, or forgotten if dropRunning is True (their thumbnail
+    is then ignored when it arrives)
+    '''
+    def dropPending(self, paths, dropRunning=False):
+        for path, taskId in list(self.pending.items()):
+            if path in paths:
+                continue
+            # A task taken from the queue never runs, so it is released here
+            if self.threadPool.tryTake(self.tasks[taskId]):
+                del self.tasks[taskId]
+            elif not dropRunning:
+                continue
+            del self.pending[path]
+
+    '''
+    close function drops the queued requests and waits for the running ones
+    '''
+    def close(self):
+        self.threadPool.clear()
+        self.threadPool.waitForDone()
+        self.pending.clear()
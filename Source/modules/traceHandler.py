@@ -0,0 +1,160 @@
+'''
+Trace Handler Module
+This module records how long the hot paths of the application take (listing
+folders, parsing csv files, converting time stamps, drawing the plot etc.)
+
+Code is timed with the span context manager or the traced decorator. Every
+finished span (name, start, duration, thread and optional details) is kept
+in a bounded buffer holding the most recent spans, so tracing can stay on
+all the time. The spans can be exported as JSON lines or in the Chrome trace
+format (open it in chrome://tracing or https://ui.perfetto.dev)
+
+Tracing can be switched off with the environment variable TEACUP_TRACE=0.
+If TEACUP_TRACE_FILE is set the spans are exported to that file when the
+application exits (Chrome trace format unless the file ends with .jsonl)
+'''
+
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+from collections import deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Number of most recent spans kept
+MAX_SPANS = 10000
+
+# Tracing can be switched off from the environment
+enabled = os.environ.get('TEACUP_TRACE', '1') != '0'
+
+# Finished spans as (name, start in ns, duration in ns, thread id, details)
+spans = deque(maxlen=MAX_SPANS)
+spansLock = threading.Lock()
+
+# Start of the trace, used as time zero of the exported spans
+traceStart = time.perf_counter_ns()
+
+
+'''
+span class is a context manager which times the code inside the with block
+and records it under the given name along with any details given as
+keyword arguments
+    with traceHandler.span('readCSVData.parse', rows=100):
+        ...
+'''
+class span:
+
+    '''
+    span class constructor takes the name of the span and its details
+    '''
+    def __init__(self, name, **details):
+        self.name = name
+        self.details = details
+
+    '''
+    __enter__ function starts the span
+    '''
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    '''
+    __exit__ function ends the span and records it (even if the code raised)
+    '''
+    def __exit__(self, *exception):
+        if enabled:
+            duration = time.perf_counter_ns() - self.start
+            with spansLock:
+                spans.append((self.name, self.start, duration, threading.get_ident(), self.details))
+        return False
+
+
+'''
+traced function is a decorator which records every call of the decorated
+function as a span with the given name
+'''
+def traced(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+'''
+recentSpans function returns a list of the most recent spans, newest last
+'''
+def recentSpans(count=MAX_SPANS):
+    with spansLock:
+        return list(spans)[-count:]
+
+
+'''
+clear function removes all the recorded spans
+'''
+def clear():
+    with spansLock:
+        spans.clear()
+
+
+'''
+memoryUsage function returns the memory used by the application (resident
+set size in bytes) or None if it can not be found
+psutil is used if it is installed, otherwise /proc on Linux
+'''
+def memoryUsage():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+
+    try:
+        with open('/proc/self/statm') as statmFile:
+            return int(statmFile.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+'''
+exportJSONLines function writes every recorded span as one JSON object per
+line (times in microseconds since the start of the trace)
+'''
+def exportJSONLines(filePath):
+    with open(filePath, 'w') as traceFile:
+        for name, start, duration, threadId, details in recentSpans():
+            traceFile.write(json.dumps({'name': name, 'start': (start - traceStart) / 1000, 'duration': duration / 1000,
+                                        'thread': threadId, 'details': details}, default=str) + '\n')
+
+
+'''
+exportChromeTrace function writes every recorded span as a complete event
+of the Chrome trace event format
+'''
+def exportChromeTrace(filePath):
+    events = [{'name': name, 'ph': 'X', 'ts': (start - traceStart) / 1000, 'dur': duration / 1000,
+               'pid': os.getpid(), 'tid': threadId, 'args': details}
+              for name, start, duration, threadId, details in recentSpans()]
+    with open(filePath, 'w') as traceFile:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, traceFile, default=str)
+
+
+'''
+export function writes the recorded spans to a file, as JSON lines if the
+file name ends with .jsonl and in the Chrome trace format otherwise
+'''
+def export(filePath):
+    if filePath.endswith('.jsonl'):
+        exportJSONLines(filePath)
+    else:
+        exportChromeTrace(filePath)
+
+
+# Export the spans when the application exits if a trace file was requested
+if enabled and os.environ.get('TEACUP_TRACE_FILE'):
+    atexit.register(export, os.environ['TEACUP_TRACE_FILE'])
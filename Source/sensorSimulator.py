@@ -0,0 +1,119 @@
+'''
+Sensor Simulator
+This script stands in for real temperature sensors. It sends readings of
+cooling cups of tea to the live sensor section of the application (or any
+other listener using the same line format, see the sensor handler module)
+
+Every channel follows Newton's law of cooling with a little noise. Readings
+are sent in small batches every few milliseconds so high rates (1 kHz per
+channel and more) can be kept up without a packet per reading
+
+Usage (from the Source folder):
+    python sensorSimulator.py [--protocol UDP|TCP|Pipe] [--address <host:port or pipe path>]
+                              [--channels N] [--rate HZ] [--duration SECONDS]
+
+Example:
+    python sensorSimulator.py --channels 4 --rate 1000
+'''
+
+import sys
+import time
+import socket
+import argparse
+
+import numpy
+
+from modules import sensorHandler
+
+# Time (in seconds) between two batches of readings
+BATCH_INTERVAL = 0.01
+# Largest UDP datagram sent (in bytes), batches are split to fit
+MAX_DATAGRAM_SIZE = 8192
+
+
+'''
+coolingCurve function takes the elapsed time (in seconds) and a channel
+number and returns the temperature of that channel's cup of tea
+'''
+def coolingCurve(elapsed, channel, randomGenerator):
+    startTemperature = 90.0 - 5.0 * channel
+    coolingConstant = 1.0 / (600.0 + 120.0 * channel)
+    noise = randomGenerator.normal(0.0, 0.2, len(elapsed))
+    return 22.0 + (startTemperature - 22.0) * numpy.exp(-coolingConstant * elapsed) + noise
+
+
+'''
+openConnection function takes the protocol and address and returns a
+function which sends a block of bytes to the listener
+'''
+def openConnection(protocol, address):
+    if protocol == 'Pipe':
+        pipeFile = open(address, 'wb', buffering=0)
+        return pipeFile.write
+
+    host, separator, port = address.rpartition(':')
+    if protocol == 'TCP':
+        connection = socket.create_connection((host, int(port)))
+        return connection.sendall
+
+    connection = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = (host, int(port))
+
+    # Split the batch into datagrams made of complete lines
+    def sendDatagrams(data):
+        while data:
+            cut = data.rfind(b'\n', 0, MAX_DATAGRAM_SIZE) + 1 if len(data) > MAX_DATAGRAM_SIZE else len(data)
+            connection.sendto(data[:cut], target)
+            data = data[cut:]
+
+    return sendDatagrams
+
+
+'''
+main function parses the command line and sends readings until the
+duration is over (or forever) and prints the rate which was kept up
+'''
+def main():
+    parser = argparse.ArgumentParser(description='Send simulated temperature readings to the live sensor listener')
+    parser.add_argument('--protocol', default='UDP', choices=sensorHandler.PROTOCOLS, help='protocol of the listener')
+    parser.add_argument('--address', default=sensorHandler.DEFAULT_ADDRESS, help='host:port or path of the named pipe')
+    parser.add_argument('--channels', type=int, default=1, help='number of sensors')
+    parser.add_argument('--rate', type=float, default=1000.0, help='readings per second per channel')
+    parser.add_argument('--duration', type=float, default=None, help='seconds to run (default: until stopped)')
+    arguments = parser.parse_args()
+
+    send = openConnection(arguments.protocol, arguments.address)
+    randomGenerator = numpy.random.default_rng()
+
+    startTime = time.time()
+    sentCount = 0
+    print('Sending {} channels at {:g} Hz over {} to {}'.format(arguments.channels, arguments.rate,
+                                                              arguments.protocol, arguments.address))
+    try:
+        while arguments.duration is None or time.time() - startTime < arguments.duration:
+            # Send every reading which is due by now
+            dueCount = int((time.time() - startTime) * arguments.rate)
+            if dueCount > sentCount:
+                elapsed = numpy.arange(sentCount, dueCount) / arguments.rate
+                lines = []
+                for channel in range(arguments.channels):
+                    temperatures = coolingCurve(elapsed, channel, randomGenerator)
+                    lines.extend('{},{:.4f},{:.3f}\n'.format(channel, startTime + seconds, temperature)
+                                 for seconds, temperature in zip(elapsed, temperatures))
+                send(''.join(lines).encode())
+                sentCount = dueCount
+            time.sleep(BATCH_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        print('Connection lost: {}'.format(error))
+
+    elapsed = time.time() - startTime
+    print('Sent {} readings per channel in {:.1f} s ({:.0f} Hz per channel)'.format(
+        sentCount, elapsed, sentCount / max(elapsed, 1e-9)))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())